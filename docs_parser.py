@@ -14,8 +14,11 @@ DOCS_TRACKER = './docs_status.yaml'
 PARSE_DIR = './synology_api'
 API_LIST_FILE = './documentation/docs/apis/readme.md'
 DOCS_DIR = './documentation/docs/apis/classes/'
-EXCLUDED_FILES = {'__init__.py', 'auth.py', 'base_api.py',
-                  'error_codes.py', 'exceptions.py', 'utils.py'}
+EXCLUDED_FILES = {'__init__.py', 'api_cache.py', 'auth.py', 'base_api.py', 'async_base_api.py', 'batch.py',
+                  'bulk_ops.py', 'circuit_breaker.py', 'dir_sync.py', 'error_codes.py', 'exceptions.py',
+                  'file_index.py', 'fleet.py', 'hooks.py', 'json_backend.py', 'json_stream.py', 'metrics.py',
+                  'pagination.py', 'response_cache.py', 'retry.py', 'session_registry.py', 'single_flight.py',
+                  'tasks.py', 'throttle.py', 'utils.py'}
 
 ####################
 # String Constants #
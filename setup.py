@@ -16,6 +16,7 @@ setup(
     long_description_content_type='text/markdown',
     install_requires=['requests', 'urllib3', 'setuptools',
                       'requests_toolbelt', 'tqdm', 'cryptography', 'treelib'],
+    extras_require={'fast': ['orjson']},
     url='https://github.com/N4S4/synology-api',
     author='Renato Visaggio',
     author_email='synology.python.api@gmail.com'
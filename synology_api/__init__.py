@@ -1,31 +1,105 @@
 """Synology API Python Client."""
-from . import \
-    audiostation, \
-    auth, \
-    base_api, \
-    directory_server, \
-    docker_api, \
-    drive_admin_console, \
-    cloud_sync, \
-    core_active_backup, \
-    core_backup, \
-    core_certificate, \
-    core_sys_info, \
-    core_group, \
-    core_user, \
-    core_share, \
-    core_package, \
-    downloadstation, \
-    log_center, \
-    vpn, \
-    oauth, \
-    security_advisor, \
-    dhcp_server, \
-    notestation, \
-    filestation, \
-    photos, \
-    usb_copy, \
-    virtualization, \
-    universal_search, \
-    snapshot, \
-    surveillancestation
+from __future__ import annotations
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# Submodules are imported on first access (PEP 562), so `import synology_api` stays cheap and
+# scripts only pay for the APIs they use.
+__all__ = [
+    'audiostation',
+    'auth',
+    'base_api',
+    'async_base_api',
+    'directory_server',
+    'docker_api',
+    'drive_admin_console',
+    'cloud_sync',
+    'core_active_backup',
+    'core_backup',
+    'core_certificate',
+    'core_sys_info',
+    'core_group',
+    'core_user',
+    'core_share',
+    'core_package',
+    'downloadstation',
+    'log_center',
+    'vpn',
+    'oauth',
+    'security_advisor',
+    'dhcp_server',
+    'notestation',
+    'filestation',
+    'photos',
+    'usb_copy',
+    'virtualization',
+    'universal_search',
+    'snapshot',
+    'surveillancestation',
+]
+
+if TYPE_CHECKING:
+    from . import \
+        audiostation, \
+        auth, \
+        base_api, \
+        async_base_api, \
+        directory_server, \
+        docker_api, \
+        drive_admin_console, \
+        cloud_sync, \
+        core_active_backup, \
+        core_backup, \
+        core_certificate, \
+        core_sys_info, \
+        core_group, \
+        core_user, \
+        core_share, \
+        core_package, \
+        downloadstation, \
+        log_center, \
+        vpn, \
+        oauth, \
+        security_advisor, \
+        dhcp_server, \
+        notestation, \
+        filestation, \
+        photos, \
+        usb_copy, \
+        virtualization, \
+        universal_search, \
+        snapshot, \
+        surveillancestation
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import a submodule on first access.
+
+    Parameters
+    ----------
+    name : str
+        Attribute name.
+
+    Returns
+    -------
+    Any
+        The imported submodule.
+    """
+    if name in __all__:
+        # import_module binds the submodule in globals(), later lookups do not come here
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module '%s' has no attribute '%s'" %
+                         (__name__, name))
+
+
+def __dir__() -> list[str]:
+    """
+    List the module attributes, including the submodules not imported yet.
+
+    Returns
+    -------
+    list[str]
+        Attribute names.
+    """
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,251 @@
+"""
+On-disk cache of the SYNO.API.Info catalog.
+
+The catalog returned by `SYNO.API.Info` with `query=all` lists hundreds of APIs and only changes
+when DSM or a package is updated. Caching it per NAS lets short-lived scripts skip downloading it
+on every start.
+
+The cache is enabled by default: every session writes the catalog of its NAS to
+`$XDG_CACHE_HOME/synology_api`, or `~/.cache/synology_api` when `XDG_CACHE_HOME` is not set, and
+reuses it for one day. Pass `api_cache_ttl=0` to `Authentication` to disable it, or `api_cache_dir`
+to write elsewhere.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Callable, Optional
+
+# One day, DSM updates are detected earlier through error 102 (API does not exist)
+DEFAULT_TTL = 86400
+
+
+def default_cache_dir() -> str:
+    """
+    Get the default cache directory, following the XDG base directory convention.
+
+    Returns
+    -------
+    str
+        Path of the `synology_api` cache directory.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'synology_api')
+
+
+class ApiList(dict):
+    """
+    API names mapped to their path and versions, looking the catalog up again for unknown APIs.
+
+    The API classes index this dict directly before sending a request, an API added by a DSM or
+    package update since the catalog was loaded would raise `KeyError`. `reload` is called for
+    a missing name instead, and the name is only missing if the reloaded catalog lacks it too.
+
+    Parameters
+    ----------
+    reload : Callable[[str], Optional[dict[str, object]]], optional
+        Called with a missing API name, returns its information or None. Defaults to `None`.
+    """
+
+    def __init__(self, reload: Optional[Callable[[str], Optional[dict[str, object]]]] = None) -> None:
+        """
+        Initialize the ApiList object.
+
+        Parameters
+        ----------
+        reload : Callable[[str], Optional[dict[str, object]]], optional
+            Called with a missing API name, returns its information or None. Defaults to `None`.
+        """
+        super().__init__()
+        self._reload: Optional[Callable[[str],
+                                        Optional[dict[str, object]]]] = reload
+
+    def __missing__(self, api_name: str) -> dict[str, object]:
+        """
+        Look a missing API up in the reloaded catalog.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API.
+
+        Returns
+        -------
+        dict[str, object]
+            Path and versions of the API.
+
+        Raises
+        ------
+        KeyError
+            If the API is not in the catalog of the NAS.
+        """
+        info = self._reload(api_name) if self._reload is not None else None
+        if info is None:
+            raise KeyError(api_name)
+        self[api_name] = info
+        return info
+
+
+class ApiInfoCache(object):
+    """
+    Store the API catalog of each NAS in a JSON file, valid for a limited time.
+
+    Entries are keyed by base URL (scheme, host and port), DSM major version and DSM build when
+    it is known.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory of the cache files. Defaults to `$XDG_CACHE_HOME/synology_api` or `~/.cache/synology_api`.
+    ttl : float, optional
+        Seconds an entry stays valid, `0` disables the cache. Defaults to one day.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl: float = DEFAULT_TTL) -> None:
+        """
+        Initialize the ApiInfoCache object.
+
+        Parameters
+        ----------
+        cache_dir : str, optional
+            Directory of the cache files. Defaults to `$XDG_CACHE_HOME/synology_api` or `~/.cache/synology_api`.
+        ttl : float, optional
+            Seconds an entry stays valid, `0` disables the cache. Defaults to one day.
+        """
+        self.cache_dir: str = cache_dir or default_cache_dir()
+        self.ttl: float = ttl
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Tell whether the cache is used at all.
+
+        Returns
+        -------
+        bool
+            True if entries are read and written.
+        """
+        return self.ttl > 0
+
+    def path(self, base_url: str, dsm_version: int, build: Optional[str] = None) -> str:
+        """
+        Get the file holding the catalog of a NAS.
+
+        Parameters
+        ----------
+        base_url : str
+            Base URL of the NAS web API.
+        dsm_version : int
+            DSM major version.
+        build : str, optional
+            DSM build number, if known. Defaults to `None`.
+
+        Returns
+        -------
+        str
+            Path of the cache file.
+        """
+        key = re.sub(r'[^A-Za-z0-9.-]+', '_',
+                     base_url).strip('_') + '_dsm%s' % dsm_version
+        if build:
+            key += '_' + re.sub(r'[^A-Za-z0-9.-]+', '_', str(build))
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def load(self, base_url: str, dsm_version: int, build: Optional[str] = None) -> Optional[dict[str, object]]:
+        """
+        Read the catalog of a NAS if it is cached and not expired.
+
+        Parameters
+        ----------
+        base_url : str
+            Base URL of the NAS web API.
+        dsm_version : int
+            DSM major version.
+        build : str, optional
+            DSM build number, if known. Defaults to `None`.
+
+        Returns
+        -------
+        dict[str, object] or None
+            The catalog, or None if missing, expired or unreadable.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path(base_url, dsm_version, build), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get('created', 0) > self.ttl:
+            return None
+        return entry.get('api_list') or None
+
+    def store(self, base_url: str, dsm_version: int, api_list: dict[str, object],
+              build: Optional[str] = None) -> None:
+        """
+        Write the catalog of a NAS, failures are ignored since the cache is only an optimization.
+
+        Parameters
+        ----------
+        base_url : str
+            Base URL of the NAS web API.
+        dsm_version : int
+            DSM major version.
+        api_list : dict[str, object]
+            The catalog returned by `SYNO.API.Info`.
+        build : str, optional
+            DSM build number, if known. Defaults to `None`.
+        """
+        if not self.enabled:
+            return
+        path = self.path(base_url, dsm_version, build)
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # One temporary file per writer, threads of a process may store the same NAS at once
+            fd, tmp_path = tempfile.mkstemp(
+                suffix='.tmp', prefix=os.path.basename(path) + '.', dir=self.cache_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'created': time.time(), 'base_url': base_url,
+                          'api_list': api_list}, f)
+            # Atomic, concurrent scripts never read a partial file
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def invalidate(self, base_url: Optional[str] = None, dsm_version: Optional[int] = None,
+                   build: Optional[str] = None) -> None:
+        """
+        Remove the cached catalog of a NAS, or of every NAS.
+
+        Parameters
+        ----------
+        base_url : str, optional
+            Base URL of the NAS web API. Defaults to `None` (every NAS).
+        dsm_version : int, optional
+            DSM major version, required with `base_url`.
+        build : str, optional
+            DSM build number, if known. Defaults to `None`.
+        """
+        if base_url is not None:
+            paths = [self.path(base_url, dsm_version, build)]
+        else:
+            try:
+                paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                         if name.endswith('.json')]
+            except OSError:
+                paths = []
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,448 @@
+"""
+Asyncio counterpart of the base API for Synology DSM.
+
+Provides awaitable versions of `Authentication` and `BaseApi`. Requests still go through the
+pooled keep-alive transport of `Authentication`; they are dispatched to a worker pool sized
+after the concurrency limit, so one event loop can drive many DSM calls without blocking.
+"""
+from __future__ import annotations
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import requests
+
+from . import auth as syn
+from . import base_api
+
+
+class AsyncAuthentication(object):
+    """
+    Awaitable wrapper around `Authentication`.
+
+    Every call is executed by a worker pool and gated by a concurrency limiter, so that at most
+    `max_concurrency` requests hit the DSM web server at the same time.
+
+    A session given by the caller may be shared with synchronous API classes, it is used as is: its
+    connection pool is not resized and `close()` leaves it open. Sessions opened by `create()` have
+    one keep-alive connection per worker and belong to the wrapper.
+
+    Parameters
+    ----------
+    session : Authentication
+        The session to drive, logged in or not.
+    max_concurrency : int, optional
+        Maximum number of requests in flight at the same time. Defaults to `16`.
+    own_session : bool, optional
+        Whether the session belongs to this wrapper, `close()` then closes it too. Defaults to `False`.
+    """
+
+    def __init__(self, session: syn.Authentication, max_concurrency: int = 16, own_session: bool = False) -> None:
+        """
+        Initialize the AsyncAuthentication object.
+
+        Parameters
+        ----------
+        session : Authentication
+            The session to drive, logged in or not.
+        max_concurrency : int, optional
+            Maximum number of requests in flight at the same time. Defaults to `16`.
+        own_session : bool, optional
+            Whether the session belongs to this wrapper, `close()` then closes it too. Defaults to `False`.
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be greater than 0')
+
+        self._session: syn.Authentication = session
+        self._own_session: bool = own_session
+        self._max_concurrency: int = max_concurrency
+        self._limiter: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='synology_api')
+
+    @classmethod
+    async def create(cls,
+                     ip_address: str,
+                     port: str,
+                     username: str,
+                     password: str,
+                     secure: bool = False,
+                     cert_verify: bool = False,
+                     dsm_version: int = 7,
+                     debug: bool = True,
+                     otp_code: Optional[str] = None,
+                     device_id: Optional[str] = None,
+                     device_name: Optional[str] = None,
+                     max_concurrency: int = 16
+                     ) -> AsyncAuthentication:
+        """
+        Create a session owned by the wrapper, log in and retrieve the API list without blocking the event loop.
+
+        Parameters
+        ----------
+        ip_address : str
+            The IP/DNS address of the NAS.
+        port : str
+            The port of the NAS.
+        username : str
+            The username to use for authentication.
+        password : str
+            The password to use for authentication.
+        secure : bool, optional
+            Whether to use HTTPS or not. Defaults to `False`.
+        cert_verify : bool, optional
+            Whether to verify the SSL certificate or not. Defaults to `False`.
+        dsm_version : int, optional
+            The DSM version. Defaults to `7`.
+        debug : bool, optional
+            Whether to print debug messages or not. Defaults to `True`.
+        otp_code : str, optional
+            The OTP code to use for authentication. Defaults to `None`.
+        device_id : str, optional
+            Device ID for device binding. Defaults to `None`.
+        device_name : str, optional
+            Device name for device binding. Defaults to `None`.
+        max_concurrency : int, optional
+            Maximum number of requests in flight at the same time. Defaults to `16`.
+
+        Returns
+        -------
+        AsyncAuthentication
+            A logged in session.
+        """
+        # Keep one keep-alive connection per worker
+        session = cls(syn.Authentication(ip_address, port, username, password, secure, cert_verify,
+                                         dsm_version, debug, otp_code, device_id, device_name,
+                                         pool_maxsize=max_concurrency),
+                      max_concurrency, own_session=True)
+        await session.login()
+        await session.get_api_list()
+        return session
+
+    async def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable in the worker pool, within the concurrency limit.
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            The blocking callable, usually a bound method of an API class.
+        *args : Any
+            Positional arguments for `func`.
+        **kwargs : Any
+            Keyword arguments for `func`.
+
+        Returns
+        -------
+        Any
+            The value returned by `func`.
+        """
+        async with self._limiter:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def get_ik_message(self) -> str:
+        """
+        Get the IK message for authentication.
+
+        Returns
+        -------
+        str
+            The IK message.
+        """
+        return await self.call(self._session.get_ik_message)
+
+    async def login(self) -> None:
+        """Log in to the Synology DSM and obtain a session ID and token."""
+        await self.call(self._session.login)
+
+    async def logout(self) -> None:
+        """Log out from the Synology DSM and invalidate the session."""
+        await self.call(self._session.logout)
+
+    async def get_api_list(self, app: Optional[str] = None, refresh: bool = False) -> None:
+        """
+        Retrieve the list of available APIs from the Synology DSM.
+
+        Parameters
+        ----------
+        app : str, optional
+            Filter APIs by application name.
+        refresh : bool, optional
+            Download the catalog again even if it is already loaded or cached. Defaults to False.
+        """
+        await self.call(self._session.get_api_list, app, refresh)
+
+    async def request_data(self,
+                           api_name: str,
+                           api_path: str,
+                           req_param: dict[str, object],
+                           method: Optional[str] = None,
+                           response_json: bool = True
+                           ) -> dict[str, object] | str | list | requests.Response:
+        """
+        Send a request to the Synology API, see `Authentication.request_data`.
+
+        Parameters
+        ----------
+        api_name : str
+            The name of the Synology API to call.
+        api_path : str
+            The path to the API endpoint.
+        req_param : dict[str, object]
+            The parameters to include in the request.
+        method : str, optional
+            The HTTP method to use ('get' or 'post'). Defaults to 'get' if not specified.
+        response_json : bool, optional
+            Whether to return the response as JSON. If False, returns the raw response object.
+
+        Returns
+        -------
+        dict[str, object] or str or list or requests.Response
+            The response from the API.
+        """
+        return await self.call(self._session.request_data, api_name, api_path, req_param, method, response_json)
+
+    async def request_multi_datas(self,
+                                  compound: dict[object] = None,
+                                  method: Optional[str] = None,
+                                  mode: Optional[str] = "sequential",
+                                  response_json: bool = True
+                                  ) -> dict[str, object] | str | list | requests.Response:
+        """
+        Send multiple requests in one compound request, see `Authentication.request_multi_datas`.
+
+        Parameters
+        ----------
+        compound : dict[object], optional
+            A JSON structure containing multiple requests to be executed.
+        method : str, optional
+            The HTTP method to use ('get' or 'post'). Defaults to 'get' if not specified.
+        mode : str, optional
+            The execution mode for the requests, either "sequential" or "parallel".
+        response_json : bool, optional
+            Whether to return the response as JSON. If False, returns the raw response object.
+
+        Returns
+        -------
+        dict[str, object] or str or list or requests.Response
+            The response from the API.
+        """
+        return await self.call(self._session.request_multi_datas, compound, method, mode, response_json)
+
+    def close(self) -> None:
+        """Shut down the worker pool, and close the pooled connections of a session owned by the wrapper."""
+        self._executor.shutdown(wait=False)
+        if self._own_session:
+            self._session.close()
+
+    @property
+    def session(self) -> syn.Authentication:
+        """
+        Get the underlying synchronous session.
+
+        Returns
+        -------
+        Authentication
+            The wrapped session.
+        """
+        return self._session
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        Get the maximum number of requests in flight at the same time.
+
+        Returns
+        -------
+        int
+            Concurrency limit.
+        """
+        return self._max_concurrency
+
+    @property
+    def sid(self) -> Optional[str]:
+        """
+        Get the current session ID.
+
+        Returns
+        -------
+        str or None
+            Session ID if logged in, else None.
+        """
+        return self._session.sid
+
+    @property
+    def base_url(self) -> str:
+        """
+        Get the base URL for API requests.
+
+        Returns
+        -------
+        str
+            Base URL.
+        """
+        return self._session.base_url
+
+
+class AsyncBaseApi(object):
+    """
+    Asyncio counterpart of `BaseApi`.
+
+    Wraps any API class (`FileStation`, `SurveillanceStation`, `SysInfo`, ...) and exposes each of its
+    public methods as a coroutine function. The API class is instantiated, and the login performed,
+    by awaiting `connect()` or by entering the object as an async context manager. The API class
+    shares its session with the synchronous instances for the same NAS and user, the wrapper leaves
+    its connection pool as configured and only logs out of a session it opened itself.
+
+    Parameters
+    ----------
+    api_class : type[BaseApi]
+        The API class to wrap, for example `FileStation`.
+    *args : Any
+        Positional arguments for `api_class` (ip_address, port, username, password, ...).
+    max_concurrency : int, optional
+        Maximum number of requests in flight at the same time. Defaults to `16`.
+    **kwargs : Any
+        Keyword arguments for `api_class`.
+
+    Examples
+    --------
+    ```python
+    async with AsyncBaseApi(FileStation, 'ip', '5000', 'user', 'password') as fs:
+        infos = await asyncio.gather(*[fs.get_file_info(path) for path in paths])
+    ```
+    """
+
+    def __init__(self, api_class: type[base_api.BaseApi], *args: Any, max_concurrency: int = 16, **kwargs: Any) -> None:
+        """
+        Initialize the AsyncBaseApi object, no request is sent before `connect()`.
+
+        Parameters
+        ----------
+        api_class : type[BaseApi]
+            The API class to wrap, for example `FileStation`.
+        *args : Any
+            Positional arguments for `api_class` (ip_address, port, username, password, ...).
+        max_concurrency : int, optional
+            Maximum number of requests in flight at the same time. Defaults to `16`.
+        **kwargs : Any
+            Keyword arguments for `api_class`.
+        """
+        self._api_class: type[base_api.BaseApi] = api_class
+        self._args: tuple = args
+        self._kwargs: dict[str, Any] = kwargs
+        self._max_concurrency: int = max_concurrency
+        self.api: Optional[base_api.BaseApi] = None
+        self.session: Optional[AsyncAuthentication] = None
+        self._own_session: bool = False
+
+    async def connect(self) -> AsyncBaseApi:
+        """
+        Instantiate the wrapped API class, which logs in, without blocking the event loop.
+
+        Returns
+        -------
+        AsyncBaseApi
+            This object, ready to use.
+        """
+        if self.api is None:
+            # Sessions already open belong to the synchronous instances sharing them
+            registry = base_api.BaseApi.session_registry
+            opened = [registry.get(key) for key in registry.keys()]
+            opened.append(base_api.BaseApi.shared_session)
+
+            loop = asyncio.get_running_loop()
+            self.api = await loop.run_in_executor(
+                None, functools.partial(self._api_class, *self._args, **self._kwargs))
+            self._own_session = not any(
+                session is self.api.session for session in opened)
+            self.session = AsyncAuthentication(
+                self.api.session, self._max_concurrency, own_session=self._own_session)
+        return self
+
+    async def request_data(self,
+                           api_name: str,
+                           api_path: str,
+                           req_param: dict[str, object],
+                           method: Optional[str] = None,
+                           response_json: bool = True
+                           ) -> dict[str, object] | str | list | requests.Response:
+        """
+        Send a request to the Synology API, see `Authentication.request_data`.
+
+        Parameters
+        ----------
+        api_name : str
+            The name of the Synology API to call.
+        api_path : str
+            The path to the API endpoint.
+        req_param : dict[str, object]
+            The parameters to include in the request.
+        method : str, optional
+            The HTTP method to use ('get' or 'post'). Defaults to 'get' if not specified.
+        response_json : bool, optional
+            Whether to return the response as JSON. If False, returns the raw response object.
+
+        Returns
+        -------
+        dict[str, object] or str or list or requests.Response
+            The response from the API.
+        """
+        await self.connect()
+        return await self.session.request_data(api_name, api_path, req_param, method, response_json)
+
+    async def logout(self) -> None:
+        """Log out of the session of the wrapped API class if the wrapper opened it, and release the worker pool."""
+        if self.api is not None:
+            if self._own_session:
+                await self.session.call(self.api.logout)
+            self.session.close()
+            self.api = None
+            self.session = None
+
+    async def __aenter__(self) -> AsyncBaseApi:
+        """
+        Connect when entering an async context manager.
+
+        Returns
+        -------
+        AsyncBaseApi
+            This object, ready to use.
+        """
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """
+        Log out, of a session opened by the wrapper only, when leaving an async context manager.
+
+        Parameters
+        ----------
+        *exc_info : Any
+            Exception information, unused.
+        """
+        await self.logout()
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Expose the methods of the wrapped API class as coroutine functions.
+
+        Parameters
+        ----------
+        name : str
+            Attribute name.
+
+        Returns
+        -------
+        Any
+            A coroutine function for public methods, the plain attribute otherwise.
+        """
+        if self.api is None:
+            raise AttributeError(
+                "'%s' is not connected, await connect() first" % type(self).__name__)
+
+        attr = getattr(self.api, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        return functools.partial(self.session.call, attr)
@@ -1,14 +1,29 @@
 """Provides authentication and API request handling for Synology DSM, including session management, encryption utilities, and error handling for various Synology services."""
 from __future__ import annotations
 from random import randint
-from typing import Optional
+from typing import Any, Callable, Iterator, Optional
 import requests
 import json
-from .error_codes import error_codes, CODE_SUCCESS, download_station_error_codes, file_station_error_codes
+import threading
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import Future
+from http.cookiejar import DefaultCookiePolicy
+from .error_codes import error_codes, CODE_SUCCESS, CODE_API_NOT_FOUND, SESSION_ERROR_CODES, download_station_error_codes, file_station_error_codes
 from .error_codes import auth_error_codes, virtualization_error_codes
+from .api_cache import ApiInfoCache, ApiList, DEFAULT_TTL
+from .batch import RequestBatch
+from .hooks import RequestHook, RequestInfo
+from .response_cache import ResponseCache
+from .retry import DEFAULT_TIMEOUT, RetryPolicy, Timeout, TimeoutHTTPAdapter, is_read_method
+from .single_flight import SingleFlight
+from .throttle import Throttle
+from .circuit_breaker import CircuitBreaker
+from . import json_backend
+from .json_stream import iter_json_items
 from urllib3 import disable_warnings
 from urllib3.exceptions import InsecureRequestWarning
-from .exceptions import CoreError
+from .exceptions import CoreError, CircuitOpenError
 from .exceptions import SynoConnectionError, HTTPError, JSONDecodeError, LoginError, LogoutError, DownloadStationError
 from .exceptions import FileStationError, AudioStationError, ActiveBackupError, ActiveBackupMicrosoftError, VirtualizationError, BackupError
 from .exceptions import CertificateError, CloudSyncError, DHCPServerError, DirectoryServerError, DockerError, DriveAdminError
@@ -29,6 +44,50 @@ import time
 
 USE_EXCEPTIONS: bool = True
 
+# Bytes read at a time from streamed responses
+STREAM_CHUNK_SIZE: int = 64 * 1024
+
+
+def session_key(ip_address: str, port: str | int, username: str, secure: bool) -> tuple[str, str, str, bool]:
+    """
+    Build the key identifying the session of a user on a NAS.
+
+    Parameters
+    ----------
+    ip_address : str
+        The IP address or host name of the NAS, compared case-insensitively.
+    port : str or int
+        The port of the NAS.
+    username : str
+        The username.
+    secure : bool
+        Whether HTTPS is used.
+
+    Returns
+    -------
+    tuple[str, str, str, bool]
+        Host, port, username and whether HTTPS is used.
+    """
+    return str(ip_address).lower(), str(port), username, bool(secure)
+
+
+def _request_size(request: requests.PreparedRequest) -> int:
+    """
+    Measure the payload of a request sent to the NAS.
+
+    Parameters
+    ----------
+    request : requests.PreparedRequest
+        The request, as sent.
+
+    Returns
+    -------
+    int
+        Length of its URL, query included, and of its body.
+    """
+    length = request.headers.get('Content-Length')
+    return len(request.url) + (int(length) if length and length.isdigit() else 0)
+
 
 class Authentication:
     """
@@ -58,6 +117,32 @@ class Authentication:
         Device ID for device binding.
     device_name : str, optional
         Device name for device binding.
+    pool_connections : int, optional
+        Number of per-host connection pools to keep (default is 10).
+    pool_maxsize : int, optional
+        Maximum number of keep-alive connections kept per host (default is 10).
+    pool_block : bool, optional
+        Whether to block when all connections of a host are in use instead of opening extra ones (default is False).
+    auto_relogin : bool, optional
+        Whether to log in again and replay the request once when the session expired (default is True).
+    api_cache_ttl : float, optional
+        Seconds the API catalog stays cached on disk, 0 disables the cache (default is one day, the cache is enabled).
+    api_cache_dir : str, optional
+        Directory of the API catalog cache (default is `$XDG_CACHE_HOME/synology_api` or `~/.cache/synology_api`).
+    timeout : float or tuple[float, float], optional
+        Seconds to connect and to wait for response data, as a number or a `(connect, read)` tuple (default is `(10, 120)`).
+    retry_policy : RetryPolicy, optional
+        Retries of the failed requests, `RetryPolicy(max_retries=0)` disables them (default is `RetryPolicy()`).
+    response_cache : ResponseCache, optional
+        Cache of the responses of read-only methods, which may be shared by several sessions (default is None, no cache).
+    coalesce_requests : bool, optional
+        Whether concurrent identical read requests share one round trip (default is False).
+    throttle : Throttle, optional
+        Rate and concurrency limits of the requests to the NAS (default is None, no limits).
+    circuit_breaker : CircuitBreaker, optional
+        Fails the requests at once while the NAS or the API prefix keeps failing (default is None, no breaker).
+    dsm_build : str, optional
+        DSM build number, part of the API catalog cache key when given (default is None).
     """
 
     def __init__(self,
@@ -71,7 +156,20 @@ class Authentication:
                  debug: bool = True,
                  otp_code: Optional[str] = None,
                  device_id: Optional[str] = None,
-                 device_name: Optional[str] = None
+                 device_name: Optional[str] = None,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 pool_block: bool = False,
+                 auto_relogin: bool = True,
+                 api_cache_ttl: float = DEFAULT_TTL,
+                 api_cache_dir: Optional[str] = None,
+                 timeout: Timeout = DEFAULT_TIMEOUT,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 coalesce_requests: bool = False,
+                 throttle: Optional[Throttle] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 dsm_build: Optional[str] = None
                  ) -> None:
         """
         Initialize the Authentication object for Synology DSM.
@@ -100,6 +198,32 @@ class Authentication:
             Device ID for device binding (default is None).
         device_name : str, optional
             Device name for device binding (default is None).
+        pool_connections : int, optional
+            Number of per-host connection pools to keep (default is 10).
+        pool_maxsize : int, optional
+            Maximum number of keep-alive connections kept per host (default is 10).
+        pool_block : bool, optional
+            Whether to block when all connections of a host are in use (default is False).
+        auto_relogin : bool, optional
+            Whether to log in again and replay the request once when the session expired (default is True).
+        api_cache_ttl : float, optional
+            Seconds the API catalog stays cached on disk, 0 disables the cache (default is one day, the cache is enabled).
+        api_cache_dir : str, optional
+            Directory of the API catalog cache (default is `$XDG_CACHE_HOME/synology_api` or `~/.cache/synology_api`).
+        timeout : float or tuple[float, float], optional
+            Seconds to connect and to wait for response data, as a number or a `(connect, read)` tuple (default is `(10, 120)`).
+        retry_policy : RetryPolicy, optional
+            Retries of the failed requests, `RetryPolicy(max_retries=0)` disables them (default is `RetryPolicy()`).
+        response_cache : ResponseCache, optional
+            Cache of the responses of read-only methods, which may be shared by several sessions (default is None, no cache).
+        coalesce_requests : bool, optional
+            Whether concurrent identical read requests share one round trip (default is False).
+        throttle : Throttle, optional
+            Rate and concurrency limits of the requests to the NAS (default is None, no limits).
+        circuit_breaker : CircuitBreaker, optional
+            Fails the requests at once while the NAS or the API prefix keeps failing (default is None, no breaker).
+        dsm_build : str, optional
+            DSM build number, part of the API catalog cache key when given (default is None).
 
         Returns
         -------
@@ -116,10 +240,21 @@ class Authentication:
         self._session_expire: bool = True
         self._verify: bool = cert_verify
         self._version: int = dsm_version
+        self.dsm_build: Optional[str] = dsm_build
         self._debug: bool = debug
         self._otp_code: Optional[str] = otp_code
         self._device_id: Optional[str] = device_id
         self._device_name: Optional[str] = device_name
+        self._auto_relogin: bool = auto_relogin
+        self._login_lock: threading.RLock = threading.RLock()
+        self.timeout: Timeout = timeout
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.response_cache: Optional[ResponseCache] = response_cache
+        self.coalesce_requests: bool = coalesce_requests
+        self.single_flight: SingleFlight = SingleFlight()
+        self._hooks: list[RequestHook] = []
+        self.throttle: Optional[Throttle] = throttle
+        self.circuit_breaker: Optional[CircuitBreaker] = circuit_breaker
 
         if self._verify is False:
             disable_warnings(InsecureRequestWarning)
@@ -129,8 +264,334 @@ class Authentication:
         self._base_url = '%s://%s:%s/webapi/' % (
             schema, self._ip_address, self._port)
 
-        self.full_api_list = {}
-        self.app_api_list = {}
+        # Unknown APIs are looked up once in a fresh catalog before raising KeyError
+        self.full_api_list: ApiList = ApiList(self._reload_api)
+        self.app_api_list: ApiList = ApiList(self._reload_api)
+        self._api_apps: set[str] = set()
+        self._unknown_apis: set[str] = set()
+        self._api_list_lock: threading.Lock = threading.Lock()
+        self._api_cache: ApiInfoCache = ApiInfoCache(
+            api_cache_dir, api_cache_ttl)
+
+        self._http_session: requests.Session = requests.Session()
+        # Keep the transport stateless, the DSM session is carried by _sid and X-SYNO-TOKEN
+        self._http_session.cookies.set_policy(
+            DefaultCookiePolicy(allowed_domains=[]))
+        self.configure_pool(pool_connections, pool_maxsize, pool_block)
+
+        # Per thread stack of active RequestBatch
+        self._local: threading.local = threading.local()
+
+    def configure_pool(self,
+                       pool_connections: int = 10,
+                       pool_maxsize: int = 10,
+                       pool_block: bool = False
+                       ) -> None:
+        """
+        Configure the keep-alive connection pool used for every request to the NAS.
+
+        Parameters
+        ----------
+        pool_connections : int, optional
+            Number of per-host connection pools to keep (default is 10).
+        pool_maxsize : int, optional
+            Maximum number of keep-alive connections kept per host (default is 10).
+        pool_block : bool, optional
+            Whether to block when all connections of a host are in use instead of opening extra ones (default is False).
+        """
+        adapter = TimeoutHTTPAdapter(self._current_timeout, pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self._http_session.mount('http://', adapter)
+        self._http_session.mount('https://', adapter)
+
+    @contextmanager
+    def request_options(self,
+                        timeout: Timeout = None,
+                        retry_policy: Optional[RetryPolicy] = None
+                        ) -> Iterator[None]:
+        """
+        Override the timeout or the retry policy of the calls made inside the `with` block, in this thread.
+
+        Parameters
+        ----------
+        timeout : float or tuple[float, float], optional
+            Seconds to connect and to wait for response data. Defaults to `None`, the session timeout.
+        retry_policy : RetryPolicy, optional
+            Retries of the failed requests. Defaults to `None`, the session policy.
+
+        Yields
+        ------
+        None
+            Nothing, the block runs with the given options.
+
+        Examples
+        --------
+        ```python
+        with fs.request_options(timeout=(5, 600), retry_policy=RetryPolicy(max_retries=0)):
+            fs.start_dir_size_calc('/home')
+        ```
+        """
+        previous = getattr(self._local, 'options', None)
+        options = dict(previous or {})
+        if timeout is not None:
+            options['timeout'] = timeout
+        if retry_policy is not None:
+            options['retry_policy'] = retry_policy
+        self._local.options = options
+        try:
+            yield
+        finally:
+            self._local.options = previous
+
+    def _current_timeout(self) -> Timeout:
+        """
+        Get the timeout of the requests sent by the current thread.
+
+        Returns
+        -------
+        float or tuple[float, float] or None
+            The timeout set with `request_options`, else the session timeout.
+        """
+        options = getattr(self._local, 'options', None) or {}
+        return options.get('timeout', self.timeout)
+
+    def _current_retry_policy(self) -> RetryPolicy:
+        """
+        Get the retry policy of the requests sent by the current thread.
+
+        Returns
+        -------
+        RetryPolicy
+            The policy set with `request_options`, else the session policy.
+        """
+        options = getattr(self._local, 'options', None) or {}
+        return options.get('retry_policy', self.retry_policy)
+
+    def _bind_thread_options(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap a function to run it with the `request_options` and `streaming` state of the current thread.
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            Function to call from another thread.
+
+        Returns
+        -------
+        Callable[..., Any]
+            The function, called with the options of the thread that wrapped it.
+        """
+        options = getattr(self._local, 'options', None)
+        stream_items = getattr(self._local, 'stream_items', None)
+
+        def bound(*args: Any, **kwargs: Any) -> Any:
+            previous = (getattr(self._local, 'options', None),
+                        getattr(self._local, 'stream_items', None))
+            self._local.options, self._local.stream_items = options, stream_items
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.options, self._local.stream_items = previous
+        return bound
+
+    def add_hook(self, hook: RequestHook) -> RequestHook:
+        """
+        Register a hook called around each request sent by this session.
+
+        Parameters
+        ----------
+        hook : RequestHook
+            The hook, for example a `MetricsCollector`.
+
+        Returns
+        -------
+        RequestHook
+            The hook, to be passed to `remove_hook` later.
+        """
+        # Copy on write, requests in flight keep iterating over the previous list
+        self._hooks = self._hooks + [hook]
+        return hook
+
+    def remove_hook(self, hook: RequestHook) -> None:
+        """
+        Unregister a hook.
+
+        Parameters
+        ----------
+        hook : RequestHook
+            The hook given to `add_hook`.
+        """
+        self._hooks = [h for h in self._hooks if h is not hook]
+
+    @contextmanager
+    def throttled(self, api_name: str) -> Iterator[None]:
+        """
+        Wait for the throttle of the session, if any, and hold a request slot while the `with` block runs.
+
+        Used around every request, including file uploads and downloads.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API called.
+
+        Yields
+        ------
+        None
+            Nothing, the request is sent inside the block.
+        """
+        throttle = self.throttle
+        if throttle is None:
+            yield
+            return
+        with throttle.slot(self._base_url, api_name):
+            yield
+
+    @contextmanager
+    def transfer(self,
+                 http_method: str,
+                 url: str,
+                 api_name: str,
+                 method: str,
+                 version: object = None,
+                 **kwargs: object
+                 ) -> Iterator[requests.Response]:
+        """
+        Send a file upload or download built outside `request_data`, and keep its response open while the `with` block runs.
+
+        The request goes through the circuit breaker and the throttle like the other calls, its slot
+        is held until the block is left. The hooks are told when the block ends, with the bytes read
+        by then. Transport errors are raised as is.
+
+        Parameters
+        ----------
+        http_method : str
+            The HTTP method to use ('get' or 'post').
+        url : str
+            The full URL, query included.
+        api_name : str
+            The name of the Synology API called.
+        method : str
+            The DSM method called, for the hooks.
+        version : object, optional
+            The version of the API, for the hooks. Defaults to `None`.
+        **kwargs : object
+            Keyword arguments for `requests.Session.request`, for example `data`, `stream` or `headers`.
+
+        Yields
+        ------
+        requests.Response
+            The response, its body not necessarily read yet.
+        """
+        hooks = self._hooks
+        info = RequestInfo(api_name, method, version, http_method)
+        for hook in hooks:
+            hook.before_request(info)
+
+        response = None
+        error = None
+        try:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.allow(self._base_url, api_name)
+            with self.throttled(api_name):
+                response = self._http_session.request(
+                    http_method, url, **kwargs)
+                with response:
+                    yield response
+        except GeneratorExit:
+            # The caller stopped reading early, the request itself went fine
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish_transfer(hooks, info, response, error)
+
+    def _finish_transfer(self,
+                         hooks: list[RequestHook],
+                         info: RequestInfo,
+                         response: Optional[requests.Response],
+                         error: Optional[BaseException]
+                         ) -> None:
+        """
+        Report the outcome of a transfer to the circuit breaker and the hooks.
+
+        Parameters
+        ----------
+        hooks : list[RequestHook]
+            The hooks told when the transfer started.
+        info : RequestInfo
+            Description of the transfer given to the hooks.
+        response : requests.Response or None
+            The response, None if none was received.
+        error : BaseException or None
+            The error raised during the transfer, if any.
+        """
+        if response is None or isinstance(error, (requests.exceptions.ConnectionError,
+                                                  requests.exceptions.Timeout)):
+            self._record_outcome(info.api_name, error)
+        else:
+            self._record_outcome(
+                info.api_name, status_code=response.status_code)
+
+        if response is not None:
+            info.finish(response.status_code, 0, response.raw.tell(), error,
+                        _request_size(response.request))
+            for hook in hooks:
+                hook.after_response(info)
+        else:
+            info.finish(error=error)
+        if error is not None:
+            for hook in hooks:
+                hook.on_error(info, error)
+
+    def endpoint_available(self, api_name: str = '') -> bool:
+        """
+        Tell whether the circuit breaker, if any, lets the requests to an API through.
+
+        Parameters
+        ----------
+        api_name : str, optional
+            Name of the API or API prefix, for example `'SYNO.SurveillanceStation'`. Defaults to the NAS itself.
+
+        Returns
+        -------
+        bool
+            False while the circuit of the NAS or of the API prefix is open.
+        """
+        breaker = self.circuit_breaker
+        return breaker is None or breaker.is_available(self._base_url, api_name)
+
+    def _record_outcome(self, api_name: str, error: Optional[BaseException] = None,
+                        status_code: int = 200, error_code: int = 0) -> None:
+        """
+        Report the outcome of a request to the circuit breaker, if any.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API called.
+        error : BaseException, optional
+            Error raised instead of a response. Defaults to `None`.
+        status_code : int, optional
+            HTTP status of the response. Defaults to `200`.
+        error_code : int, optional
+            DSM error code of the response. Defaults to `0`.
+        """
+        breaker = self.circuit_breaker
+        if breaker is None or isinstance(error, CircuitOpenError):
+            return
+        if error is None:
+            breaker.record(self._base_url, api_name, status_code, error_code)
+        elif isinstance(error, (SynoConnectionError, requests.exceptions.ConnectionError,
+                                requests.exceptions.Timeout)):
+            breaker.record(self._base_url, api_name, transport_error=True)
+        else:
+            breaker.release(self._base_url, api_name)
+
+    def close(self) -> None:
+        """Close all pooled connections to the NAS."""
+        self._http_session.close()
 
     def get_ik_message(self) -> str:
         """
@@ -148,7 +609,7 @@ class Authentication:
             "method": "get",
             "version": "1"
         }
-        response = requests.post(url, data=data, verify=self._verify)
+        response = self._http_session.post(url, data=data, verify=self._verify)
 
         # Try to get cookie "_SSID"
         if response.status_code != 200:
@@ -244,11 +705,11 @@ class Authentication:
             session_request_json: dict[str, object] = {}
             if USE_EXCEPTIONS:
                 try:
-                    session_request = requests.post(
+                    session_request = self._http_session.post(
                         self._base_url + login_api, data=params, verify=self._verify)
                     session_request.raise_for_status()
                     session_request_json = session_request.json()
-                except requests.exceptions.ConnectionError as e:
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                     raise SynoConnectionError(error_message=e.args[0])
                 except requests.exceptions.HTTPError as e:
                     raise HTTPError(error_message=str(e.args))
@@ -256,7 +717,7 @@ class Authentication:
                     raise JSONDecodeError(error_message=str(e.args))
             else:
                 # Will raise its own errors:
-                session_request = requests.post(
+                session_request = self._http_session.post(
                     self._base_url + login_api, data=params, verify=self._verify)
                 session_request_json = session_request.json()
 
@@ -298,20 +759,20 @@ class Authentication:
 
         if USE_EXCEPTIONS:
             try:
-                response = requests.get(
-                    self._base_url + logout_api, param, verify=self._verify)
+                response = self._http_session.get(
+                    self._base_url + logout_api, params=param, verify=self._verify)
                 response.raise_for_status()
                 response_json = response.json()
                 error_code = self._get_error_code(response_json)
-            except requests.exceptions.ConnectionError as e:
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                 raise SynoConnectionError(error_message=e.args[0])
             except requests.exceptions.HTTPError as e:
                 raise HTTPError(error_message=str(e.args))
             except requests.exceptions.JSONDecodeError as e:
                 raise JSONDecodeError(error_message=str(e.args))
         else:
-            response = requests.get(
-                self._base_url + logout_api, param, verify=self._verify)
+            response = self._http_session.get(
+                self._base_url + logout_api, params=param, verify=self._verify)
             error_code = self._get_error_code(response.json())
         self._session_expire = True
         self._sid = None
@@ -326,14 +787,126 @@ class Authentication:
 
         return
 
-    def get_api_list(self, app: Optional[str] = None) -> None:
+    def get_api_list(self, app: Optional[str] = None, refresh: bool = False) -> None:
         """
         Retrieve the list of available APIs from the Synology DSM.
 
+        The catalog is downloaded once and kept on disk (see `api_cache_ttl`), filtering by
+        application is done locally.
+
         Parameters
         ----------
         app : str, optional
             Filter APIs by application name.
+        refresh : bool, optional
+            Download the catalog again even if it is already loaded or cached. Defaults to False.
+
+        Raises
+        ------
+        SynoConnectionError
+            If a connection error occurs.
+        HTTPError
+            If an HTTP error occurs.
+        JSONDecodeError
+            If the response cannot be decoded as JSON.
+        """
+        if app is not None:
+            self._api_apps.add(app.lower())
+
+        if refresh or not self.full_api_list:
+            api_list = None if refresh else self._api_cache.load(
+                self._base_url, self._version, self.dsm_build)
+            if api_list is None:
+                api_list = self._fetch_api_list()
+                self._api_cache.store(
+                    self._base_url, self._version, api_list, self.dsm_build)
+            # Update in place, API classes keep a reference to these dicts
+            self.full_api_list.clear()
+            self.full_api_list.update(api_list)
+            self.app_api_list.clear()
+            apps = self._api_apps
+        else:
+            apps = [app.lower()] if app is not None else []
+
+        for key in self.full_api_list:
+            if any(app in key.lower() for app in apps):
+                self.app_api_list[key] = self.full_api_list[key]
+
+        return
+
+    def invalidate_api_cache(self, reload: bool = True) -> None:
+        """
+        Remove the cached API catalog of this NAS and download it again.
+
+        Parameters
+        ----------
+        reload : bool, optional
+            Whether to download the catalog again now if it was loaded, otherwise only the cache file is removed.
+            Defaults to True.
+        """
+        self._api_cache.invalidate(
+            self._base_url, self._version, self.dsm_build)
+        self._unknown_apis.clear()
+        if reload and self.full_api_list:
+            with self._api_list_lock:
+                self.get_api_list(refresh=True)
+
+    def _reload_api(self, api_name: str) -> Optional[dict[str, object]]:
+        """
+        Download the catalog again to find an API missing from it, once per API name.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the missing API.
+
+        Returns
+        -------
+        dict[str, object] or None
+            Path and versions of the API, None if the NAS does not have it.
+        """
+        with self._api_list_lock:
+            # Another thread may have reloaded the catalog meanwhile
+            if api_name not in self.full_api_list and api_name not in self._unknown_apis:
+                self._unknown_apis.add(api_name)
+                self.get_api_list(refresh=True)
+        return self.full_api_list.get(api_name)
+
+    def _api_not_found(self, api_name: str) -> None:
+        """
+        Reload the outdated API catalog after error 102, once per API name.
+
+        The request error is raised by the caller.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API the NAS does not know.
+        """
+        with self._api_list_lock:
+            # An unsupported call in a loop must not download the catalog every time
+            if api_name in self._unknown_apis:
+                return
+            self._unknown_apis.add(api_name)
+        try:
+            self._api_cache.invalidate(
+                self._base_url, self._version, self.dsm_build)
+            if self.full_api_list:
+                with self._api_list_lock:
+                    self.get_api_list(refresh=True)
+        except Exception as e:
+            # The catalog is downloaded again on the next missing API, keep the original error
+            if self._debug is True:
+                print('Reloading the API list failed: %s' % e)
+
+    def _fetch_api_list(self) -> dict[str, object]:
+        """
+        Download the whole API catalog from the Synology DSM.
+
+        Returns
+        -------
+        dict[str, object]
+            API names mapped to their path and supported versions.
 
         Raises
         ------
@@ -350,29 +923,22 @@ class Authentication:
         if USE_EXCEPTIONS:
             # Check request for error, and raise our own error.:
             try:
-                response = requests.get(
-                    self._base_url + query_path, list_query, verify=self._verify)
+                response = self._http_session.get(
+                    self._base_url + query_path, params=list_query, verify=self._verify)
                 response.raise_for_status()
-                response_json = response.json()
-            except requests.exceptions.ConnectionError as e:
+                response_json = json_backend.loads(response.content)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                 raise SynoConnectionError(error_message=e.args[0])
             except requests.exceptions.HTTPError as e:
                 raise HTTPError(error_message=str(e.args))
-            except requests.JSONDecodeError as e:
+            except ValueError as e:
                 raise JSONDecodeError(error_message=str(e.args))
         else:
             # Will raise its own errors:
-            response_json = requests.get(
-                self._base_url + query_path, list_query, verify=self._verify).json()
+            response_json = json_backend.loads(self._http_session.get(
+                self._base_url + query_path, params=list_query, verify=self._verify).content)
 
-        if app is not None:
-            for key in response_json['data']:
-                if app.lower() in key.lower():
-                    self.app_api_list[key] = response_json['data'][key]
-        else:
-            self.full_api_list = response_json['data']
-
-        return
+        return response_json['data']
 
     def show_api_name_list(self) -> None:
         """Print the list of available API names."""
@@ -452,7 +1018,10 @@ class Authentication:
             "version": 1,
             "format": "module"
         }
-        response = self.request_data(api_name, "encryption.cgi", req_params)
+        # Part of a login, possibly a new one while the caller streams a list in this thread
+        with self.streaming(None):
+            response = self.request_data(
+                api_name, "encryption.cgi", req_params)
         return response["data"]
 
     def _encrypt_RSA(self, modulus, passphrase, text):
@@ -547,7 +1116,8 @@ class Authentication:
                             method: Optional[str] = None,
                             # "sequential" or "parallel"
                             mode: Optional[str] = "sequential",
-                            response_json: bool = True
+                            response_json: bool = True,
+                            stop_when_error: bool = True
                             ) -> dict[str, object] | str | list | requests.Response:  # 'post' or 'get'
         """
         Send multiple requests to the Synology API, either sequentially or in parallel.
@@ -571,6 +1141,8 @@ class Authentication:
             Defaults to "sequential".
         response_json : bool, optional
             Whether to return the response as JSON. If False, returns the raw response object.
+        stop_when_error : bool, optional
+            Whether DSM stops executing the remaining requests after the first failure. Defaults to True.
 
         Returns
         -------
@@ -594,7 +1166,7 @@ class Authentication:
             "method": "request",
             "version": f"{api_version}",
             "mode": mode,
-            "stop_when_error": "true",
+            "stop_when_error": str(stop_when_error).lower(),
             "_sid": self._sid,
             "compound": json.dumps(compound)
         }
@@ -606,15 +1178,25 @@ class Authentication:
         # X-SYNO-TOKEN is the token that we get when we login
         # We get it from the self._syno_token variable and by param 'enable_syno_token':'yes' in the login request
 
-        if method == 'get':
-            response = requests.get(url, req_param, verify=self._verify, headers={
-                                    "X-SYNO-TOKEN": self._syno_token})
-        elif method == 'post':
-            response = requests.post(url, req_param, verify=self._verify, headers={
-                                     "X-SYNO-TOKEN": self._syno_token})
+        response, decoded, error_code = self._send_request(
+            url, req_param, method, 'SYNO.Entry.Request')
+
+        # Session expired or kicked out: log in again and replay the request once
+        if self._session_lost(error_code, 'SYNO.Entry.Request'):
+            self._relogin(req_param['_sid'])
+            req_param['_sid'] = self._sid
+            response, decoded, error_code = self._send_request(
+                url, req_param, method, 'SYNO.Entry.Request')
+
+        if self.response_cache is not None:
+            # Mutations of the compound request invalidate the cached responses of their API
+            for request in compound or []:
+                self.response_cache.update(
+                    request.get('api', ''), request, None, self.session_key)
 
         if response_json is True:
-            return response.json()
+            # Not JSON: let requests raise its usual decode error
+            return decoded if decoded is not None else response.json()
         else:
             return response
 
@@ -623,8 +1205,9 @@ class Authentication:
                      api_path: str,
                      req_param: dict[str, object],
                      method: Optional[str] = None,
-                     response_json: bool = True
-                     ) -> dict[str, object] | str | list | requests.Response:  # 'post' or 'get'
+                     response_json: bool = True,
+                     stream_items: Optional[str] = None
+                     ) -> dict[str, object] | str | list | requests.Response | Iterator[object]:  # 'post' or 'get'
         """
         Send a request to the Synology API and handle errors based on the API name.
 
@@ -640,11 +1223,15 @@ class Authentication:
             The HTTP method to use ('get' or 'post'). Defaults to 'get' if not specified.
         response_json : bool, optional
             Whether to return the response as JSON. If False, returns the raw response object.
+        stream_items : str, optional
+            Key of a list in `data` to stream: the response is parsed incrementally and an iterator
+            over the list items is returned. Defaults to the key set with `streaming()`, if any.
 
         Returns
         -------
-        dict[str, object] or str or list or requests.Response
+        dict[str, object] or str or list or requests.Response or Iterator[object]
             The response from the API, either as a JSON-decoded object, string, list, or the raw response.
+            An iterator over the items of `data.<stream_items>` when streaming.
 
         Raises
         ------
@@ -660,6 +1247,20 @@ class Authentication:
             if isinstance(v, bool):
                 req_param[k] = str(v).lower()
 
+        if stream_items is None and response_json is True:
+            stream_items = getattr(self._local, 'stream_items', None)
+
+        # Queue the call if a batch is active in this thread
+        batch = self._current_batch()
+        if batch is not None and stream_items is None and batch.accepts(api_path, response_json):
+            return batch.add(api_name, req_param)
+
+        cache = self.response_cache
+        if cache is not None and stream_items is None and response_json is True:
+            cached = cache.get(api_name, req_param, self.session_key)
+            if cached is not None:
+                return cached
+
         if method is None:
             method = 'get'
 
@@ -667,137 +1268,628 @@ class Authentication:
 
         url = ('%s%s' % (self._base_url, api_path)) + '?api=' + api_name
 
-        # Do request and check for error:
-        response: Optional[requests.Response] = None
-        if USE_EXCEPTIONS:
-            # Catch and raise our own errors:
+        if stream_items is not None:
+            return self._stream_request(api_name, url, req_param, method, stream_items)
+
+        perform = partial(self._perform_request, api_name,
+                          url, req_param, method, response_json)
+        if self.coalesce_requests and response_json is True and is_read_method(req_param.get('method')):
+            # Identical read requests in flight share one round trip
+            return self.single_flight.do(ResponseCache.key(api_name, req_param), perform)
+        return perform()
+
+    def _perform_request(self,
+                         api_name: str,
+                         url: str,
+                         req_param: dict[str, object],
+                         method: str,
+                         response_json: bool
+                         ) -> dict[str, object] | str | list | requests.Response:
+        """
+        Send a request, replay it after a new login if the session expired and handle its errors.
+
+        Parameters
+        ----------
+        api_name : str
+            The name of the Synology API to call.
+        url : str
+            The URL of the API endpoint.
+        req_param : dict[str, object]
+            The parameters to include in the request.
+        method : str
+            The HTTP method to use ('get' or 'post').
+        response_json : bool
+            Whether to return the response as JSON. If False, returns the raw response object.
+
+        Returns
+        -------
+        dict[str, object] or str or list or requests.Response
+            The response from the API, either as a JSON-decoded object, string, list, or the raw response.
+        """
+        response, decoded, error_code = self._send_request(
+            url, req_param, method, api_name)
+
+        # Session expired or kicked out: log in again and replay the request once
+        if self._session_lost(error_code, api_name):
+            self._relogin(req_param['_sid'])
+            req_param['_sid'] = self._sid
+            response, decoded, error_code = self._send_request(
+                url, req_param, method, api_name)
+
+        if self.response_cache is not None:
+            self.response_cache.update(
+                api_name, req_param, decoded, self.session_key)
+
+        if error_code:
+            if self._debug is True:
+                print('Data request failed: ' +
+                      self._get_error_message(error_code, api_name))
+
+            # The API disappeared, the cached catalog is outdated (DSM or package update)
+            if error_code == CODE_API_NOT_FOUND:
+                self._api_not_found(api_name)
+
+            if USE_EXCEPTIONS:
+                raise self._get_error_exception(error_code, api_name)
+
+        if response_json is True:
+            # Not JSON: let requests raise its usual decode error
+            return decoded if decoded is not None else response.json()
+        else:
+            return response
+
+    def _send_request(self,
+                      url: str,
+                      req_param: dict[str, object],
+                      method: str,
+                      api_name: str = ''
+                      ) -> tuple[requests.Response, Optional[dict[str, object]], int]:
+        """
+        Send a request with the current session token, decode the response once and extract the DSM error code.
+
+        Transport errors, gateway errors and "system is busy" codes are retried according to the retry policy.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the API endpoint.
+        req_param : dict[str, object]
+            The parameters to include in the request.
+        method : str
+            The HTTP method to use ('get' or 'post').
+        api_name : str, optional
+            The name of the Synology API called, used to tell whether the request is safe to retry.
+
+        Returns
+        -------
+        tuple[requests.Response, Optional[dict[str, object]], int]
+            The raw response, its decoded JSON (None if not JSON) and its error code, 0 if successful or not a JSON response.
+
+        Raises
+        ------
+        SynoConnectionError
+            If a connection error or a timeout occurs, or `CircuitOpenError` while the circuit breaker is open.
+        HTTPError
+            If an HTTP error occurs.
+        """
+        hooks = self._hooks
+        info = RequestInfo(api_name, req_param.get('method'),
+                           req_param.get('version'), method)
+        for hook in hooks:
+            hook.before_request(info)
+
+        try:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.allow(self._base_url, api_name)
+            response, decoded, error_code = self._send_attempts(
+                url, req_param, method, api_name, info)
+        except Exception as e:
+            self._record_outcome(api_name, e)
+            info.finish(error=e)
+            for hook in hooks:
+                hook.on_error(info, e)
+            raise
+        self._record_outcome(api_name, status_code=response.status_code,
+                             error_code=error_code)
+
+        if hooks:
+            info.finish(response.status_code, error_code, len(response.content),
+                        request_bytes=_request_size(response.request))
+            for hook in hooks:
+                hook.after_response(info)
+            if error_code:
+                error = self._get_error_exception(error_code, api_name)
+                for hook in hooks:
+                    hook.on_error(info, error)
+        return response, decoded, error_code
+
+    def _send_attempts(self,
+                       url: str,
+                       req_param: dict[str, object],
+                       method: str,
+                       api_name: str,
+                       info: RequestInfo
+                       ) -> tuple[requests.Response, Optional[dict[str, object]], int]:
+        """
+        Send a request until it succeeds or the retry policy gives up.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the API endpoint.
+        req_param : dict[str, object]
+            The parameters to include in the request.
+        method : str
+            The HTTP method to use ('get' or 'post').
+        api_name : str
+            The name of the Synology API called.
+        info : RequestInfo
+            Description of the request given to the hooks, its retries are counted.
+
+        Returns
+        -------
+        tuple[requests.Response, Optional[dict[str, object]], int]
+            The raw response, its decoded JSON (None if not JSON) and its error code.
+        """
+        policy = self._current_retry_policy()
+        idempotent = policy.is_idempotent(api_name, req_param.get('method'))
+        policy.budget(self._base_url).deposit()
+
+        attempt = 0
+        while True:
+            # Do request and check for error:
             try:
-                if method == 'get':
-                    response = requests.get(url, req_param, verify=self._verify, headers={
-                                            "X-SYNO-TOKEN": self._syno_token})
-                elif method == 'post':
-                    response = requests.post(url, req_param, verify=self._verify, headers={
-                                             "X-SYNO-TOKEN": self._syno_token})
-            except requests.exceptions.ConnectionError as e:
+                with self.throttled(api_name):
+                    if method == 'post':
+                        response = self._http_session.post(url, req_param, verify=self._verify, headers={
+                            "X-SYNO-TOKEN": self._syno_token})
+                    else:
+                        response = self._http_session.get(url, params=req_param, verify=self._verify, headers={
+                            "X-SYNO-TOKEN": self._syno_token})
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if policy.should_retry(self._base_url, attempt, idempotent, error=e):
+                    self._wait_retry(policy, attempt, e)
+                    attempt += 1
+                    info.retries = attempt
+                    continue
+                if not USE_EXCEPTIONS:
+                    # Will raise its own error:
+                    raise
                 raise SynoConnectionError(error_message=e.args[0])
             except requests.exceptions.HTTPError as e:
+                if not USE_EXCEPTIONS:
+                    raise
                 raise HTTPError(error_message=str(e.args))
-        else:
-            # Will raise its own error:
-            if method == 'get':
-                response = requests.get(url, req_param, verify=self._verify, headers={
-                                        "X-SYNO-TOKEN": self._syno_token})
-            elif method == 'post':
-                response = requests.post(url, req_param, verify=self._verify, headers={
-                                         "X-SYNO-TOKEN": self._syno_token})
-
-        # Check for error response from dsm:
-        error_code = 0
-        if USE_EXCEPTIONS:
-            # Catch a JSON Decode error:
+
+            # Check for error response from dsm, the decoded body is reused by the caller:
             try:
-                error_code = self._get_error_code(response.json())
-            except requests.exceptions.JSONDecodeError:
-                pass
+                decoded = json_backend.loads(response.content)
+            except ValueError:
+                # Not a JSON response (file download, HTML error page, ...)
+                decoded = None
+            error_code = self._get_error_code(
+                decoded) if isinstance(decoded, dict) else 0
+            if self.throttle is not None:
+                self.throttle.report(self._base_url, api_name, error_code)
+
+            if policy.should_retry(self._base_url, attempt, idempotent,
+                                   status_code=response.status_code, error_code=error_code):
+                self._wait_retry(
+                    policy, attempt, error_code or response.status_code)
+                attempt += 1
+                info.retries = attempt
+                continue
+            return response, decoded, error_code
+
+    def _wait_retry(self, policy: RetryPolicy, attempt: int, reason: object) -> None:
+        """
+        Sleep before sending a failed request again.
+
+        Parameters
+        ----------
+        policy : RetryPolicy
+            The retry policy in use.
+        attempt : int
+            Number of retries already made.
+        reason : object
+            Error, DSM error code or HTTP status of the failed attempt, for the debug output.
+        """
+        delay = policy.backoff(attempt)
+        if self._debug is True:
+            print('Request failed (%s), retrying in %.2fs' % (reason, delay))
+        time.sleep(delay)
+
+    def _stream_request(self,
+                        api_name: str,
+                        url: str,
+                        req_param: dict[str, object],
+                        method: str,
+                        items_key: str,
+                        replay: bool = True
+                        ) -> Iterator[object]:
+        """
+        Send a request and yield the items of `data.<items_key>` while the response is read.
+
+        The request is sent when the iteration starts. Errors are known once the response is fully
+        read, they are raised after the last item.
+
+        Parameters
+        ----------
+        api_name : str
+            The name of the Synology API to call.
+        url : str
+            The URL of the API endpoint.
+        req_param : dict[str, object]
+            The parameters to include in the request.
+        method : str
+            The HTTP method to use ('get' or 'post').
+        items_key : str
+            Key of the list in `data`.
+        replay : bool, optional
+            Whether to log in again and replay the request if the session expired. Defaults to True.
+
+        Yields
+        ------
+        object
+            The items of the list, one by one.
+
+        Raises
+        ------
+        SynoConnectionError
+            If a connection error occurs.
+        """
+        hooks = self._hooks
+        info = RequestInfo(api_name, req_param.get('method'),
+                           req_param.get('version'), method)
+        for hook in hooks:
+            hook.before_request(info)
+
+        if method == 'post':
+            send = partial(self._http_session.post, data=req_param)
         else:
-            # Will raise its own error:
-            error_code = self._get_error_code(response.json())
+            send = partial(self._http_session.get, params=req_param)
+        received = [0]
+
+        def chunks(response: requests.Response) -> Iterator[bytes]:
+            """
+            Read the response body and count its size for the hooks.
+
+            Parameters
+            ----------
+            response : requests.Response
+                The streamed response.
+
+            Yields
+            ------
+            bytes
+                The chunks of the body.
+            """
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                received[0] += len(chunk)
+                yield chunk
+
+        try:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.allow(self._base_url, api_name)
+            # The request slot is held until the response is read or the iteration stopped
+            with self.throttled(api_name):
+                try:
+                    response = send(url, verify=self._verify, stream=True,
+                                    headers={"X-SYNO-TOKEN": self._syno_token})
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if not USE_EXCEPTIONS:
+                        raise
+                    raise SynoConnectionError(error_message=e.args[0])
+                with response:
+                    rest = yield from iter_json_items(chunks(response), ('data', items_key))
+        except GeneratorExit:
+            # The caller stopped early, the request itself went fine
+            self._record_outcome(api_name, status_code=response.status_code)
+            info.finish(response.status_code, 0, received[0],
+                        request_bytes=_request_size(response.request))
+            for hook in hooks:
+                hook.after_response(info)
+            raise
+        except BaseException as e:
+            self._record_outcome(api_name, e)
+            info.finish(response_bytes=received[0], error=e)
+            for hook in hooks:
+                hook.on_error(info, e)
+            raise
+
+        error_code = self._get_error_code(
+            rest) if isinstance(rest, dict) else 0
+        if self.throttle is not None:
+            self.throttle.report(self._base_url, api_name, error_code)
+        self._record_outcome(api_name, status_code=response.status_code,
+                             error_code=error_code)
+        if hooks:
+            info.finish(response.status_code, error_code, received[0],
+                        request_bytes=_request_size(response.request))
+            for hook in hooks:
+                hook.after_response(info)
+            if error_code:
+                error = self._get_error_exception(error_code, api_name)
+                for hook in hooks:
+                    hook.on_error(info, error)
+
+        # Nothing was yielded for an error, the request can still be replayed
+        if replay and self._session_lost(error_code, api_name):
+            self._relogin(req_param['_sid'])
+            req_param['_sid'] = self._sid
+            yield from self._stream_request(api_name, url, req_param, method, items_key, False)
+            return
 
         if error_code:
             if self._debug is True:
                 print('Data request failed: ' +
                       self._get_error_message(error_code, api_name))
+            if error_code == CODE_API_NOT_FOUND:
+                self._api_not_found(api_name)
+            if USE_EXCEPTIONS:
+                raise self._get_error_exception(error_code, api_name)
+
+    @contextmanager
+    def streaming(self, items_key: Optional[str]) -> Iterator[None]:
+        """
+        Stream the `data.<items_key>` list of the calls made inside the `with` block, in this thread.
+
+        API class methods returning `request_data` directly then return an iterator over the list
+        items, parsed incrementally from the response, so memory stays flat whatever its size.
+
+        Parameters
+        ----------
+        items_key : str or None
+            Key of the list in `data`, for example `'events'` or `'files'`. `None` turns streaming off
+            inside the block.
 
+        Yields
+        ------
+        None
+            Nothing, the block runs in streaming mode.
+
+        Examples
+        --------
+        ```python
+        with ss.streaming('events'):
+            events = ss.query_event_list_by_filter(limit=1000000)
+        for event in events:
+            print(event['id'])
+        ```
+        """
+        previous = getattr(self._local, 'stream_items', None)
+        self._local.stream_items = items_key
+        try:
+            yield
+        finally:
+            self._local.stream_items = previous
+
+    def _session_lost(self, error_code: int, api_name: str) -> bool:
+        """
+        Tell whether an error code means the session has to be opened again.
+
+        Parameters
+        ----------
+        error_code : int
+            Error code returned by the API.
+        api_name : str
+            Name of the API called.
+
+        Returns
+        -------
+        bool
+            True if the request should be replayed after a new login.
+        """
+        # Login and encryption APIs are part of the login itself, never replay them
+        return (self._auto_relogin and error_code in SESSION_ERROR_CODES
+                and not api_name.startswith('SYNO.API.'))
+
+    def _relogin(self, stale_sid: Optional[str]) -> None:
+        """
+        Log in again after the session expired, only once for all the threads that saw it expire.
+
+        Parameters
+        ----------
+        stale_sid : str or None
+            The session ID that was rejected by the NAS.
+        """
+        with self._login_lock:
+            # Another thread already replaced the stale session
+            if self._sid is not None and self._sid != stale_sid:
+                return
+            if self._debug is True:
+                print('Session expired, logging in again')
+            self._session_expire = True
+            self.login()
+
+    def batch(self,
+              max_size: int = 30,
+              mode: str = 'parallel',
+              method: str = 'post'
+              ) -> RequestBatch:
+        """
+        Create a batch that sends the calls made inside its `with` block as compound requests.
+
+        Inside the block, calls to API class methods that return `request_data` directly return a
+        `BatchFuture`, resolved with the response once the batch is sent.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            Maximum number of calls per compound request, bigger batches are split. Defaults to `30`.
+        mode : str, optional
+            DSM execution mode of each compound request, `'sequential'` or `'parallel'`. Defaults to `'parallel'`.
+        method : str, optional
+            HTTP method used for the compound requests, `'get'` or `'post'`. Defaults to `'post'`.
+
+        Returns
+        -------
+        RequestBatch
+            The batch, to be used as a context manager.
+        """
+        return RequestBatch(self, max_size, mode, method)
+
+    def _current_batch(self) -> Optional[RequestBatch]:
+        """
+        Get the innermost batch active in the current thread.
+
+        Returns
+        -------
+        RequestBatch or None
+            The active batch, if any.
+        """
+        batches = getattr(self._local, 'batches', None)
+        return batches[-1] if batches else None
+
+    def _push_batch(self, batch: RequestBatch) -> None:
+        """
+        Activate a batch in the current thread.
+
+        Parameters
+        ----------
+        batch : RequestBatch
+            The batch to activate.
+        """
+        if getattr(self._local, 'batches', None) is None:
+            self._local.batches = []
+        self._local.batches.append(batch)
+
+    def _pop_batch(self, batch: RequestBatch) -> None:
+        """
+        Deactivate a batch in the current thread.
+
+        Parameters
+        ----------
+        batch : RequestBatch
+            The batch to deactivate.
+        """
+        self._local.batches.remove(batch)
+
+    def _resolve_compound_result(self, api_name: str, result: dict[str, object], future: Future) -> None:
+        """
+        Resolve the future of a batched call with its part of a compound response.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API called.
+        result : dict[str, object]
+            The part of the compound response for this call.
+        future : Future
+            The future to resolve.
+        """
+        error_code = self._get_error_code(result)
+        if error_code:
+            if self._debug is True:
+                print('Data request failed: ' +
+                      self._get_error_message(error_code, api_name))
             if USE_EXCEPTIONS:
-                # Download station error:
-                if api_name.find('DownloadStation') > -1:
-                    raise DownloadStationError(error_code=error_code)
-                # File station error:
-                elif api_name.find('FileStation') > -1:
-                    raise FileStationError(error_code=error_code)
-                # Audio station error:
-                elif api_name.find('AudioStation') > -1:
-                    raise AudioStationError(error_code=error_code)
-                # ABM (ActiveBackupOffice365) error:
-                elif api_name.find('ActiveBackupOffice365') > -1:
-                    raise ActiveBackupMicrosoftError(error_code=error_code)
-                # Active backup error:
-                elif api_name.find('ActiveBackup') > -1:
-                    raise ActiveBackupError(error_code=error_code)
-                # Virtualization error:
-                elif api_name.find('Virtualization') > -1:
-                    raise VirtualizationError(error_code=error_code)
-                # Syno backup error:
-                elif api_name.find('SYNO.Backup') > -1:
-                    raise BackupError(error_code=error_code)
-                # CloudSync error:
-                elif api_name.find('CloudSync') > -1:
-                    raise CloudSyncError(error_code=error_code)
-                # Core certificate error:
-                elif api_name.find('Core.Certificate') > -1:
-                    raise CertificateError(error_code=error_code)
-                # DHCP Server error:
-                elif api_name.find('DHCPServer') > -1 or api_name == 'SYNO.Core.TFTP':
-                    raise DHCPServerError(error_code=error_code)
-                # Active Directory error:
-                elif api_name.find('ActiveDirectory') > -1 or api_name in ('SYNO.Auth.ForgotPwd', 'SYNO.Entry.Request'):
-                    raise DirectoryServerError(error_code=error_code)
-                # Docker Error:
-                elif api_name.find('Docker') > -1:
-                    raise DockerError(error_code=error_code)
-                # Synology drive admin error:
-                elif api_name.find('SynologyDrive') > -1 or api_name == 'SYNO.C2FS.Share':
-                    raise DriveAdminError(error_code=error_code)
-                # Log center error:
-                elif api_name.find('LogCenter') > -1:
-                    raise LogCenterError(error_code=error_code)
-                # Note station error:
-                elif api_name.find('NoteStation') > -1:
-                    raise NoteStationError(error_code=error_code)
-                # OAUTH error:
-                elif api_name.find('SYNO.OAUTH') > -1:
-                    raise OAUTHError(error_code=error_code)
-                # Photo station error:
-                elif api_name.find('SYNO.Foto') > -1:
-                    raise PhotosError(error_code=error_code)
-                # Security advisor error:
-                elif api_name.find('SecurityAdvisor') > -1:
-                    raise SecurityAdvisorError(error_code=error_code)
-                # Task Scheduler error:
-                elif api_name.find('SYNO.Core.TaskScheduler') > -1:
-                    raise TaskSchedulerError(error_code=error_code)
-                # Event Scheduler error:
-                elif api_name.find('SYNO.Core.EventScheduler') > -1:
-                    raise EventSchedulerError(error_code=error_code)
-                # Universal search error:
-                elif api_name.find('SYNO.Finder') > -1:
-                    raise UniversalSearchError(error_code=error_code)
-                # USB Copy error:
-                elif api_name.find('SYNO.USBCopy') > -1:
-                    raise USBCopyError(error_code=error_code)
-                # VPN Server error:
-                elif api_name.find('VPNServer') > -1:
-                    raise VPNError(error_code=error_code)
-                # Core:
-                elif api_name.find('SYNO.Core') > -1:
-                    raise CoreError(error_code=error_code)
-                # Core Sys Info:
-                elif api_name.find('SYNO.Storage') > -1:
-                    raise CoreSysInfoError(error_code=error_code)
-                elif api_name.find('SYNO.ResourceMonitor') > -1:
-                    raise CoreSysInfoError(error_code=error_code)
-                elif (api_name in ('SYNO.Backup.Service.NetworkBackup', 'SYNO.Finder.FileIndexing.Status',
-                                   'SYNO.S2S.Server.Pair')):
-                    raise CoreSysInfoError(error_code=error_code)
-                # Unhandled API:
-                else:
-                    raise UndefinedError(
-                        error_code=error_code, api_name=api_name)
+                future.set_exception(
+                    self._get_error_exception(error_code, api_name))
+                return
+        future.set_result(result)
 
-        if response_json is True:
-            return response.json()
+    @staticmethod
+    def _get_error_exception(error_code: int, api_name: str) -> Exception:
+        """
+        Build the exception matching an error code returned by an API.
+
+        Parameters
+        ----------
+        error_code : int
+            Error code.
+        api_name : str
+            Name of the API.
+
+        Returns
+        -------
+        Exception
+            The exception to raise for the API being called.
+        """
+        # Download station error:
+        if api_name.find('DownloadStation') > -1:
+            return DownloadStationError(error_code=error_code)
+        # File station error:
+        elif api_name.find('FileStation') > -1:
+            return FileStationError(error_code=error_code)
+        # Audio station error:
+        elif api_name.find('AudioStation') > -1:
+            return AudioStationError(error_code=error_code)
+        # ABM (ActiveBackupOffice365) error:
+        elif api_name.find('ActiveBackupOffice365') > -1:
+            return ActiveBackupMicrosoftError(error_code=error_code)
+        # Active backup error:
+        elif api_name.find('ActiveBackup') > -1:
+            return ActiveBackupError(error_code=error_code)
+        # Virtualization error:
+        elif api_name.find('Virtualization') > -1:
+            return VirtualizationError(error_code=error_code)
+        # Syno backup error:
+        elif api_name.find('SYNO.Backup') > -1:
+            return BackupError(error_code=error_code)
+        # CloudSync error:
+        elif api_name.find('CloudSync') > -1:
+            return CloudSyncError(error_code=error_code)
+        # Core certificate error:
+        elif api_name.find('Core.Certificate') > -1:
+            return CertificateError(error_code=error_code)
+        # DHCP Server error:
+        elif api_name.find('DHCPServer') > -1 or api_name == 'SYNO.Core.TFTP':
+            return DHCPServerError(error_code=error_code)
+        # Active Directory error:
+        elif api_name.find('ActiveDirectory') > -1 or api_name in ('SYNO.Auth.ForgotPwd', 'SYNO.Entry.Request'):
+            return DirectoryServerError(error_code=error_code)
+        # Docker Error:
+        elif api_name.find('Docker') > -1:
+            return DockerError(error_code=error_code)
+        # Synology drive admin error:
+        elif api_name.find('SynologyDrive') > -1 or api_name == 'SYNO.C2FS.Share':
+            return DriveAdminError(error_code=error_code)
+        # Log center error:
+        elif api_name.find('LogCenter') > -1:
+            return LogCenterError(error_code=error_code)
+        # Note station error:
+        elif api_name.find('NoteStation') > -1:
+            return NoteStationError(error_code=error_code)
+        # OAUTH error:
+        elif api_name.find('SYNO.OAUTH') > -1:
+            return OAUTHError(error_code=error_code)
+        # Photo station error:
+        elif api_name.find('SYNO.Foto') > -1:
+            return PhotosError(error_code=error_code)
+        # Security advisor error:
+        elif api_name.find('SecurityAdvisor') > -1:
+            return SecurityAdvisorError(error_code=error_code)
+        # Task Scheduler error:
+        elif api_name.find('SYNO.Core.TaskScheduler') > -1:
+            return TaskSchedulerError(error_code=error_code)
+        # Event Scheduler error:
+        elif api_name.find('SYNO.Core.EventScheduler') > -1:
+            return EventSchedulerError(error_code=error_code)
+        # Universal search error:
+        elif api_name.find('SYNO.Finder') > -1:
+            return UniversalSearchError(error_code=error_code)
+        # USB Copy error:
+        elif api_name.find('SYNO.USBCopy') > -1:
+            return USBCopyError(error_code=error_code)
+        # VPN Server error:
+        elif api_name.find('VPNServer') > -1:
+            return VPNError(error_code=error_code)
+        # Core:
+        elif api_name.find('SYNO.Core') > -1:
+            return CoreError(error_code=error_code)
+        # Core Sys Info:
+        elif api_name.find('SYNO.Storage') > -1:
+            return CoreSysInfoError(error_code=error_code)
+        elif api_name.find('SYNO.ResourceMonitor') > -1:
+            return CoreSysInfoError(error_code=error_code)
+        elif (api_name in ('SYNO.Backup.Service.NetworkBackup', 'SYNO.Finder.FileIndexing.Status',
+                           'SYNO.S2S.Server.Pair')):
+            return CoreSysInfoError(error_code=error_code)
+        # Unhandled API:
         else:
-            return response
+            return UndefinedError(
+                error_code=error_code, api_name=api_name)
 
     @staticmethod
     def _get_error_code(response: dict[str, object]) -> int:
@@ -924,6 +2016,30 @@ class Authentication:
         """
         return self._base_url
 
+    @property
+    def session_key(self) -> tuple[str, str, str, bool]:
+        """
+        Get the key identifying this session in a `SessionRegistry`.
+
+        Returns
+        -------
+        tuple[str, str, str, bool]
+            Host, port, username and whether HTTPS is used.
+        """
+        return session_key(self._ip_address, self._port, self._username, self._secure)
+
+    @property
+    def http_session(self) -> requests.Session:
+        """
+        Get the pooled HTTP session shared by every request to the NAS.
+
+        Returns
+        -------
+        requests.Session
+            Keep-alive HTTP session.
+        """
+        return self._http_session
+
     @property
     def syno_token(self) -> str:
         """
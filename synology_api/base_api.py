@@ -4,8 +4,10 @@ Base API module for Synology DSM.
 Provides a base class for all API implementations, handling authentication,
 session management, and connection setup to a Synology NAS device.
 """
+from functools import partial
 from typing import Optional, Any
 from . import auth as syn
+from .session_registry import SessionRegistry
 
 
 class BaseApi(object):
@@ -13,7 +15,9 @@ class BaseApi(object):
     Base class to be used for all API implementations.
 
     Takes auth and connection information to create a session to the NAS.
-    The session is created on instanciation.
+    The session is created on instanciation, or reused from `session_registry` when one is already
+    open for the same host, port, user and scheme. Instances created without credentials reuse
+    `shared_session`, the first session opened.
 
     Parameters
     ----------
@@ -45,6 +49,8 @@ class BaseApi(object):
 
     # Class-level attribute to store the shared session
     shared_session: Optional[syn.Authentication] = None
+    # Open sessions keyed by (host, port, user, secure), shared by all the API classes
+    session_registry: SessionRegistry = SessionRegistry()
 
     def __init__(self,
                  ip_address: str,
@@ -97,33 +103,103 @@ class BaseApi(object):
         """
         self.application = application
 
-        # Reuse shared session if it exists, otherwise create a new one
-        if BaseApi.shared_session:
-            self.session = BaseApi.shared_session
-        else:
-            if not all([ip_address, port, username, password]):
+        if not all([ip_address, port, username, password]):
+            # Reuse the shared session, for scripts creating API classes without credentials
+            if BaseApi.shared_session is None:
                 raise ValueError(
                     "Missing required credentials for initial authentication.")
+            self.session = BaseApi.shared_session
+        else:
+            # Reuse the session of this user on this NAS if it exists, otherwise create a new one
+            key = SessionRegistry.key(ip_address, port, username, secure)
+            self.session = BaseApi.session_registry.get_or_create(key, partial(
+                self._open_session, ip_address, port, username, password, secure, cert_verify, dsm_version,
+                debug, otp_code, device_id, device_name, application))
 
-            self.session = syn.Authentication(
-                ip_address, port, username, password, secure, cert_verify, dsm_version, debug, otp_code,
-                device_id, device_name
-            )
-            self.session.login()
-            self.session.get_api_list(self.application)
-            self.session.get_api_list()
-
-            # Store the new session in the shared class-level attribute
-            BaseApi.shared_session = self.session
+            # The first session opened stays the shared one
+            if BaseApi.shared_session is None:
+                BaseApi.shared_session = self.session
 
         # Initialize other attributes from the session
         self.request_data: Any = self.session.request_data
         self.batch_request = self.session.request_multi_datas
+        self.batch: Any = self.session.batch
+        self.streaming: Any = self.session.streaming
+        self.request_options: Any = self.session.request_options
         self.core_list: Any = self.session.app_api_list
         self.gen_list: Any = self.session.full_api_list
-        self._sid: str = self.session.sid
         self.base_url: str = self.session.base_url
 
+    @staticmethod
+    def _open_session(ip_address: str,
+                      port: str,
+                      username: str,
+                      password: str,
+                      secure: bool,
+                      cert_verify: bool,
+                      dsm_version: int,
+                      debug: bool,
+                      otp_code: Optional[str],
+                      device_id: Optional[str],
+                      device_name: Optional[str],
+                      application: str
+                      ) -> syn.Authentication:
+        """
+        Create a session, log in and load the API list.
+
+        Parameters
+        ----------
+        ip_address : str
+            The IP/DNS address of the NAS.
+        port : str
+            The port of the NAS.
+        username : str
+            The username to use for authentication.
+        password : str
+            The password to use for authentication.
+        secure : bool
+            Whether to use HTTPS or not.
+        cert_verify : bool
+            Whether to verify the SSL certificate or not.
+        dsm_version : int
+            The DSM version.
+        debug : bool
+            Whether to print debug messages or not.
+        otp_code : str or None
+            The OTP code to use for authentication.
+        device_id : str or None
+            Device ID for device binding.
+        device_name : str or None
+            Device name for device binding.
+        application : str
+            The application context for API list retrieval.
+
+        Returns
+        -------
+        Authentication
+            The logged in session.
+        """
+        session = syn.Authentication(
+            ip_address, port, username, password, secure, cert_verify, dsm_version, debug, otp_code,
+            device_id, device_name
+        )
+        session.login()
+        session.get_api_list(application)
+        session.get_api_list()
+        return session
+
+    @property
+    def _sid(self) -> str:
+        """
+        Get the current session ID, which changes when the session logs in again.
+
+        Returns
+        -------
+        str
+            Session ID.
+        """
+        return self.session.sid
+
     def logout(self) -> None:
         """
         Close current session.
@@ -136,6 +212,7 @@ class BaseApi(object):
         api_name = 'hotfix'  # fix for docs_parser.py issue
         if self.session:
             self.session.logout()
+            BaseApi.session_registry.remove(self.session)
             if BaseApi.shared_session == self.session:
                 BaseApi.shared_session = None
         return
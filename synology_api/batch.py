@@ -0,0 +1,236 @@
+"""
+Compound request batching for Synology DSM.
+
+Queues the calls made by API classes inside a `with api.batch():` block and sends them as
+`SYNO.Entry.Request` compound requests, so many read calls cost a single round trip.
+"""
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .auth import Authentication
+
+# Only APIs served by entry.cgi can be part of a compound request
+COMPOUND_API_PATH = 'entry.cgi'
+
+
+class BatchFuture(Future):
+    """
+    Future resolved with the response of one call of a batch.
+
+    Asking for the result of a pending call sends the batch right away, so it is safe to use
+    inside the `with` block.
+
+    Parameters
+    ----------
+    batch : RequestBatch
+        The batch the call belongs to.
+    """
+
+    def __init__(self, batch: RequestBatch) -> None:
+        """
+        Initialize the BatchFuture object.
+
+        Parameters
+        ----------
+        batch : RequestBatch
+            The batch the call belongs to.
+        """
+        super().__init__()
+        self._batch: RequestBatch = batch
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        """
+        Return the response of the call, sending the batch first if needed.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for the response. Defaults to `None` (wait forever).
+
+        Returns
+        -------
+        Any
+            The decoded response of the call, as `request_data` would have returned it.
+        """
+        if not self.done():
+            self._batch.flush()
+        return super().result(timeout)
+
+
+class RequestBatch(object):
+    """
+    Collect API calls and send them as `SYNO.Entry.Request` compound requests.
+
+    While the batch is active in a thread, `Authentication.request_data` queues the calls that can
+    be part of a compound request and returns a `BatchFuture` instead of the response. Calls that
+    cannot be batched (non `entry.cgi` APIs, raw responses) are still sent right away.
+
+    Parameters
+    ----------
+    session : Authentication
+        The session used to send the compound requests.
+    max_size : int, optional
+        Maximum number of calls per compound request, bigger batches are split. Defaults to `30`.
+    mode : str, optional
+        DSM execution mode of each compound request, `'sequential'` or `'parallel'`. Defaults to `'parallel'`.
+    method : str, optional
+        HTTP method used for the compound requests, `'get'` or `'post'`. Defaults to `'post'`.
+
+    Examples
+    --------
+    ```python
+    with sys_info.batch() as batch:
+        network = sys_info.network_status()
+        services = sys_info.services_status()
+        storage = sys_info.storage()
+    print(network.result()['data'])
+    ```
+    """
+
+    def __init__(self,
+                 session: Authentication,
+                 max_size: int = 30,
+                 mode: str = 'parallel',
+                 method: str = 'post'
+                 ) -> None:
+        """
+        Initialize the RequestBatch object.
+
+        Parameters
+        ----------
+        session : Authentication
+            The session used to send the compound requests.
+        max_size : int, optional
+            Maximum number of calls per compound request, bigger batches are split. Defaults to `30`.
+        mode : str, optional
+            DSM execution mode of each compound request, `'sequential'` or `'parallel'`. Defaults to `'parallel'`.
+        method : str, optional
+            HTTP method used for the compound requests, `'get'` or `'post'`. Defaults to `'post'`.
+        """
+        if max_size < 1:
+            raise ValueError('max_size must be greater than 0')
+
+        self._session: Authentication = session
+        self.max_size: int = max_size
+        self.mode: str = mode
+        self.method: str = method
+        self._pending: list[tuple[str, dict[str, object], BatchFuture]] = []
+
+    def accepts(self, api_path: str, response_json: bool) -> bool:
+        """
+        Tell whether a call can be part of a compound request.
+
+        Parameters
+        ----------
+        api_path : str
+            The path to the API endpoint.
+        response_json : bool
+            Whether the caller expects the decoded JSON response.
+
+        Returns
+        -------
+        bool
+            True if the call can be queued.
+        """
+        return response_json and api_path == COMPOUND_API_PATH
+
+    def add(self, api_name: str, req_param: dict[str, object]) -> BatchFuture:
+        """
+        Queue a call.
+
+        Parameters
+        ----------
+        api_name : str
+            The name of the Synology API to call.
+        req_param : dict[str, object]
+            The parameters of the call, including `version` and `method`.
+
+        Returns
+        -------
+        BatchFuture
+            Future resolved with the response of the call.
+        """
+        request = {'api': api_name}
+        for key, val in req_param.items():
+            if key != '_sid':
+                request[key] = val
+
+        future = BatchFuture(self)
+        self._pending.append((api_name, request, future))
+        return future
+
+    def flush(self) -> None:
+        """Send the queued calls, `max_size` calls per compound request, and resolve their futures."""
+        while self._pending:
+            chunk = self._pending[:self.max_size]
+            del self._pending[:self.max_size]
+            self._send(chunk)
+
+    def cancel(self) -> None:
+        """Drop the queued calls without sending them."""
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending = []
+
+    def _send(self, chunk: list[tuple[str, dict[str, object], BatchFuture]]) -> None:
+        """
+        Send one compound request and resolve the futures of its calls.
+
+        Parameters
+        ----------
+        chunk : list[tuple[str, dict[str, object], BatchFuture]]
+            The queued calls to send.
+        """
+        try:
+            response = self._session.request_multi_datas(
+                [request for _, request, _ in chunk], self.method, self.mode, stop_when_error=False)
+        except Exception as e:
+            for _, _, future in chunk:
+                future.set_exception(e)
+            return
+
+        results = []
+        if response.get('success'):
+            results = response['data'].get('result', [])
+
+        for index, (api_name, _, future) in enumerate(chunk):
+            if index < len(results):
+                result = results[index]
+            else:
+                # The whole compound request failed, report its error on every call
+                result = {'success': False, 'error': response.get(
+                    'error') or {'code': 100}}
+            self._session._resolve_compound_result(api_name, result, future)
+
+    def __enter__(self) -> RequestBatch:
+        """
+        Start queuing the calls made from the current thread.
+
+        Returns
+        -------
+        RequestBatch
+            This batch.
+        """
+        self._session._push_batch(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        """
+        Stop queuing and send the queued calls, or drop them if the block raised.
+
+        Parameters
+        ----------
+        exc_type : Any
+            Exception type raised in the block, if any.
+        exc_value : Any
+            Exception raised in the block, if any.
+        traceback : Any
+            Traceback of the exception, if any.
+        """
+        self._session._pop_batch(self)
+        if exc_type is None:
+            self.flush()
+        else:
+            self.cancel()
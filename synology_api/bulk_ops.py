@@ -0,0 +1,373 @@
+"""
+Bulk copy, move and delete on FileStation.
+
+`start_copy_move` and `start_delete_task` accept many paths per task. `BulkOperation` takes any
+number of paths, drops the deletions already covered by a listed parent folder, groups the paths into
+multi-path tasks sized to the number of concurrent tasks and to the length DSM accepts for a
+request, and keeps a bounded number of background tasks running, checking them with one compound
+request per round. The progress and the errors of all the tasks are reported per input path.
+"""
+from __future__ import annotations
+import math
+import posixpath
+import time
+from typing import Callable, Iterable, Optional
+from urllib.parse import quote
+
+from .exceptions import FileStationError
+from .filestation import FileStation
+from .tasks import BackgroundTask, poll
+
+# Maximum number of paths in one task
+MAX_PATHS = 500
+# Maximum length of the URL encoded `path` parameter of one task, DSM rejects long request lines
+MAX_CHARS = 4000
+
+
+def collapse_paths(paths: Iterable[str]) -> dict[str, list[str]]:
+    """
+    Drop the paths inside another listed folder, deleting the folder covers them.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Absolute remote paths.
+
+    Returns
+    -------
+    dict[str, list[str]]
+        The remaining paths, sorted, mapped to the input paths they cover, themselves included.
+    """
+    covered: dict[str, list[str]] = {}
+    for path in sorted(set(paths), key=lambda path: path.rstrip('/') or '/'):
+        parent = posixpath.dirname(path.rstrip('/'))
+        while parent not in covered and parent not in ('/', ''):
+            parent = posixpath.dirname(parent)
+        if parent in covered:
+            covered[parent].append(path)
+        else:
+            covered[path.rstrip('/') or '/'] = [path]
+    return covered
+
+
+def plan_batches(paths: Iterable[str],
+                 max_tasks: int = 1,
+                 max_paths: int = MAX_PATHS,
+                 max_chars: int = MAX_CHARS
+                 ) -> list[list[str]]:
+    """
+    Group paths into multi-path tasks.
+
+    The paths are spread over at least `max_tasks` tasks when there are enough of them, so all the
+    concurrent tasks get work, with at most `max_paths` paths and `max_chars` characters each.
+    Neighbouring paths, sorted by name, go to the same task.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Absolute remote paths.
+    max_tasks : int, optional
+        Number of tasks run at the same time. Defaults to `1`.
+    max_paths : int, optional
+        Maximum number of paths in one task. Defaults to `500`.
+    max_chars : int, optional
+        Maximum length of the URL encoded path list of one task, a longer single path gets its own
+        task. Defaults to `4000`.
+
+    Returns
+    -------
+    list[list[str]]
+        The paths of each task.
+    """
+    paths = sorted(paths)
+    size = max(1, min(max_paths, math.ceil(len(paths) / max(1, max_tasks))))
+    batches = []
+    batch, chars = [], 6
+    for path in paths:
+        # '"path",' once encoded, the list starts with '[' and ends with ']'
+        length = len(quote(path, safe='')) + 9
+        if batch and (len(batch) >= size or chars + length > max_chars):
+            batches.append(batch)
+            batch, chars = [], 6
+        batch.append(path)
+        chars += length
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class BulkOperation(object):
+    """
+    Copy, move or delete many paths with a few multi-path background tasks.
+
+    Parameters
+    ----------
+    fs : FileStation
+        A logged in FileStation instance.
+    max_tasks : int, optional
+        Number of background tasks run at the same time. Defaults to `4`.
+    max_paths : int, optional
+        Maximum number of paths in one task. Defaults to `500`.
+    max_chars : int, optional
+        Maximum length of the URL encoded path list of one task. Defaults to `4000`.
+
+    Examples
+    --------
+    ```python
+    bulk = BulkOperation(fs, max_tasks=8)
+    result = bulk.move({path: '/archive/' + year_of(path) for path in paths},
+                       progress_callback=lambda done, total: print('%d/%d' % (done, total)))
+    print(result['failed'])
+    bulk.delete(old_paths)
+    ```
+    """
+
+    def __init__(self,
+                 fs: FileStation,
+                 max_tasks: int = 4,
+                 max_paths: int = MAX_PATHS,
+                 max_chars: int = MAX_CHARS
+                 ) -> None:
+        """
+        Initialize the BulkOperation object.
+
+        Parameters
+        ----------
+        fs : FileStation
+            A logged in FileStation instance.
+        max_tasks : int, optional
+            Number of background tasks run at the same time. Defaults to `4`.
+        max_paths : int, optional
+            Maximum number of paths in one task. Defaults to `500`.
+        max_chars : int, optional
+            Maximum length of the URL encoded path list of one task. Defaults to `4000`.
+        """
+        if max_tasks < 1:
+            raise ValueError('max_tasks must be greater than 0')
+
+        self.fs: FileStation = fs
+        self.max_tasks: int = max_tasks
+        self.max_paths: int = max_paths
+        self.max_chars: int = max_chars
+
+    def copy(self,
+             paths: Iterable[str] | dict[str, str],
+             dest_folder_path: Optional[str] = None,
+             overwrite: Optional[bool] = None,
+             progress_callback: Optional[Callable[[int, int], None]] = None
+             ) -> dict[str, object]:
+        """
+        Copy many files and folders.
+
+        Parameters
+        ----------
+        paths : Iterable[str] or dict[str, str]
+            Paths to copy, or paths mapped to their destination folder.
+        dest_folder_path : str, optional
+            Destination folder of all the paths, required unless `paths` is a dict.
+        overwrite : bool, optional
+            If True, existing files are overwritten, if False they are skipped. Defaults to `None`
+            (the tasks fail on existing files).
+        progress_callback : Callable[[int, int], None], optional
+            Called as `progress_callback(done, total)`, in paths, after each status check.
+
+        Returns
+        -------
+        dict[str, object]
+            Summary, see `run`.
+        """
+        return self.run('copy_move', _destinations(paths, dest_folder_path),
+                        {'overwrite': overwrite}, progress_callback)
+
+    def move(self,
+             paths: Iterable[str] | dict[str, str],
+             dest_folder_path: Optional[str] = None,
+             overwrite: Optional[bool] = None,
+             progress_callback: Optional[Callable[[int, int], None]] = None
+             ) -> dict[str, object]:
+        """
+        Move many files and folders.
+
+        Parameters
+        ----------
+        paths : Iterable[str] or dict[str, str]
+            Paths to move, or paths mapped to their destination folder.
+        dest_folder_path : str, optional
+            Destination folder of all the paths, required unless `paths` is a dict.
+        overwrite : bool, optional
+            If True, existing files are overwritten, if False they are skipped. Defaults to `None`
+            (the tasks fail on existing files).
+        progress_callback : Callable[[int, int], None], optional
+            Called as `progress_callback(done, total)`, in paths, after each status check.
+
+        Returns
+        -------
+        dict[str, object]
+            Summary, see `run`.
+        """
+        return self.run('copy_move', _destinations(paths, dest_folder_path),
+                        {'overwrite': overwrite, 'remove_src': True}, progress_callback)
+
+    def delete(self,
+               paths: Iterable[str],
+               recursive: bool = True,
+               progress_callback: Optional[Callable[[int, int], None]] = None
+               ) -> dict[str, object]:
+        """
+        Delete many files and folders.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Paths to delete.
+        recursive : bool, optional
+            If False, only files and empty folders are deleted. Defaults to `True`.
+        progress_callback : Callable[[int, int], None], optional
+            Called as `progress_callback(done, total)`, in paths, after each status check.
+
+        Returns
+        -------
+        dict[str, object]
+            Summary, see `run`.
+        """
+        return self.run('delete', {None: list(paths)}, {'recursive': recursive}, progress_callback)
+
+    def run(self,
+            kind: str,
+            paths: dict[Optional[str], list[str]],
+            options: dict[str, object],
+            progress_callback: Optional[Callable[[int, int], None]] = None
+            ) -> dict[str, object]:
+        """
+        Run the tasks of a bulk operation, `max_tasks` at a time.
+
+        A failed task reports its error for all of its paths, the other tasks go on. If the run is
+        interrupted, the running tasks are stopped.
+
+        Parameters
+        ----------
+        kind : str
+            `'copy_move'` or `'delete'`.
+        paths : dict[Optional[str], list[str]]
+            Paths by destination folder, `None` for deletions.
+        options : dict[str, object]
+            Other arguments of the start method.
+        progress_callback : Callable[[int, int], None], optional
+            Called as `progress_callback(done, total)`, in paths, after each status check.
+
+        Returns
+        -------
+        dict[str, object]
+            Summary of the operation, with the keys:
+            - `done`: the paths processed.
+            - `failed`: the paths of the failed tasks, mapped to the error.
+            - `tasks`: number of background tasks started.
+            - `elapsed`: duration in seconds.
+        """
+        start = time.perf_counter()
+        # (destination, paths of the task, input paths covered)
+        queue = []
+        for dest, group in paths.items():
+            if kind == 'delete':
+                covered = collapse_paths(group)
+            else:
+                # A copied folder lands in the destination with its content, nested paths are kept
+                covered = {path: [path] for path in set(group)}
+            for batch in plan_batches(covered, self.max_tasks, self.max_paths, self.max_chars):
+                queue.append(
+                    (dest, batch, [p for path in batch for p in covered[path]]))
+        queue.reverse()
+
+        total = sum(len(item[2]) for item in queue)
+        result = {'done': [], 'failed': {}, 'tasks': 0}
+        running: dict[BackgroundTask, list[str]] = {}
+        try:
+            while queue or running:
+                while queue and len(running) < self.max_tasks:
+                    dest, batch, covered = queue.pop()
+                    result['tasks'] += 1
+                    try:
+                        running[self._start(
+                            kind, dest, batch, options)] = covered
+                    except FileStationError as e:
+                        result['failed'].update((path, e) for path in covered)
+
+                poll(running)
+                finished = [task for task in running if task.done]
+                for task in finished:
+                    covered = running.pop(task)
+                    if task.error is None:
+                        result['done'] += covered
+                    else:
+                        result['failed'].update(
+                            (path, task.error) for path in covered)
+
+                if progress_callback is not None:
+                    progress = sum((task.progress or 0) * len(covered)
+                                   for task, covered in running.items())
+                    progress_callback(
+                        len(result['done']) + len(result['failed']) + int(progress), total)
+                # Start the next tasks right away when some finished, wait otherwise
+                if running and not (finished and queue):
+                    time.sleep(min(task.interval for task in running))
+        except BaseException:
+            for task in running:
+                try:
+                    task.stop()
+                except Exception:
+                    pass
+            raise
+
+        result['elapsed'] = time.perf_counter() - start
+        return result
+
+    def _start(self, kind: str, dest: Optional[str], batch: list[str], options: dict[str, object]) -> BackgroundTask:
+        """
+        Start one multi-path task.
+
+        Parameters
+        ----------
+        kind : str
+            `'copy_move'` or `'delete'`.
+        dest : str or None
+            Destination folder, `None` for deletions.
+        batch : list[str]
+            Paths of the task.
+        options : dict[str, object]
+            Other arguments of the start method.
+
+        Returns
+        -------
+        BackgroundTask
+            The running task.
+        """
+        options = {key: val for key, val in options.items() if val is not None}
+        if kind == 'delete':
+            return self.fs.start_task(kind, batch, **options)
+        return self.fs.start_task(kind, batch, dest, **options)
+
+
+def _destinations(paths: Iterable[str] | dict[str, str], dest_folder_path: Optional[str]) -> dict[str, list[str]]:
+    """
+    Group the paths to copy or move by destination folder.
+
+    Parameters
+    ----------
+    paths : Iterable[str] or dict[str, str]
+        Paths, or paths mapped to their destination folder.
+    dest_folder_path : str, optional
+        Destination folder of all the paths.
+
+    Returns
+    -------
+    dict[str, list[str]]
+        Paths by destination folder.
+    """
+    if isinstance(paths, dict):
+        grouped: dict[str, list[str]] = {}
+        for path, dest in paths.items():
+            grouped.setdefault(dest, []).append(path)
+        return grouped
+    if dest_folder_path is None:
+        raise ValueError('Enter a valid dest_folder_path')
+    return {dest_folder_path: list(paths)}
@@ -0,0 +1,336 @@
+"""
+Circuit breaker for unhealthy NAS and API endpoints.
+
+While a NAS reboots, or a package such as Surveillance Station or Docker is stopped, every call
+fails after waiting for a timeout. The breaker counts consecutive failures per host (transport
+errors) and per API prefix of a host (gateway errors, missing API): after `failure_threshold` of
+them the circuit opens and calls fail at once with `CircuitOpenError`. After `cooldown` seconds a
+single trial call is let through (half-open): its success closes the circuit, its failure opens it
+again.
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Optional
+
+from .error_codes import BUSY_ERROR_CODES, CODE_API_NOT_FOUND
+from .exceptions import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# DSM error codes meaning the API is not served at the moment
+DEFAULT_FAILURE_CODES = (CODE_API_NOT_FOUND,) + BUSY_ERROR_CODES
+
+
+class _Circuit(object):
+    """State of one host or API prefix of a host."""
+
+    def __init__(self) -> None:
+        """Initialize the _Circuit object."""
+        self.state: str = CLOSED
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+        self.probing: bool = False
+
+
+class CircuitBreaker(object):
+    """
+    Fail fast on the hosts and API prefixes that keep failing.
+
+    A breaker can be shared by several sessions, the sessions to the same host then share its
+    circuits.
+
+    Parameters
+    ----------
+    failure_threshold : int, optional
+        Consecutive failures opening a circuit. Defaults to `5`.
+    cooldown : float, optional
+        Seconds a circuit stays open before a trial call. Defaults to `30`.
+    failure_codes : tuple[int, ...], optional
+        DSM error codes counted as failures of the API prefix. Defaults to API not found and the busy codes.
+    prefix_depth : int, optional
+        Number of parts of the API name forming its prefix, `2` gives `SYNO.SurveillanceStation`. Defaults to `2`.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 cooldown: float = 30.0,
+                 failure_codes: tuple[int, ...] = DEFAULT_FAILURE_CODES,
+                 prefix_depth: int = 2
+                 ) -> None:
+        """
+        Initialize the CircuitBreaker object.
+
+        Parameters
+        ----------
+        failure_threshold : int, optional
+            Consecutive failures opening a circuit. Defaults to `5`.
+        cooldown : float, optional
+            Seconds a circuit stays open before a trial call. Defaults to `30`.
+        failure_codes : tuple[int, ...], optional
+            DSM error codes counted as failures of the API prefix. Defaults to API not found and the busy codes.
+        prefix_depth : int, optional
+            Number of parts of the API name forming its prefix. Defaults to `2`.
+        """
+        self.failure_threshold: int = failure_threshold
+        self.cooldown: float = cooldown
+        self.failure_codes: tuple[int, ...] = tuple(failure_codes)
+        self.prefix_depth: int = prefix_depth
+        self._circuits: dict[tuple[str, str], _Circuit] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def prefix(self, api_name: str) -> str:
+        """
+        Get the API prefix tracked for an API.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API, for example `SYNO.SurveillanceStation.Camera`.
+
+        Returns
+        -------
+        str
+            The prefix, for example `SYNO.SurveillanceStation`.
+        """
+        return '.'.join(api_name.split('.')[:self.prefix_depth])
+
+    def _circuit(self, host: str, prefix: str) -> _Circuit:
+        """
+        Get the circuit of a host or API prefix, the lock must be held.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        prefix : str
+            API prefix, empty for the host itself.
+
+        Returns
+        -------
+        _Circuit
+            The circuit, created closed if new.
+        """
+        circuit = self._circuits.get((host, prefix))
+        if circuit is None:
+            circuit = self._circuits[(host, prefix)] = _Circuit()
+        return circuit
+
+    def allow(self, host: str, api_name: str) -> None:
+        """
+        Check that a call may be sent, the host circuit first then the API prefix one.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str
+            Name of the API called.
+
+        Raises
+        ------
+        CircuitOpenError
+            If the host or the API prefix circuit is open, or half-open with a trial call running.
+        """
+        now = time.monotonic()
+        with self._lock:
+            probes = []
+            for prefix in ('', self.prefix(api_name)):
+                circuit = self._circuit(host, prefix)
+                if circuit.state == CLOSED:
+                    continue
+                retry_after = circuit.opened_at + self.cooldown - now
+                if circuit.state == OPEN and retry_after <= 0:
+                    circuit.state = HALF_OPEN
+                if circuit.state == HALF_OPEN and not circuit.probing:
+                    # This call is the trial
+                    circuit.probing = True
+                    probes.append(circuit)
+                    continue
+                for probe in probes:
+                    probe.probing = False
+                raise CircuitOpenError(host, prefix, max(retry_after, 0.0))
+
+    def is_failure(self, status_code: int, error_code: int) -> bool:
+        """
+        Tell whether a response counts as a failure of its API prefix.
+
+        Parameters
+        ----------
+        status_code : int
+            HTTP status of the response.
+        error_code : int
+            DSM error code of the response.
+
+        Returns
+        -------
+        bool
+            True on a server error status or a failure code.
+        """
+        return status_code >= 500 or error_code in self.failure_codes
+
+    def record(self, host: str, api_name: str, status_code: int = 200, error_code: int = 0,
+               transport_error: bool = False) -> None:
+        """
+        Record the outcome of a call allowed by `allow`.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str
+            Name of the API called.
+        status_code : int, optional
+            HTTP status of the response. Defaults to `200`.
+        error_code : int, optional
+            DSM error code of the response. Defaults to `0`.
+        transport_error : bool, optional
+            Whether the NAS could not be reached, which counts against the host. Defaults to `False`.
+        """
+        prefix = self.prefix(api_name)
+        with self._lock:
+            if transport_error:
+                # The API prefix was not tested, only release its trial
+                self._circuit(host, prefix).probing = False
+                self._fail(self._circuit(host, ''))
+                return
+            self._succeed(self._circuit(host, ''))
+            if self.is_failure(status_code, error_code):
+                self._fail(self._circuit(host, prefix))
+            else:
+                self._succeed(self._circuit(host, prefix))
+
+    def release(self, host: str, api_name: str) -> None:
+        """
+        Forget a call allowed by `allow` whose outcome says nothing about the endpoint health.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str
+            Name of the API called.
+        """
+        with self._lock:
+            for prefix in ('', self.prefix(api_name)):
+                self._circuit(host, prefix).probing = False
+
+    def _fail(self, circuit: _Circuit) -> None:
+        """
+        Count a failure, opening the circuit at the threshold or after a failed trial.
+
+        Parameters
+        ----------
+        circuit : _Circuit
+            The circuit that failed.
+        """
+        circuit.failures += 1
+        circuit.probing = False
+        if circuit.state == HALF_OPEN or circuit.failures >= self.failure_threshold:
+            circuit.state = OPEN
+            circuit.opened_at = time.monotonic()
+
+    def _succeed(self, circuit: _Circuit) -> None:
+        """
+        Close a circuit after a success.
+
+        Parameters
+        ----------
+        circuit : _Circuit
+            The circuit that succeeded.
+        """
+        circuit.state = CLOSED
+        circuit.failures = 0
+        circuit.probing = False
+
+    def state(self, host: str, api_name: str = '') -> str:
+        """
+        Get the state of the circuit a call to an API would go through.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str, optional
+            Name of the API or API prefix. Defaults to the host alone.
+
+        Returns
+        -------
+        str
+            `'open'` if the host or the API prefix is open, else `'half_open'` if either is ready
+            for a trial or running one, else `'closed'`.
+        """
+        states = []
+        now = time.monotonic()
+        with self._lock:
+            prefixes = ('', self.prefix(api_name)) if api_name else ('',)
+            for prefix in prefixes:
+                circuit = self._circuits.get((host, prefix))
+                if circuit is None:
+                    continue
+                if circuit.state == OPEN and now - circuit.opened_at >= self.cooldown:
+                    states.append(HALF_OPEN)
+                else:
+                    states.append(circuit.state)
+        for state in (OPEN, HALF_OPEN):
+            if state in states:
+                return state
+        return CLOSED
+
+    def is_available(self, host: str, api_name: str = '') -> bool:
+        """
+        Tell whether a call to an API would be sent, to skip dead endpoints.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str, optional
+            Name of the API or API prefix. Defaults to the host alone.
+
+        Returns
+        -------
+        bool
+            False while the circuit is open.
+        """
+        return self.state(host, api_name) != OPEN
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, object]]]:
+        """
+        Get the state of every tracked circuit.
+
+        Returns
+        -------
+        dict[str, dict[str, dict[str, object]]]
+            `{host: {prefix: {'state', 'failures', 'retry_after'}}}`, the host itself under the
+            empty prefix, `retry_after` in seconds for open circuits.
+        """
+        result: dict[str, dict[str, dict[str, object]]] = {}
+        now = time.monotonic()
+        with self._lock:
+            for (host, prefix), circuit in sorted(self._circuits.items()):
+                state = circuit.state
+                retry_after = 0.0
+                if state == OPEN:
+                    retry_after = max(0.0, circuit.opened_at +
+                                      self.cooldown - now)
+                    if not retry_after:
+                        state = HALF_OPEN
+                result.setdefault(host, {})[prefix] = {
+                    'state': state, 'failures': circuit.failures, 'retry_after': retry_after}
+        return result
+
+    def reset(self, host: Optional[str] = None) -> None:
+        """
+        Close circuits, after a manual repair for example.
+
+        Parameters
+        ----------
+        host : str, optional
+            Base URL of the NAS. Defaults to `None`, every host.
+        """
+        with self._lock:
+            for key in [k for k in self._circuits if host is None or k[0] == host]:
+                del self._circuits[key]
@@ -6,7 +6,6 @@ from typing import Optional
 from . import base_api
 
 import os
-import requests
 import json
 
 
@@ -208,7 +207,7 @@ class Certificate(base_api.BaseApi):
         # ca_cert is optional argument for upload cert
         ca_cert = os.path.abspath(ca_cert) if ca_cert else None
 
-        session = requests.session()
+        session = self.session.http_session
 
         url = ('%s%s' % (self.base_url, api_path)) + '?api=%s&version=%s&method=import&_sid=%s' % (
             api_name, info['minVersion'], self._sid)
@@ -312,7 +311,7 @@ class Certificate(base_api.BaseApi):
             "_sid": self._sid,
         }
 
-        session = requests.session()
+        session = self.session.http_session
 
         url = ('%s%s' % (self.base_url, api_path))
 
@@ -348,7 +347,7 @@ class Certificate(base_api.BaseApi):
         info = self.session.app_api_list[api_name]
         api_path = info['path']
 
-        session = requests.session()
+        session = self.session.http_session
 
         url = (
             f"{self.base_url}{api_path}?"
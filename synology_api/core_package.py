@@ -9,7 +9,6 @@ import json
 from typing import List
 from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
 import os
-import requests
 import tqdm
 import time
 from . import base_api
@@ -617,7 +616,7 @@ class Package(base_api.BaseApi):
         api_path = info['path']
         filename = os.path.basename(file_path)
 
-        session = requests.session()
+        session = self.session.http_session
 
         with open(file_path, 'rb') as payload:
             url = ('%s%s' % (self.base_url, api_path)) + '?api=%s&version=%s&method=upload&_sid=%s' % (
@@ -657,7 +656,6 @@ class Package(base_api.BaseApi):
                              'Content-Type': encoder.content_type}
                 )
 
-        session.close()
         if r.status_code != 200 or not r.json()['success']:
             return r.status_code, r.json()
 
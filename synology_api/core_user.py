@@ -7,8 +7,9 @@ and password expiry.
 """
 
 import json
-from typing import Any
+from typing import Any, Iterator
 from . import base_api
+from .pagination import iter_pages
 
 
 class User(base_api.BaseApi):
@@ -132,6 +133,38 @@ class User(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_users(self,
+                   page_size: int = 500,
+                   offset: int = 0,
+                   prefetch: bool = True,
+                   **kwargs: Any
+                   ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over all the users.
+
+        Pages through `get_users` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of items requested per page. Defaults to `500`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `get_users`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.get_users(offset=offset, limit=limit, **kwargs),
+                              'SYNO.Core.User', 'users', page_size, offset, prefetch, self.session)
+
     def get_user(self, name: str, additional: list[str] = []) -> dict[str, object]:
         """
         Retrieve user information.
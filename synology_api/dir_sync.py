@@ -0,0 +1,990 @@
+"""
+Incremental synchronization of a local folder with a FileStation folder.
+
+`DirectorySync` compares a local tree with the remote tree listed by `FileStation.walk`, by size
+and modification time, optionally by MD5, and transfers the changed files only, several at a time.
+The state of each run is kept in a manifest: the next run knows which side changed a file since,
+so deletions can be propagated and files changed on both sides are reported as conflicts.
+"""
+from __future__ import annotations
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, Optional
+
+from .api_cache import default_cache_dir
+from .exceptions import FileStationError
+from .filestation import FileStation
+
+PUSH = 'push'
+PULL = 'pull'
+BOTH = 'both'
+
+# Synology metadata and recycle bin folders, unfinished downloads
+DEFAULT_EXCLUDE = ('@eaDir', '#recycle', '.DS_Store', '*.part', '*.part.json')
+
+# Seconds two modification times may differ by, DSM keeps whole seconds and FAT volumes two
+MTIME_TOLERANCE = 2.0
+
+# (size, modification time) of a file
+Stat = tuple[int, float]
+
+
+class SyncAction(object):
+    """
+    Operation planned on one file or folder.
+
+    Parameters
+    ----------
+    kind : str
+        `'upload'`, `'download'`, `'delete_remote'`, `'delete_local'` or `'conflict'` for a file
+        changed on both sides and left alone.
+    path : str
+        Path relative to the synchronized folders, with `/` separators.
+    reason : str
+        Why the operation is needed, for the dry-run output.
+    local : Stat, optional
+        Size and modification time of the local file. Defaults to `None`.
+    remote : Stat, optional
+        Size and modification time of the remote file. Defaults to `None`.
+    """
+
+    def __init__(self,
+                 kind: str,
+                 path: str,
+                 reason: str,
+                 local: Optional[Stat] = None,
+                 remote: Optional[Stat] = None
+                 ) -> None:
+        """
+        Initialize the SyncAction object.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of operation.
+        path : str
+            Path relative to the synchronized folders, with `/` separators.
+        reason : str
+            Why the operation is needed, for the dry-run output.
+        local : Stat, optional
+            Size and modification time of the local file. Defaults to `None`.
+        remote : Stat, optional
+            Size and modification time of the remote file. Defaults to `None`.
+        """
+        self.kind: str = kind
+        self.path: str = path
+        self.reason: str = reason
+        self.local: Optional[Stat] = local
+        self.remote: Optional[Stat] = remote
+
+    @property
+    def size(self) -> int:
+        """
+        Get the number of bytes transferred by the operation.
+
+        Returns
+        -------
+        int
+            Size of the file sent or received, `0` for the other operations.
+        """
+        if self.kind == 'upload' and self.local is not None:
+            return self.local[0]
+        if self.kind == 'download' and self.remote is not None:
+            return self.remote[0]
+        return 0
+
+    def __repr__(self) -> str:
+        """
+        Describe the operation for logs.
+
+        Returns
+        -------
+        str
+            Kind, path and reason.
+        """
+        return '<SyncAction %s %s (%s)>' % (self.kind, self.path, self.reason)
+
+
+class SyncPlan(object):
+    """
+    Operations needed to synchronize two folders, computed by `DirectorySync.plan`.
+
+    Parameters
+    ----------
+    actions : list[SyncAction]
+        The operations, sorted by path.
+    records : dict[str, dict[str, float]]
+        Manifest records of the files already identical on both sides.
+    manifest : dict[str, dict[str, float]]
+        Manifest records of the previous run.
+    """
+
+    def __init__(self,
+                 actions: list[SyncAction],
+                 records: dict[str, dict[str, float]],
+                 manifest: dict[str, dict[str, float]]
+                 ) -> None:
+        """
+        Initialize the SyncPlan object.
+
+        Parameters
+        ----------
+        actions : list[SyncAction]
+            The operations, sorted by path.
+        records : dict[str, dict[str, float]]
+            Manifest records of the files already identical on both sides.
+        manifest : dict[str, dict[str, float]]
+            Manifest records of the previous run.
+        """
+        self.actions: list[SyncAction] = actions
+        self.records: dict[str, dict[str, float]] = records
+        self.manifest: dict[str, dict[str, float]] = manifest
+
+    def __iter__(self) -> Iterator[SyncAction]:
+        """
+        Iterate over the operations.
+
+        Returns
+        -------
+        Iterator[SyncAction]
+            The operations, sorted by path.
+        """
+        return iter(self.actions)
+
+    def __len__(self) -> int:
+        """
+        Count the operations.
+
+        Returns
+        -------
+        int
+            Number of operations.
+        """
+        return len(self.actions)
+
+    @property
+    def bytes(self) -> int:
+        """
+        Get the number of bytes to transfer.
+
+        Returns
+        -------
+        int
+            Sum of the sizes of the files to upload and download.
+        """
+        return sum(action.size for action in self.actions)
+
+    def counts(self) -> dict[str, int]:
+        """
+        Count the operations by kind.
+
+        Returns
+        -------
+        dict[str, int]
+            Number of operations keyed by kind.
+        """
+        counts: dict[str, int] = {}
+        for action in self.actions:
+            counts[action.kind] = counts.get(action.kind, 0) + 1
+        return counts
+
+    def __str__(self) -> str:
+        """
+        Describe the operations, one per line, for a dry run.
+
+        Returns
+        -------
+        str
+            The operations and a summary line.
+        """
+        lines = ['%-13s %s (%s)' % (action.kind, action.path, action.reason)
+                 for action in self.actions]
+        counts = ', '.join('%d %s' % (count, kind)
+                           for kind, count in sorted(self.counts().items()))
+        lines.append('%s, %d bytes to transfer, %d files unchanged' % (
+            counts or 'nothing to do', self.bytes, len(self.records)))
+        return '\n'.join(lines)
+
+
+class DirectorySync(object):
+    """
+    Synchronize a local folder with a FileStation folder, transferring the changed files only.
+
+    Files are compared by size and modification time: uploads keep the local modification time
+    and downloads get the remote one, so files synchronized once compare equal afterwards. With
+    `checksum`, files of the same size whose times differ are compared by MD5 before being
+    transferred. Empty folders are not synchronized.
+
+    Parameters
+    ----------
+    fs : FileStation
+        Logged in FileStation API.
+    local_root : str
+        Local folder.
+    remote_root : str
+        Remote folder, for example `'/backup/artifacts'`.
+    direction : str, optional
+        `'push'` to make the remote folder a mirror of the local one, `'pull'` for the opposite,
+        `'both'` to bring the changes of each side to the other. Defaults to `'push'`.
+    delete : bool, optional
+        Whether to delete the files missing on the source side (`'push'`, `'pull'`), or deleted
+        on one side since the last run (`'both'`). Defaults to `False`.
+    checksum : bool, optional
+        Whether to compare files of the same size by MD5 before transferring them. Defaults to `False`.
+    conflict : str, optional
+        What to do with a file changed on both sides in `'both'` mode: keep the `'newer'` one,
+        the `'local'` or the `'remote'` one, or `'skip'` it. Defaults to `'newer'`.
+    manifest_path : str, optional
+        File keeping the state of the last run. Defaults to a file of the `synology_api` cache directory.
+    exclude : tuple[str, ...], optional
+        Glob patterns of the file and folder names to ignore on both sides. Defaults to `DEFAULT_EXCLUDE`.
+    max_workers : int, optional
+        Number of files transferred at the same time. Defaults to `4`.
+    verify : bool, optional
+        Whether SSL certificates are verified by the transfers. Defaults to `False`.
+
+    Examples
+    --------
+    ```python
+    sync = DirectorySync(fs, './dist', '/builds/app', delete=True, max_workers=8)
+    print(sync.plan())
+    result = sync.run()
+    ```
+    """
+
+    def __init__(self,
+                 fs: FileStation,
+                 local_root: str,
+                 remote_root: str,
+                 direction: str = PUSH,
+                 delete: bool = False,
+                 checksum: bool = False,
+                 conflict: str = 'newer',
+                 manifest_path: Optional[str] = None,
+                 exclude: tuple[str, ...] = DEFAULT_EXCLUDE,
+                 max_workers: int = 4,
+                 verify: bool = False
+                 ) -> None:
+        """
+        Initialize the DirectorySync object.
+
+        Parameters
+        ----------
+        fs : FileStation
+            Logged in FileStation API.
+        local_root : str
+            Local folder.
+        remote_root : str
+            Remote folder.
+        direction : str, optional
+            `'push'`, `'pull'` or `'both'`. Defaults to `'push'`.
+        delete : bool, optional
+            Whether to propagate deletions. Defaults to `False`.
+        checksum : bool, optional
+            Whether to compare files of the same size by MD5. Defaults to `False`.
+        conflict : str, optional
+            `'newer'`, `'local'`, `'remote'` or `'skip'`. Defaults to `'newer'`.
+        manifest_path : str, optional
+            File keeping the state of the last run. Defaults to a file of the cache directory.
+        exclude : tuple[str, ...], optional
+            Glob patterns of the names to ignore. Defaults to `DEFAULT_EXCLUDE`.
+        max_workers : int, optional
+            Number of files transferred at the same time. Defaults to `4`.
+        verify : bool, optional
+            Whether SSL certificates are verified by the transfers. Defaults to `False`.
+        """
+        if direction not in (PUSH, PULL, BOTH):
+            raise ValueError('direction must be push, pull or both')
+        if conflict not in ('newer', 'local', 'remote', 'skip'):
+            raise ValueError('conflict must be newer, local, remote or skip')
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+        self.fs: FileStation = fs
+        self.local_root: str = os.path.abspath(local_root)
+        self.remote_root: str = '/' + remote_root.strip('/')
+        self.direction: str = direction
+        self.delete: bool = delete
+        self.checksum: bool = checksum
+        self.conflict: str = conflict
+        self.exclude: tuple[str, ...] = tuple(exclude)
+        self.max_workers: int = max_workers
+        self.verify: bool = verify
+        if manifest_path is None:
+            key = hashlib.sha1(('%s\n%s\n%s' % (fs.base_url, self.local_root, self.remote_root))
+                               .encode('utf-8')).hexdigest()
+            manifest_path = os.path.join(
+                default_cache_dir(), 'sync', key + '.json')
+        self.manifest_path: str = manifest_path
+
+    def local_path(self, path: str) -> str:
+        """
+        Get the local path of a synchronized file.
+
+        Parameters
+        ----------
+        path : str
+            Path relative to the synchronized folders.
+
+        Returns
+        -------
+        str
+            The local path.
+        """
+        return os.path.join(self.local_root, *path.split('/'))
+
+    def remote_path(self, path: str) -> str:
+        """
+        Get the remote path of a synchronized file.
+
+        Parameters
+        ----------
+        path : str
+            Path relative to the synchronized folders.
+
+        Returns
+        -------
+        str
+            The remote path.
+        """
+        return self.remote_root + '/' + path
+
+    def _excluded(self, name: str) -> bool:
+        """
+        Tell whether a file or folder name matches an exclude pattern.
+
+        Parameters
+        ----------
+        name : str
+            The name.
+
+        Returns
+        -------
+        bool
+            True to ignore it.
+        """
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude)
+
+    def _scan_local(self) -> tuple[dict[str, Stat], set[str]]:
+        """
+        List the local files and folders.
+
+        Returns
+        -------
+        tuple[dict[str, Stat], set[str]]
+            The files with their size and modification time, and the folders, by relative path.
+        """
+        files = {}
+        dirs = set()
+        for root, names, filenames in os.walk(self.local_root):
+            names[:] = [name for name in names if not self._excluded(name)]
+            relative = os.path.relpath(
+                root, self.local_root).replace(os.sep, '/')
+            prefix = '' if relative == '.' else relative + '/'
+            dirs.update(prefix + name for name in names)
+            for name in filenames:
+                if self._excluded(name):
+                    continue
+                st = os.stat(os.path.join(root, name))
+                files[prefix + name] = (st.st_size, st.st_mtime)
+        return files, dirs
+
+    def _scan_remote(self) -> tuple[dict[str, Stat], set[str]]:
+        """
+        List the remote files and folders with `FileStation.walk`.
+
+        Returns
+        -------
+        tuple[dict[str, Stat], set[str]]
+            The files with their size and modification time, and the folders, by relative path.
+            Both are empty if the remote folder does not exist.
+        """
+        def onerror(error: Exception) -> None:
+            """
+            Skip the folders deleted during the walk, or the missing remote folder.
+
+            Parameters
+            ----------
+            error : Exception
+                Error raised by the listing of a folder.
+            """
+            if getattr(error, 'error_code', None) != 408:
+                raise error
+
+        files = {}
+        dirs = set()
+        start = len(self.remote_root) + 1
+        for _, folders, entries in self.fs.walk(self.remote_root, max_workers=self.max_workers,
+                                                additional=['size', 'time'], onerror=onerror):
+            folders[:] = [d for d in folders if not self._excluded(d['name'])]
+            dirs.update(d['path'][start:] for d in folders)
+            for entry in entries:
+                if self._excluded(entry['name']):
+                    continue
+                additional = entry.get('additional', {})
+                files[entry['path'][start:]] = (int(additional.get('size', 0)),
+                                                float(additional.get('time', {}).get('mtime', 0)))
+        return files, dirs
+
+    def load_manifest(self) -> dict[str, dict[str, float]]:
+        """
+        Read the state of the last run.
+
+        Returns
+        -------
+        dict[str, dict[str, float]]
+            `{path: {'size', 'local_mtime', 'remote_mtime'}}` of the files synchronized, empty if
+            there is no manifest or it was written for other folders.
+        """
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('local_root') != self.local_root or manifest.get('remote_root') != self.remote_root:
+            return {}
+        return manifest.get('files', {})
+
+    def _save_manifest(self, files: dict[str, dict[str, float]]) -> None:
+        """
+        Write the state of the run, atomically.
+
+        Parameters
+        ----------
+        files : dict[str, dict[str, float]]
+            Records of the files synchronized.
+        """
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (self.manifest_path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'local_root': self.local_root, 'remote_root': self.remote_root,
+                       'updated': time.time(), 'files': files}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _local_md5(self, path: str) -> str:
+        """
+        Compute the MD5 of a local file.
+
+        Parameters
+        ----------
+        path : str
+            Path relative to the synchronized folders.
+
+        Returns
+        -------
+        str
+            The hexadecimal digest.
+        """
+        digest = hashlib.md5()
+        with open(self.local_path(path), 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _remote_md5(self, path: str) -> str:
+        """
+        Compute the MD5 of a remote file with a `start_md5_calc` task.
+
+        Parameters
+        ----------
+        path : str
+            Path relative to the synchronized folders.
+
+        Returns
+        -------
+        str
+            The hexadecimal digest.
+        """
+        return self.fs.start_task('md5', self.remote_path(path)).wait()['md5'].lower()
+
+    def _same_content(self, path: str, local: Stat, remote: Stat) -> Optional[bool]:
+        """
+        Compare a local and a remote file by size and modification time.
+
+        Parameters
+        ----------
+        path : str
+            Path relative to the synchronized folders.
+        local : Stat
+            Size and modification time of the local file.
+        remote : Stat
+            Size and modification time of the remote file.
+
+        Returns
+        -------
+        bool or None
+            Whether the files are identical, None if only checksums can tell.
+        """
+        if local[0] != remote[0]:
+            return False
+        if abs(local[1] - remote[1]) <= MTIME_TOLERANCE:
+            return True
+        return None if self.checksum else False
+
+    def plan(self) -> SyncPlan:
+        """
+        Compare the two folders and list the operations needed to synchronize them.
+
+        Returns
+        -------
+        SyncPlan
+            The operations; printing it gives the dry-run output.
+        """
+        local, local_dirs = self._scan_local()
+        remote, remote_dirs = self._scan_remote()
+        manifest = self.load_manifest()
+
+        same: dict[str, Optional[bool]] = {}
+        for path in set(local) & set(remote):
+            record = manifest.get(path)
+            if (record is not None and not _changed(local[path], record, 'local_mtime')
+                    and not _changed(remote[path], record, 'remote_mtime')):
+                same[path] = True
+            else:
+                same[path] = self._same_content(
+                    path, local[path], remote[path])
+
+        unknown = sorted(path for path, value in same.items() if value is None)
+        if unknown:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sync') as pool:
+                remote_md5 = pool.map(self._remote_md5, unknown)
+                local_md5 = pool.map(self._local_md5, unknown)
+                for path, r, l in zip(unknown, remote_md5, local_md5):
+                    same[path] = r == l
+
+        actions = []
+        records = {}
+        for path in sorted(set(local) | set(remote)):
+            action = self._decide(path, local.get(path), remote.get(
+                path), manifest.get(path), same.get(path))
+            if action is not None:
+                actions.append(action)
+            elif path in local and path in remote:
+                records[path] = _record(local[path], remote[path])
+
+        if self.delete and self.direction == PUSH:
+            actions = _collapse(actions, 'delete_remote',
+                                remote_dirs - local_dirs)
+        elif self.delete and self.direction == PULL:
+            actions = _collapse(actions, 'delete_local',
+                                local_dirs - remote_dirs)
+        return SyncPlan(actions, records, manifest)
+
+    def _decide(self,
+                path: str,
+                local: Optional[Stat],
+                remote: Optional[Stat],
+                record: Optional[dict[str, float]],
+                same: Optional[bool]
+                ) -> Optional[SyncAction]:
+        """
+        Choose the operation needed by one file.
+
+        Parameters
+        ----------
+        path : str
+            Path relative to the synchronized folders.
+        local : Stat or None
+            Size and modification time of the local file, None if missing.
+        remote : Stat or None
+            Size and modification time of the remote file, None if missing.
+        record : dict[str, float] or None
+            Manifest record of the file, None if it was not synchronized before.
+        same : bool or None
+            Whether both files are identical, when both exist.
+
+        Returns
+        -------
+        SyncAction or None
+            The operation, None if there is nothing to do.
+        """
+        def action(kind: str, reason: str) -> SyncAction:
+            """
+            Build an operation on this file.
+
+            Parameters
+            ----------
+            kind : str
+                Kind of operation.
+            reason : str
+                Why the operation is needed.
+
+            Returns
+            -------
+            SyncAction
+                The operation.
+            """
+            return SyncAction(kind, path, reason, local, remote)
+
+        if local is not None and remote is not None:
+            if same:
+                return None
+            if self.direction == PUSH:
+                return action('upload', 'changed')
+            if self.direction == PULL:
+                return action('download', 'changed')
+            local_changed = record is None or _changed(
+                local, record, 'local_mtime')
+            remote_changed = record is None or _changed(
+                remote, record, 'remote_mtime')
+            if not remote_changed:
+                return action('upload', 'changed locally')
+            if not local_changed:
+                return action('download', 'changed on the NAS')
+            if self.conflict == 'skip':
+                return action('conflict', 'changed on both sides')
+            if self.conflict == 'local' or (self.conflict == 'newer' and local[1] >= remote[1]):
+                return action('upload', 'changed on both sides, local kept')
+            return action('download', 'changed on both sides, remote kept')
+
+        if local is not None:
+            if self.direction == PULL:
+                return action('delete_local', 'not on the NAS') if self.delete else None
+            if (self.direction == BOTH and self.delete and record is not None
+                    and not _changed(local, record, 'local_mtime')):
+                return action('delete_local', 'deleted on the NAS')
+            return action('upload', 'new' if record is None else 'missing on the NAS')
+
+        if self.direction == PUSH:
+            return action('delete_remote', 'not in the local folder') if self.delete else None
+        if (self.direction == BOTH and self.delete and record is not None
+                and not _changed(remote, record, 'remote_mtime')):
+            return action('delete_remote', 'deleted locally')
+        return action('download', 'new' if record is None else 'missing locally')
+
+    def run(self,
+            plan: Optional[SyncPlan] = None,
+            dry_run: bool = False,
+            progress_callback: Optional[Callable] = None
+            ) -> dict[str, object]:
+        """
+        Synchronize the folders and save the manifest.
+
+        Parameters
+        ----------
+        plan : SyncPlan, optional
+            Operations to run, as returned by `plan`. Defaults to a new plan.
+        dry_run : bool, optional
+            Whether to print the plan and stop, nothing is transferred, deleted or saved. Defaults to `False`.
+        progress_callback : Callable, optional
+            Called as `progress_callback(bytes_transferred, total_bytes)` every time data is transferred.
+
+        Returns
+        -------
+        dict[str, object]
+            Summary of the run, with the keys:
+            - `uploaded`, `downloaded`, `deleted`: relative paths of the files done (or to do in a dry run).
+            - `conflicts`: relative paths of the files changed on both sides and skipped.
+            - `failed`: relative paths of the files that failed, mapped to the error.
+            - `bytes`: number of bytes transferred.
+            - `elapsed`: duration of the run in seconds.
+        """
+        if plan is None:
+            plan = self.plan()
+        by_kind: dict[str, list[SyncAction]] = {}
+        for action in plan:
+            by_kind.setdefault(action.kind, []).append(action)
+        result: dict[str, object] = {
+            'uploaded': [a.path for a in by_kind.get('upload', [])],
+            'downloaded': [a.path for a in by_kind.get('download', [])],
+            'deleted': [a.path for a in by_kind.get('delete_remote', []) + by_kind.get('delete_local', [])],
+            'conflicts': [a.path for a in by_kind.get('conflict', [])],
+            'failed': {},
+            'bytes': 0,
+            'elapsed': 0.0,
+        }
+        if dry_run:
+            print(plan)
+            return result
+
+        start = time.perf_counter()
+        failed: dict[str, Exception] = {}
+        records = dict(plan.records)
+        # Files left alone keep their previous state
+        for action in by_kind.get('conflict', []):
+            if action.path in plan.manifest:
+                records[action.path] = plan.manifest[action.path]
+
+        transfers = by_kind.get('upload', []) + by_kind.get('download', [])
+        records.update(self._transfer(
+            transfers, plan.bytes, failed, progress_callback))
+        self._delete(by_kind.get('delete_remote', []),
+                     by_kind.get('delete_local', []), failed)
+
+        for path in failed:
+            if path in plan.manifest:
+                records[path] = plan.manifest[path]
+        self._save_manifest(records)
+
+        for key in ('uploaded', 'downloaded', 'deleted'):
+            result[key] = [path for path in result[key] if path not in failed]
+        result['failed'] = failed
+        result['bytes'] = sum(
+            a.size for a in transfers if a.path not in failed)
+        result['elapsed'] = time.perf_counter() - start
+        return result
+
+    def _transfer(self,
+                  actions: list[SyncAction],
+                  total: int,
+                  failed: dict[str, Exception],
+                  progress_callback: Optional[Callable]
+                  ) -> dict[str, dict[str, float]]:
+        """
+        Upload and download files, several at a time.
+
+        Parameters
+        ----------
+        actions : list[SyncAction]
+            The uploads and downloads.
+        total : int
+            Number of bytes to transfer, for the progress.
+        failed : dict[str, Exception]
+            Filled with the errors, by relative path.
+        progress_callback : Callable or None
+            Called as `progress_callback(bytes_transferred, total_bytes)`.
+
+        Returns
+        -------
+        dict[str, dict[str, float]]
+            Manifest records of the files transferred.
+        """
+        if not actions:
+            return {}
+        # Shared folders (first level) cannot be created here, they must already exist
+        folders = sorted({posixpath.dirname(self.remote_path(a.path))
+                          for a in actions if a.kind == 'upload'})
+        folders = [folder for folder in folders if folder.count('/') > 1]
+        # Each upload creates its folders itself if they could not be created beforehand
+        create_parents = not self.fs._create_folders(folders)
+
+        done = 0
+        lock = threading.Lock()
+
+        def on_progress(size: int) -> None:
+            """
+            Add the bytes moved by one transfer to the aggregate progress.
+
+            Parameters
+            ----------
+            size : int
+                Bytes transferred since the last call.
+            """
+            nonlocal done
+            with lock:
+                done += size
+                if progress_callback is not None:
+                    progress_callback(done, total)
+
+        records = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sync') as pool:
+            futures = {pool.submit(self._upload, action, on_progress, create_parents) if action.kind == 'upload'
+                       else pool.submit(self._download, action, on_progress): action for action in actions}
+            for future in as_completed(futures):
+                action = futures[future]
+                try:
+                    records[action.path] = future.result()
+                except Exception as e:
+                    failed[action.path] = e
+        return records
+
+    def _upload(self,
+                action: SyncAction,
+                on_progress: Callable[[int], None],
+                create_parents: bool = False
+                ) -> dict[str, float]:
+        """
+        Upload one file, keeping its modification time.
+
+        Parameters
+        ----------
+        action : SyncAction
+            The upload.
+        on_progress : Callable[[int], None]
+            Called with the number of bytes sent since the previous call.
+        create_parents : bool, optional
+            Whether the upload creates the missing parent folders. Defaults to False.
+
+        Returns
+        -------
+        dict[str, float]
+            Manifest record of the file.
+        """
+        local_path = self.local_path(action.path)
+        st = os.stat(local_path)
+        r = self.fs._post_upload(posixpath.dirname(self.remote_path(action.path)), local_path, create_parents,
+                                 True, self.verify, on_progress, st.st_mtime)
+        response = r.json()
+        if r.status_code != 200 or not response['success']:
+            raise FileStationError(error_code=response.get(
+                'error', {}).get('code', r.status_code))
+        return _record((st.st_size, st.st_mtime), (st.st_size, st.st_mtime))
+
+    def _download(self, action: SyncAction, on_progress: Callable[[int], None]) -> dict[str, float]:
+        """
+        Download one file and give it the remote modification time.
+
+        Parameters
+        ----------
+        action : SyncAction
+            The download.
+        on_progress : Callable[[int], None]
+            Called with the number of bytes received since the previous call.
+
+        Returns
+        -------
+        dict[str, float]
+            Manifest record of the file.
+        """
+        local_path = self.local_path(action.path)
+        written = [0]
+
+        def progress(size: int, total: Optional[int]) -> None:
+            """
+            Forward the progress of the download.
+
+            Parameters
+            ----------
+            size : int
+                Bytes written so far.
+            total : int or None
+                Size of the file.
+            """
+            on_progress(size - written[0])
+            written[0] = size
+
+        self.fs.download_file(self.remote_path(action.path), os.path.dirname(local_path),
+                              verify=self.verify, progress_callback=progress)
+        mtime = action.remote[1]
+        os.utime(local_path, (time.time(), mtime))
+        st = os.stat(local_path)
+        return _record((st.st_size, st.st_mtime), (action.remote[0], mtime))
+
+    def _delete(self,
+                remote: list[SyncAction],
+                local: list[SyncAction],
+                failed: dict[str, Exception]
+                ) -> None:
+        """
+        Delete the remote files in one `start_delete_task` task, and the local files.
+
+        Parameters
+        ----------
+        remote : list[SyncAction]
+            Remote deletions.
+        local : list[SyncAction]
+            Local deletions.
+        failed : dict[str, Exception]
+            Filled with the errors, by relative path.
+        """
+        if remote:
+            try:
+                self.fs.start_task('delete', [self.remote_path(a.path) for a in remote],
+                                   recursive=True).wait()
+            except Exception as e:
+                failed.update((a.path, e) for a in remote)
+        for action in local:
+            path = self.local_path(action.path)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                failed[action.path] = e
+
+
+def _changed(stat: Stat, record: dict[str, float], mtime_key: str) -> bool:
+    """
+    Tell whether a file changed since it was recorded in the manifest.
+
+    Parameters
+    ----------
+    stat : Stat
+        Current size and modification time of the file.
+    record : dict[str, float]
+        Manifest record of the file.
+    mtime_key : str
+        `'local_mtime'` or `'remote_mtime'`.
+
+    Returns
+    -------
+    bool
+        True if the size or the modification time differ.
+    """
+    return stat[0] != record.get('size') or abs(stat[1] - record.get(mtime_key, 0)) > MTIME_TOLERANCE
+
+
+def _record(local: Stat, remote: Stat) -> dict[str, float]:
+    """
+    Build the manifest record of a synchronized file.
+
+    Parameters
+    ----------
+    local : Stat
+        Size and modification time of the local file.
+    remote : Stat
+        Size and modification time of the remote file.
+
+    Returns
+    -------
+    dict[str, float]
+        The record.
+    """
+    return {'size': local[0], 'local_mtime': local[1], 'remote_mtime': remote[1]}
+
+
+def _collapse(actions: list[SyncAction], kind: str, folders: set[str]) -> list[SyncAction]:
+    """
+    Replace the deletions of all the files of a folder missing on the source side by the folder deletion.
+
+    Parameters
+    ----------
+    actions : list[SyncAction]
+        The operations.
+    kind : str
+        `'delete_remote'` or `'delete_local'`.
+    folders : set[str]
+        Folders missing on the source side, by relative path.
+
+    Returns
+    -------
+    list[SyncAction]
+        The operations, sorted by path.
+    """
+    top = {folder for folder in folders if posixpath.dirname(
+        folder) not in folders}
+    if not top:
+        return actions
+
+    def inside(path: str) -> bool:
+        """
+        Tell whether a path is in one of the deleted folders.
+
+        Parameters
+        ----------
+        path : str
+            Relative path.
+
+        Returns
+        -------
+        bool
+            True if it is.
+        """
+        parent = posixpath.dirname(path)
+        while parent:
+            if parent in top:
+                return True
+            parent = posixpath.dirname(parent)
+        return False
+
+    actions = [a for a in actions if not (a.kind == kind and inside(a.path))]
+    actions += [SyncAction(kind, folder, 'folder missing on the source side')
+                for folder in top]
+    return sorted(actions, key=lambda a: a.path)
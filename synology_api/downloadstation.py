@@ -6,8 +6,9 @@ on Synology NAS devices using the Download Station application.
 """
 
 from __future__ import annotations
-from typing import Optional, Any
+from typing import Iterator, Optional, Any
 from . import base_api
+from .pagination import iter_pages
 
 
 class DownloadStation(base_api.BaseApi):
@@ -328,6 +329,38 @@ class DownloadStation(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_tasks(self,
+                   page_size: int = 500,
+                   offset: int = 0,
+                   prefetch: bool = True,
+                   **kwargs: Any
+                   ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over all the download tasks.
+
+        Pages through `tasks_list` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of items requested per page. Defaults to `500`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `tasks_list`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.tasks_list(offset=offset, limit=limit, **kwargs),
+                              'SYNO.DownloadStation' + self.download_st_version + '.Task', 'tasks', page_size, offset, prefetch, self.session)
+
     def tasks_info(self, task_id, additional_param: Optional[str | list[str]] = None) -> dict[str, object] | str:
         """
         Get information for specific download tasks.
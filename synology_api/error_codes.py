@@ -8,6 +8,11 @@ from __future__ import annotations
 
 CODE_SUCCESS = 0
 CODE_UNKNOWN = 9999
+CODE_API_NOT_FOUND = 102
+# Codes meaning the session is gone (timeout, duplicated login, invalid SID):
+SESSION_ERROR_CODES = (106, 107, 119)
+# Codes meaning the network connection is unstable or the system is busy:
+BUSY_ERROR_CODES = (109, 110, 111, 117, 118)
 # 'Common' Error Codes:
 error_codes = {
     CODE_SUCCESS: 'Success',
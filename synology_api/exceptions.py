@@ -68,6 +68,45 @@ class SynoConnectionError(SynoBaseException):
         return
 
 
+class CircuitOpenError(SynoConnectionError):
+    """
+    Exception raised without contacting the NAS while the circuit breaker of an endpoint is open.
+
+    Parameters
+    ----------
+    host : str
+        Base URL of the NAS.
+    prefix : str
+        API prefix of the open circuit, empty when the whole host is failing.
+    retry_after : float
+        Seconds until a new request is let through.
+    *args : object
+        Additional arguments to pass to the base Exception.
+    """
+
+    def __init__(self, host: str, prefix: str, retry_after: float, *args: object) -> None:
+        """
+        Initialize CircuitOpenError.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        prefix : str
+            API prefix of the open circuit, empty when the whole host is failing.
+        retry_after : float
+            Seconds until a new request is let through.
+        *args : object
+            Additional arguments to pass to the base Exception.
+        """
+        super().__init__('Circuit open for %s%s, retry in %.1fs' % (
+            host, prefix, retry_after), *args)
+        self.host = host
+        self.prefix = prefix
+        self.retry_after = retry_after
+        return
+
+
 class HTTPError(SynoBaseException):
     """
     Exception raised when an HTTP error occurs.
@@ -0,0 +1,700 @@
+"""
+Local SQLite index of the file metadata of remote shares.
+
+Listing or searching big shares is slow and loads the NAS indexer. `FileIndex` crawls a remote
+folder once with `FileStation.walk`, stores the name, size and times of every entry in a SQLite
+database, and answers queries by name, extension, size and time ranges locally. `refresh` keeps
+it current by asking the modification time of every known folder, many per request, and
+listing again only the folders whose time changed.
+"""
+from __future__ import annotations
+import fnmatch
+import os
+import posixpath
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, Optional, Union
+
+from .api_cache import default_cache_dir
+from .bulk_ops import plan_batches
+from .filestation import FileStation
+
+# A Unix timestamp or a datetime
+Time = Union[float, datetime]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    isdir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    crtime INTEGER NOT NULL,
+    listed_mtime INTEGER,
+    crawl INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_parent ON files (parent);
+CREATE INDEX IF NOT EXISTS files_name ON files (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS files_ext ON files (ext);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+"""
+
+_COLUMNS = ('path', 'parent', 'name', 'ext', 'isdir',
+            'size', 'mtime', 'crtime', 'listed_mtime')
+
+# Paths below a folder, see `_below`. DSM paths are case-sensitive, LIKE is not for ASCII
+_BELOW = 'substr(path, 1, ?) = ?'
+
+
+class FileIndex(object):
+    """
+    SQLite index of the files of remote folders.
+
+    Folder times only change when entries are added, removed or renamed in them, so a file
+    rewritten in place keeps its indexed size and time until its folder changes or `crawl` runs again.
+
+    Parameters
+    ----------
+    fs : FileStation
+        Logged in FileStation API.
+    db_path : str, optional
+        SQLite database file, `':memory:'` for a temporary index. Defaults to a file per NAS in the
+        `synology_api` cache directory.
+    max_workers : int, optional
+        Number of listing requests sent at the same time. Defaults to `4`.
+    page_size : int, optional
+        Number of entries requested per listing page. Defaults to `1000`.
+    info_batch : int, optional
+        Maximum number of folders whose time is asked in one request by `refresh`, fewer when their paths
+        are long. Defaults to `100`.
+
+    Examples
+    --------
+    ```python
+    index = FileIndex(fs)
+    index.crawl('/photo')
+    index.refresh('/photo')
+    big_raws = index.find(ext=['cr2', 'nef'], min_size=50 * 1024 * 1024, under='/photo/2023')
+    ```
+    """
+
+    def __init__(self,
+                 fs: FileStation,
+                 db_path: Optional[str] = None,
+                 max_workers: int = 4,
+                 page_size: int = 1000,
+                 info_batch: int = 100
+                 ) -> None:
+        """
+        Initialize the FileIndex object.
+
+        Parameters
+        ----------
+        fs : FileStation
+            Logged in FileStation API.
+        db_path : str, optional
+            SQLite database file, `':memory:'` for a temporary index. Defaults to a file in the cache directory.
+        max_workers : int, optional
+            Number of listing requests sent at the same time. Defaults to `4`.
+        page_size : int, optional
+            Number of entries requested per listing page. Defaults to `1000`.
+        info_batch : int, optional
+            Maximum number of folders whose time is asked in one request by `refresh`, fewer when their paths
+            are long. Defaults to `100`.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+        if db_path is None:
+            key = re.sub(r'[^A-Za-z0-9.-]+', '_', fs.base_url).strip('_')
+            db_path = os.path.join(default_cache_dir(),
+                                   'index', key + '.sqlite')
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.fs: FileStation = fs
+        self.db_path: str = db_path
+        self.max_workers: int = max_workers
+        self.page_size: int = page_size
+        self.info_batch: int = info_batch
+        self._lock: threading.RLock = threading.RLock()
+        self._db: sqlite3.Connection = sqlite3.connect(
+            db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> FileIndex:
+        """
+        Use the index as a context manager, closing it at the end.
+
+        Returns
+        -------
+        FileIndex
+            The index itself.
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """
+        Close the database.
+
+        Parameters
+        ----------
+        *exc_info : object
+            Exception information, if any.
+        """
+        self.close()
+
+    def crawl(self, root: str) -> dict[str, object]:
+        """
+        Index a remote folder and everything below it, replacing what was indexed there.
+
+        Parameters
+        ----------
+        root : str
+            Remote folder, for example `'/photo'`.
+
+        Returns
+        -------
+        dict[str, object]
+            `folders` and `files` indexed, and the `elapsed` seconds.
+        """
+        start = time.perf_counter()
+        root = _normalize(root)
+        info = self._get_info([root])
+        if root not in info:
+            raise FileNotFoundError('Remote folder not found: %s' % root)
+
+        with self._lock:
+            generation = (self._db.execute(
+                'SELECT MAX(crawl) FROM files').fetchone()[0] or 0) + 1
+        counts = {'folders': 0, 'files': 0}
+        rows = [_row(info[root], _mtime(info[root]))]
+        for _, dirs, files in self.fs.walk(root, max_workers=self.max_workers, page_size=self.page_size,
+                                           additional=['size', 'time']):
+            counts['folders'] += len(dirs)
+            counts['files'] += len(files)
+            # A folder is listed right after its parent, its time is the one it was listed at
+            rows += [_row(entry, _mtime(entry)) for entry in dirs]
+            rows += [_row(entry) for entry in files]
+            if len(rows) >= self.page_size:
+                self._store(rows, generation)
+                rows = []
+        self._store(rows, generation)
+
+        with self._lock, self._db:
+            # Entries not seen by this crawl were deleted on the NAS
+            self._db.execute('DELETE FROM files WHERE (path = ? OR %s) AND crawl != ?' % _BELOW,
+                             (root, *_below(root), generation))
+        counts['elapsed'] = time.perf_counter() - start
+        return counts
+
+    def refresh(self, root: str = '/') -> dict[str, object]:
+        """
+        Bring the index of a folder up to date, listing again only the folders whose time changed.
+
+        Parameters
+        ----------
+        root : str, optional
+            Remote folder previously crawled. Defaults to every indexed folder.
+
+        Returns
+        -------
+        dict[str, object]
+            `checked` folders, `relisted` folders, `added`, `updated` and `removed` entries, and
+            the `elapsed` seconds.
+        """
+        start = time.perf_counter()
+        root = _normalize(root)
+        with self._lock:
+            known = {row['path']: row['listed_mtime'] for row in self._db.execute(
+                'SELECT path, listed_mtime FROM files WHERE isdir = 1 AND (path = ? OR %s)' % _BELOW,
+                (root, *_below(root)))}
+        stats = {'checked': len(known), 'relisted': 0,
+                 'added': 0, 'updated': 0, 'removed': 0}
+
+        info = self._get_info(list(known))
+        gone = [path for path in known if path not in info]
+        for path in gone:
+            stats['removed'] += self._remove(path)
+        changed = sorted(path for path in known if path in info
+                         and _mtime(info[path]) != known[path])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='index') as pool:
+            listings = pool.map(self._list, changed)
+            for path, entries in zip(changed, listings):
+                stats['relisted'] += 1
+                self._apply_listing(path, _mtime(info[path]), entries, stats)
+        stats['elapsed'] = time.perf_counter() - start
+        return stats
+
+    def _apply_listing(self, folder: str, mtime: int, entries: list[dict[str, object]],
+                       stats: dict[str, object]) -> None:
+        """
+        Replace the indexed entries of a folder by a new listing, crawling its new sub-folders.
+
+        Parameters
+        ----------
+        folder : str
+            The folder listed again.
+        mtime : int
+            Modification time of the folder.
+        entries : list[dict[str, object]]
+            Its entries, as returned by `get_file_list`.
+        stats : dict[str, object]
+            Counters of `refresh`, updated.
+        """
+        with self._lock:
+            old = {row['path']: row for row in self._db.execute(
+                'SELECT * FROM files WHERE parent = ?', (folder,))}
+        current = {entry['path']: entry for entry in entries}
+
+        for path in set(old) - set(current):
+            stats['removed'] += self._remove(path)
+        rows = []
+        new_dirs = []
+        for path, entry in current.items():
+            row = old.get(path)
+            if row is None:
+                stats['added'] += 1
+                if entry.get('isdir'):
+                    new_dirs.append(path)
+                    continue
+            elif bool(row['isdir']) != bool(entry.get('isdir')):
+                # A file replaced by a folder of the same name, or the opposite
+                stats['removed'] += self._remove(path)
+                if entry.get('isdir'):
+                    new_dirs.append(path)
+                    continue
+            elif row['isdir']:
+                # Sub-folders keep their own listing time, they are checked separately
+                if (row['mtime'], row['crtime']) != (_mtime(entry), _time(entry, 'crtime')):
+                    rows.append(_row(entry, row['listed_mtime']))
+                continue
+            elif tuple(row)[:8] == _row(entry)[:8]:
+                continue
+            else:
+                stats['updated'] += 1
+            rows.append(_row(entry))
+
+        with self._lock, self._db:
+            self._db.executemany(_UPSERT, [row + (0,) for row in rows])
+            self._db.execute(
+                'UPDATE files SET listed_mtime = ? WHERE path = ?', (mtime, folder))
+        for path in new_dirs:
+            counts = self.crawl(path)
+            stats['added'] += counts['folders'] + counts['files']
+
+    def _store(self, rows: list[tuple], generation: int) -> None:
+        """
+        Insert or replace entries.
+
+        Parameters
+        ----------
+        rows : list[tuple]
+            Entries, as built by `_row`.
+        generation : int
+            Number of the crawl storing them.
+        """
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                _UPSERT, [row + (generation,) for row in rows])
+
+    def _remove(self, path: str) -> int:
+        """
+        Remove an entry, and everything below it for a folder.
+
+        Parameters
+        ----------
+        path : str
+            Remote path.
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        with self._lock, self._db:
+            return self._db.execute('DELETE FROM files WHERE path = ? OR ' + _BELOW,
+                                    (path, *_below(path))).rowcount
+
+    def _list(self, folder: str) -> list[dict[str, object]]:
+        """
+        List all the entries of a folder, page by page.
+
+        Parameters
+        ----------
+        folder : str
+            Remote folder.
+
+        Returns
+        -------
+        list[dict[str, object]]
+            Its entries, as returned by `get_file_list`.
+        """
+        return list(self.fs.iter_file_list(folder, page_size=self.page_size, prefetch=False,
+                                           additional=['size', 'time']))
+
+    def _get_info(self, paths: list[str]) -> dict[str, dict[str, object]]:
+        """
+        Get the entries of many paths, at most `info_batch` per request.
+
+        Parameters
+        ----------
+        paths : list[str]
+            Remote paths.
+
+        Returns
+        -------
+        dict[str, dict[str, object]]
+            Entries keyed by path, the missing paths are left out.
+        """
+        # The paths go in the query string, DSM rejects long request lines
+        chunks = plan_batches(paths, max_paths=self.info_batch)
+
+        def get_info(chunk: list[str]) -> list[dict[str, object]]:
+            """
+            Get the entries of one batch of paths.
+
+            Parameters
+            ----------
+            chunk : list[str]
+                Remote paths.
+
+            Returns
+            -------
+            list[dict[str, object]]
+                Entries returned by `get_file_info`.
+            """
+            return self.fs.get_file_info(chunk, additional=['size', 'time'])['data']['files']
+
+        result = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='index') as pool:
+            for entries in pool.map(get_info, chunks):
+                for entry in entries:
+                    if 'code' not in entry and 'additional' in entry:
+                        result[entry['path']] = entry
+        return result
+
+    def get(self, path: str) -> Optional[dict[str, object]]:
+        """
+        Get the indexed entry of a path.
+
+        Parameters
+        ----------
+        path : str
+            Remote path.
+
+        Returns
+        -------
+        dict[str, object] or None
+            `path`, `name`, `ext`, `isdir`, `size`, `mtime` and `crtime`, None if not indexed.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT * FROM files WHERE path = ?', (_normalize(path),)).fetchone()
+        return _entry(row) if row is not None else None
+
+    def listdir(self, path: str) -> list[dict[str, object]]:
+        """
+        Get the indexed entries of a folder.
+
+        Parameters
+        ----------
+        path : str
+            Remote folder.
+
+        Returns
+        -------
+        list[dict[str, object]]
+            Its entries sorted by name, see `get`.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT * FROM files WHERE parent = ? ORDER BY name',
+                                    (_normalize(path),)).fetchall()
+        return [_entry(row) for row in rows]
+
+    def find(self,
+             name: Optional[str] = None,
+             ext: Optional[Union[str, Iterable[str]]] = None,
+             min_size: Optional[int] = None,
+             max_size: Optional[int] = None,
+             modified_after: Optional[Time] = None,
+             modified_before: Optional[Time] = None,
+             under: Optional[str] = None,
+             isdir: Optional[bool] = False,
+             order_by: str = 'path',
+             limit: Optional[int] = None
+             ) -> list[dict[str, object]]:
+        """
+        Query the index, every criterion given must match.
+
+        Parameters
+        ----------
+        name : str, optional
+            Glob pattern of the name, case insensitive, for example `'IMG_*.jpg'`.
+        ext : str or Iterable[str], optional
+            Extension or extensions, without the dot, case insensitive.
+        min_size : int, optional
+            Minimum size in bytes.
+        max_size : int, optional
+            Maximum size in bytes.
+        modified_after : float or datetime, optional
+            Earliest modification time, included.
+        modified_before : float or datetime, optional
+            Latest modification time, excluded.
+        under : str, optional
+            Folder the entries must be in, at any depth.
+        isdir : bool, optional
+            `False` for files only, `True` for folders only, `None` for both. Defaults to `False`.
+        order_by : str, optional
+            `'path'`, `'name'`, `'size'` or `'mtime'`, prefixed with `-` for descending order. Defaults to `'path'`.
+        limit : int, optional
+            Maximum number of entries returned.
+
+        Returns
+        -------
+        list[dict[str, object]]
+            The matching entries, see `get`.
+        """
+        where = []
+        args: list[object] = []
+        if name is not None:
+            where.append("name LIKE ? ESCAPE '\\'")
+            args.append(_glob_to_like(name))
+        if ext is not None:
+            exts = [ext] if isinstance(ext, str) else list(ext)
+            where.append('ext IN (%s)' % ','.join('?' * len(exts)))
+            args += [e.lower().lstrip('.') for e in exts]
+        if min_size is not None:
+            where.append('size >= ?')
+            args.append(min_size)
+        if max_size is not None:
+            where.append('size <= ?')
+            args.append(max_size)
+        if modified_after is not None:
+            where.append('mtime >= ?')
+            args.append(_timestamp(modified_after))
+        if modified_before is not None:
+            where.append('mtime < ?')
+            args.append(_timestamp(modified_before))
+        if under is not None:
+            where.append(_BELOW)
+            args += _below(_normalize(under))
+        if isdir is not None:
+            where.append('isdir = ?')
+            args.append(int(isdir))
+
+        column = order_by.lstrip('-')
+        if column not in ('path', 'name', 'size', 'mtime'):
+            raise ValueError('order_by must be path, name, size or mtime')
+        sql = 'SELECT * FROM files'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY %s %s' % (column,
+                                    'DESC' if order_by.startswith('-') else 'ASC')
+        # LIKE has no character classes, they are checked on the rows found
+        classes = name is not None and '[' in name
+        if limit is not None and not classes:
+            sql += ' LIMIT %d' % int(limit)
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        if classes:
+            pattern = re.compile(fnmatch.translate(name), re.IGNORECASE)
+            rows = [row for row in rows if pattern.match(row['name'])][:limit]
+        return [_entry(row) for row in rows]
+
+    def count(self, under: Optional[str] = None) -> dict[str, int]:
+        """
+        Count the indexed entries.
+
+        Parameters
+        ----------
+        under : str, optional
+            Folder to count in. Defaults to the whole index.
+
+        Returns
+        -------
+        dict[str, int]
+            Number of `files` and `folders`, and the `bytes` of the files.
+        """
+        sql = 'SELECT isdir, COUNT(*), SUM(size) FROM files'
+        args: tuple = ()
+        if under is not None:
+            sql += ' WHERE ' + _BELOW
+            args = _below(_normalize(under))
+        counts = {'files': 0, 'folders': 0, 'bytes': 0}
+        with self._lock:
+            for isdir, count, size in self._db.execute(sql + ' GROUP BY isdir', args):
+                if isdir:
+                    counts['folders'] = count
+                else:
+                    counts['files'] = count
+                    counts['bytes'] = size or 0
+        return counts
+
+
+_UPSERT = 'INSERT OR REPLACE INTO files (%s, crawl) VALUES (%s)' % (
+    ', '.join(_COLUMNS), ', '.join('?' * (len(_COLUMNS) + 1)))
+
+
+def _normalize(path: str) -> str:
+    """
+    Normalize a remote path, without trailing slash.
+
+    Parameters
+    ----------
+    path : str
+        Remote path.
+
+    Returns
+    -------
+    str
+        The path, starting with `/`.
+    """
+    return '/' + path.strip('/')
+
+
+def _time(entry: dict[str, object], key: str) -> int:
+    """
+    Get a time attribute of a listed entry.
+
+    Parameters
+    ----------
+    entry : dict[str, object]
+        Entry returned by FileStation.
+    key : str
+        `'mtime'` or `'crtime'`.
+
+    Returns
+    -------
+    int
+        The Unix timestamp, `0` if not returned.
+    """
+    return int(entry.get('additional', {}).get('time', {}).get(key, 0))
+
+
+def _mtime(entry: dict[str, object]) -> int:
+    """
+    Get the modification time of a listed entry.
+
+    Parameters
+    ----------
+    entry : dict[str, object]
+        Entry returned by FileStation.
+
+    Returns
+    -------
+    int
+        The Unix timestamp, `0` if not returned.
+    """
+    return _time(entry, 'mtime')
+
+
+def _row(entry: dict[str, object], listed_mtime: Optional[int] = None) -> tuple:
+    """
+    Build the database row of a listed entry.
+
+    Parameters
+    ----------
+    entry : dict[str, object]
+        Entry returned by FileStation.
+    listed_mtime : int, optional
+        For folders, their modification time when their entries were indexed.
+
+    Returns
+    -------
+    tuple
+        Values of the `_COLUMNS`.
+    """
+    path = entry['path']
+    name = entry.get('name') or posixpath.basename(path)
+    isdir = bool(entry.get('isdir'))
+    ext = '' if isdir else posixpath.splitext(name)[1][1:].lower()
+    size = 0 if isdir else int(entry.get('additional', {}).get('size', 0))
+    return (path, posixpath.dirname(path), name, ext, int(isdir), size,
+            _mtime(entry), _time(entry, 'crtime'), listed_mtime)
+
+
+def _entry(row: sqlite3.Row) -> dict[str, object]:
+    """
+    Turn a database row into an entry returned by the queries.
+
+    Parameters
+    ----------
+    row : sqlite3.Row
+        The row.
+
+    Returns
+    -------
+    dict[str, object]
+        `path`, `name`, `ext`, `isdir`, `size`, `mtime` and `crtime`.
+    """
+    return {'path': row['path'], 'name': row['name'], 'ext': row['ext'], 'isdir': bool(row['isdir']),
+            'size': row['size'], 'mtime': row['mtime'], 'crtime': row['crtime']}
+
+
+def _below(folder: str) -> tuple[int, str]:
+    """
+    Build the arguments of `_BELOW` for the paths below a folder.
+
+    Parameters
+    ----------
+    folder : str
+        Normalized remote folder.
+
+    Returns
+    -------
+    tuple[int, str]
+        Length of the path prefix, and the prefix.
+    """
+    prefix = folder.rstrip('/') + '/'
+    return len(prefix), prefix
+
+
+def _glob_to_like(pattern: str) -> str:
+    """
+    Translate a glob pattern into a LIKE pattern matching at least the same names.
+
+    Parameters
+    ----------
+    pattern : str
+        Glob pattern.
+
+    Returns
+    -------
+    str
+        The LIKE pattern, character classes are widened to any character.
+    """
+    pattern = re.sub(r'\[[^\]]*\]', '?', pattern)
+    escaped = re.sub(r'([\\%_])', r'\\\1', pattern)
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+def _timestamp(value: Time) -> float:
+    """
+    Convert a time to a Unix timestamp.
+
+    Parameters
+    ----------
+    value : float or datetime
+        The time.
+
+    Returns
+    -------
+    float
+        The Unix timestamp.
+    """
+    return value.timestamp() if isinstance(value, datetime) else float(value)
@@ -6,10 +6,14 @@ allowing file management, search, upload, download, and background task operatio
 """
 
 from __future__ import annotations
-from typing import Optional, Any
+from typing import Callable, Iterator, Optional, Any
 import os
 import io
+import json
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 import requests
@@ -20,6 +24,9 @@ import warnings
 from urllib import parse
 from treelib import Tree
 from . import base_api
+from .exceptions import FileStationError
+from .pagination import iter_pages, page_items
+from .tasks import BackgroundTask, LAST_TASKID, START_METHODS
 
 
 class FileStation(base_api.BaseApi):
@@ -118,6 +125,7 @@ class FileStation(base_api.BaseApi):
         self._extract_taskid_list: list[str] = []
         self._compress_taskid: str = ''
         self._compress_taskid_list: list[str] = []
+        self._start_task_lock: threading.Lock = threading.Lock()
 
         self.session.get_api_list('FileStation')
 
@@ -258,6 +266,41 @@ class FileStation(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_file_list(self,
+                       folder_path: str,
+                       page_size: int = 1000,
+                       offset: int = 0,
+                       prefetch: bool = True,
+                       **kwargs: Any
+                       ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over all the files of a folder.
+
+        Pages through `get_file_list` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        folder_path : str
+            Path to the folder.
+        page_size : int, optional
+            Number of items requested per page. Defaults to `1000`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `get_file_list`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.get_file_list(folder_path=folder_path, offset=offset, limit=limit, **kwargs),
+                              'SYNO.FileStation.List', 'files', page_size, offset, prefetch, self.session)
+
     def get_file_info(self,
                       path: Optional[str] = None,
                       additional: Optional[str | list[str]] = None
@@ -472,6 +515,120 @@ class FileStation(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_search_list(self,
+                         task_id: str,
+                         page_size: int = 1000,
+                         offset: int = 0,
+                         prefetch: bool = True,
+                         **kwargs: Any
+                         ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over the results found so far by a search task.
+
+        Pages through `get_search_list` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        task_id : str
+            Task ID of the search task.
+        page_size : int, optional
+            Number of items requested per page. Defaults to `1000`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `get_search_list`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.get_search_list(task_id, offset=offset, limit=limit, **kwargs),
+                              'SYNO.FileStation.Search', 'files', page_size, offset, prefetch, self.session)
+
+    def iter_search(self,
+                    folder_path: str,
+                    page_size: int = 500,
+                    additional: Optional[str | list[str]] = None,
+                    poll_interval: float = 0.5,
+                    max_interval: float = 5.0,
+                    **kwargs: Any
+                    ) -> Iterator[dict[str, object]]:
+        """
+        Start a search task and iterate over its results as the NAS finds them.
+
+        Only the results found since the previous request are fetched. While the search is running
+        and no new result comes, the delay between two requests grows up to `max_interval`. The
+        task is stopped and its results are cleaned when the iteration ends, including when the
+        caller stops early.
+
+        Parameters
+        ----------
+        folder_path : str
+            Path to the folder where the search will start.
+        page_size : int, optional
+            Maximum number of results requested at once. Defaults to `500`.
+        additional : str or list of str, optional
+            Additional attributes of the results, see `get_search_list`.
+        poll_interval : float, optional
+            Seconds before asking again for results while the search is running. Defaults to `0.5`.
+        max_interval : float, optional
+            Maximum seconds between two requests. Defaults to `5`.
+        **kwargs : Any
+            Other parameters of `search_start` (`recursive`, `pattern`, `extension`, ...).
+
+        Yields
+        ------
+        dict[str, object]
+            The results, in the order they are found.
+
+        Examples
+        --------
+        ```python
+        for entry in fs.iter_search('/home', pattern='*.mkv'):
+            print(entry['path'])
+            if enough():
+                break
+        ```
+        """
+        api_name = 'SYNO.FileStation.Search'
+        if page_size < 1:
+            raise ValueError('page_size must be greater than 0')
+
+        task = self.start_task('search', folder_path=folder_path, **kwargs)
+        taskid = json.dumps(task.taskid)
+        offset = 0
+        interval = poll_interval
+        try:
+            while True:
+                response = self.get_search_list(
+                    taskid, offset=offset, limit=page_size, additional=additional)
+                files = page_items(response, api_name, 'files')
+                offset += len(files)
+                yield from files
+
+                if len(files) >= page_size:
+                    # More results may already be waiting
+                    continue
+                if response['data'].get('finished'):
+                    return
+                interval = poll_interval if files else min(
+                    max_interval, interval * 1.5)
+                time.sleep(interval)
+        finally:
+            # Stop the search if the caller stopped early, and drop its results on the NAS
+            try:
+                self.stop_search_task(taskid)
+                info = self.file_station_list[api_name]
+                self.request_data(api_name, info['path'], {'version': info['maxVersion'], 'method': 'clean',
+                                                           'taskid': taskid})
+            except FileStationError:
+                pass
+
     def stop_search_task(self, taskid: str) -> dict[str, object] | str:
         """
         Stop a search task.
@@ -490,7 +647,7 @@ class FileStation(base_api.BaseApi):
         info = self.file_station_list[api_name]
         api_path = info['path']
         req_param = {'version': info['maxVersion'],
-                     'method': 'stop', 'taskid': self._search_taskid}
+                     'method': 'stop', 'taskid': taskid}
 
         if taskid is None:  # NOTE this is unreachable
             return 'Enter a valid taskid, choose between ' + str(self._search_taskid_list)
@@ -1051,57 +1208,291 @@ class FileStation(base_api.BaseApi):
             Upload result or error message.
         """
         api_name = 'SYNO.FileStation.Upload'
+        if progress_bar:
+            bar = tqdm.tqdm(desc='Upload Progress',
+                            total=os.path.getsize(file_path),
+                            dynamic_ncols=True,
+                            unit='B',
+                            unit_scale=True,
+                            unit_divisor=1024
+                            )
+            r = self._post_upload(dest_path, file_path, create_parents, overwrite, verify,
+                                  lambda size: bar.update(size))
+            bar.close()
+        else:
+            r = self._post_upload(
+                dest_path, file_path, create_parents, overwrite, verify)
+
+        if r.status_code != 200 or not r.json()['success']:
+            return r.status_code, r.json()
+
+        return r.json()
+
+    def upload_files(self,
+                     dest_path: str,
+                     paths: str | list[str],
+                     overwrite: bool = True,
+                     verify: bool = False,
+                     max_workers: int = 4,
+                     progress_bar: bool = True,
+                     progress_callback: Optional[Callable] = None
+                     ) -> dict[str, object]:
+        """
+        Upload many files, or a whole directory, with several concurrent uploads.
+
+        The destination folders are created once, in a few requests, before the uploads start.
+        Uploads share the keep-alive connections of the session, so `max_workers` should not
+        exceed its pool size (10 by default).
+
+        Parameters
+        ----------
+        dest_path : str
+            Destination folder on the server.
+        paths : str or list of str
+            Local files to upload, or a local directory uploaded with its sub-directories.
+        overwrite : bool, optional
+            If True, existing files will be overwritten. Default is True.
+        verify : bool, optional
+            If True, SSL certificates will be verified. Default is False.
+        max_workers : int, optional
+            Number of files uploaded at the same time. Default is 4.
+        progress_bar : bool, optional
+            If True, shows a single progress bar for all the files. Default is True.
+        progress_callback : Callable, optional
+            Called as `progress_callback(bytes_sent, total_bytes)` every time data is sent.
+
+        Returns
+        -------
+        dict[str, object]
+            Summary of the upload, with the keys:
+            - `uploaded`: remote paths of the uploaded files.
+            - `failed`: local paths of the files that failed, mapped to the error.
+            - `bytes`: number of bytes sent.
+            - `elapsed`: duration of the upload in seconds.
+            - `throughput`: average throughput in bytes per second.
+
+        Examples
+        --------
+        ```python
+        fs.upload_files('/home/backup', '/data/photos', max_workers=8,
+                        progress_callback=lambda sent, total: print('%d/%d' % (sent, total)))
+        ```
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+
+        # (local path, remote folder) of every file to upload
+        files = []
+        dest_path = dest_path.rstrip('/')
+        if isinstance(paths, str) and os.path.isdir(paths):
+            for root, _, names in os.walk(paths):
+                relative = os.path.relpath(root, paths).replace(os.sep, '/')
+                folder = dest_path if relative == '.' else dest_path + '/' + relative
+                files += [(os.path.join(root, name), folder)
+                          for name in sorted(names)]
+        else:
+            if isinstance(paths, str):
+                paths = [paths]
+            files = [(path, dest_path) for path in paths]
+
+        # Shared folders (first level) cannot be created here, they must already exist
+        folders = sorted(
+            {folder for _, folder in files if folder.count('/') > 1})
+        # Each upload creates its folders itself if they could not be created beforehand
+        create_parents = not self._create_folders(folders)
+
+        total = sum(os.path.getsize(path) for path, _ in files)
+        sent = 0
+        lock = threading.Lock()
+        bar = None
+        if progress_bar:
+            bar = tqdm.tqdm(desc='Upload Progress',
+                            total=total,
+                            dynamic_ncols=True,
+                            unit='B',
+                            unit_scale=True,
+                            unit_divisor=1024
+                            )
+
+        def on_read(size: int) -> None:
+            """
+            Add the bytes sent by one upload to the aggregate progress.
+
+            Parameters
+            ----------
+            size : int
+                Bytes sent since the last call.
+            """
+            nonlocal sent
+            with lock:
+                sent += size
+                if bar is not None:
+                    bar.update(size)
+                if progress_callback is not None:
+                    progress_callback(sent, total)
+
+        def upload(path: str, folder: str) -> dict[str, object]:
+            """
+            Upload one file, the destination folder is normally created already.
+
+            Parameters
+            ----------
+            path : str
+                Local file path.
+            folder : str
+                Remote destination folder.
+
+            Returns
+            -------
+            dict[str, object]
+                Response of the upload.
+            """
+            r = self._post_upload(folder, path, create_parents,
+                                  overwrite, verify, on_read)
+            response = r.json()
+            if r.status_code != 200 or not response['success']:
+                raise FileStationError(error_code=response.get(
+                    'error', {}).get('code', r.status_code))
+            return response
+
+        uploaded = []
+        failed = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload') as pool:
+            futures = {pool.submit(upload, path, folder): (path, folder)
+                       for path, folder in files}
+            for future in as_completed(futures):
+                path, folder = futures[future]
+                try:
+                    future.result()
+                    uploaded.append(folder + '/' + os.path.basename(path))
+                except Exception as e:
+                    failed[path] = e
+        elapsed = time.perf_counter() - start
+        if bar is not None:
+            bar.close()
+
+        return {'uploaded': uploaded,
+                'failed': failed,
+                'bytes': sent,
+                'elapsed': elapsed,
+                'throughput': sent / elapsed if elapsed else 0.0}
+
+    def _create_folders(self, folders: list[str]) -> bool:
+        """
+        Create folders and their parents, in requests short enough for DSM.
+
+        Parameters
+        ----------
+        folders : list[str]
+            Absolute remote paths of the folders, below a shared folder.
+
+        Returns
+        -------
+        bool
+            True if every folder was created or already existed.
+        """
+        # bulk_ops imports this module
+        from .bulk_ops import plan_batches
+
+        for batch in plan_batches(folders):
+            try:
+                response = self.create_folder([os.path.dirname(folder) or '/' for folder in batch],
+                                              [os.path.basename(folder) for folder in batch], force_parent=True)
+            except FileStationError:
+                return False
+            if not isinstance(response, dict) or not response.get('success'):
+                return False
+        return True
+
+    def _post_upload(self,
+                     dest_path: str,
+                     file_path: str,
+                     create_parents: bool,
+                     overwrite: bool,
+                     verify: bool,
+                     on_read: Optional[Callable[[int], Any]] = None,
+                     mtime: Optional[float] = None
+                     ) -> requests.Response:
+        """
+        Send one file as a streaming multipart POST over the pooled session.
+
+        Parameters
+        ----------
+        dest_path : str
+            Destination path on the server.
+        file_path : str
+            Path to the file to upload.
+        create_parents : bool
+            If True, parent folders will be created.
+        overwrite : bool
+            If True, existing files will be overwritten.
+        verify : bool
+            If True, SSL certificates will be verified.
+        on_read : Callable[[int], Any], optional
+            Called with the number of file bytes sent since the previous call.
+        mtime : float, optional
+            Modification time given to the remote file, as a Unix timestamp. Default is the upload time.
+
+        Returns
+        -------
+        requests.Response
+            Raw response of the upload.
+        """
+        api_name = 'SYNO.FileStation.Upload'
         info = self.file_station_list[api_name]
         api_path = info['path']
         filename = os.path.basename(file_path)
 
-        session = requests.session()
-
         with open(file_path, 'rb') as payload:
             url = ('%s%s' % (self.base_url, api_path)) + '?api=%s&version=%s&method=upload&_sid=%s' % (
                 api_name, info['minVersion'], self._sid)
 
-            encoder = MultipartEncoder({
+            fields = {
                 'path': dest_path,
                 'create_parents': str(create_parents).lower(),
                 'overwrite': str(overwrite).lower(),
-                'files': (filename, payload, 'application/octet-stream')
-            })
-
-            if progress_bar:
-                bar = tqdm.tqdm(desc='Upload Progress',
-                                total=encoder.len,
-                                dynamic_ncols=True,
-                                unit='B',
-                                unit_scale=True,
-                                unit_divisor=1024
-                                )
-
-                monitor = MultipartEncoderMonitor(
-                    encoder, lambda monitor: bar.update(monitor.bytes_read - bar.n))
-
-                r = session.post(
-                    url,
-                    data=monitor,
-                    verify=verify,
-                    headers={"X-SYNO-TOKEN": self.session._syno_token,
-                             'Content-Type': monitor.content_type}
-                )
-
-            else:
-                r = session.post(
-                    url,
-                    data=encoder,
-                    verify=verify,
-                    headers={"X-SYNO-TOKEN": self.session._syno_token,
-                             'Content-Type': encoder.content_type}
-                )
-
-        session.close()
-        if r.status_code != 200 or not r.json()['success']:
-            return r.status_code, r.json()
-
-        return r.json()
+            }
+            if mtime is not None:
+                # Milliseconds
+                fields['mtime'] = str(int(mtime * 1000))
+            # The file must be the last field
+            fields['files'] = (filename, payload, 'application/octet-stream')
+            encoder = MultipartEncoder(fields)
+            data = encoder
+
+            if on_read is not None:
+                # Report the file bytes only, not the multipart framing
+                file_size = os.path.getsize(file_path)
+                overhead = encoder.len - file_size
+                reported = 0
+
+                def callback(monitor: MultipartEncoderMonitor) -> None:
+                    """
+                    Forward the progress of the encoder.
+
+                    Parameters
+                    ----------
+                    monitor : MultipartEncoderMonitor
+                        The monitor reading the encoder.
+                    """
+                    nonlocal reported
+                    done = min(
+                        max(monitor.bytes_read - overhead, 0), file_size)
+                    if done > reported:
+                        on_read(done - reported)
+                        reported = done
+
+                data = MultipartEncoderMonitor(encoder, callback)
+
+            with self.session.transfer('post', url, api_name, 'upload', info['minVersion'],
+                                       data=data,
+                                       verify=verify,
+                                       headers={"X-SYNO-TOKEN": self.session._syno_token,
+                                                'Content-Type': data.content_type}
+                                       ) as r:
+                return r
 
     def get_shared_link_info(self, link_id: str) -> dict[str, object] | str:
         """
@@ -1169,6 +1560,38 @@ class FileStation(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_shared_link_list(self,
+                              page_size: int = 500,
+                              offset: int = 0,
+                              prefetch: bool = True,
+                              **kwargs: Any
+                              ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over all the shared links.
+
+        Pages through `get_shared_link_list` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of items requested per page. Defaults to `500`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `get_shared_link_list`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.get_shared_link_list(offset=offset, limit=limit, **kwargs),
+                              'SYNO.FileStation.Sharing', 'links', page_size, offset, prefetch, self.session)
+
     def create_sharing_link(self,
                             path: str,
                             password: Optional[str] = None,
@@ -2040,6 +2463,67 @@ class FileStation(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def task(self, kind: str, taskid: Optional[str] = None) -> BackgroundTask:
+        """
+        Get a handle on a background task, to wait for it or stop it.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of task: `'copy_move'`, `'delete'`, `'extract'`, `'compress'`, `'dir_size'`, `'md5'`
+            or `'search'`.
+        taskid : str, optional
+            Task ID. Defaults to the last task of this kind started with this instance.
+
+        Returns
+        -------
+        BackgroundTask
+            The task handle.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        if taskid is None:
+            taskid = getattr(self, LAST_TASKID.get(kind, ''), '')
+            if not taskid:
+                raise ValueError('No {} task was started'.format(kind))
+        return BackgroundTask(self, kind, taskid)
+
+    def start_task(self, kind: str, *args: Any, **kwargs: Any) -> BackgroundTask:
+        """
+        Start a background task and get a handle on it.
+
+        Calls the matching start method: `start_copy_move`, `start_delete_task`, `start_extract_task`,
+        `start_file_compression`, `start_dir_size_calc`, `start_md5_calc` or `search_start`.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of task: `'copy_move'`, `'delete'`, `'extract'`, `'compress'`, `'dir_size'`, `'md5'`
+            or `'search'`.
+        *args : Any
+            Positional arguments of the start method.
+        **kwargs : Any
+            Keyword arguments of the start method.
+
+        Returns
+        -------
+        BackgroundTask
+            The task handle, see `BackgroundTask.wait` and `tasks.as_completed`.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        if kind not in START_METHODS:
+            raise ValueError('kind must be one of ' + ', '.join(START_METHODS))
+        attribute = LAST_TASKID[kind]
+        # The start methods keep the task id in a shared attribute, one task is started at a time
+        with self._start_task_lock:
+            setattr(self, attribute, '')
+            output = getattr(self, START_METHODS[kind])(*args, **kwargs)
+            taskid = getattr(self, attribute)
+        if isinstance(output, dict) and output.get('taskid'):
+            taskid = output['taskid']
+        if not taskid:
+            raise ValueError(output)
+        return BackgroundTask(self, kind, taskid)
+
     def get_list_of_all_background_task(self,
                                         offset: Optional[int] = None,
                                         limit: Optional[int] = None,
@@ -2093,7 +2577,7 @@ class FileStation(base_api.BaseApi):
                  dest_path: str = ".",
                  chunk_size: int = 8192,
                  verify: bool = False
-                 ) -> Optional[str]:
+                 ) -> Optional[str] | io.BytesIO | Iterator[bytes]:
         """
         Download a file from the server.
 
@@ -2102,7 +2586,11 @@ class FileStation(base_api.BaseApi):
         path : str
             Path to the file on the server.
         mode : str
-            Mode for downloading the file ('open' to open in browser, 'download' to download to disk).
+            Mode for downloading the file:
+            - 'open' to write it to the standard output.
+            - 'download' to download it to disk, see `download_file` for resumable and parallel downloads.
+            - 'serve' to get its whole content in memory as `io.BytesIO`.
+            - 'stream' to get an iterator over its content, see `iter_file`.
         dest_path : str, optional
             Destination path on the local machine (for 'download' mode).
         chunk_size : int, optional
@@ -2112,55 +2600,564 @@ class FileStation(base_api.BaseApi):
 
         Returns
         -------
-        Optional[str]
-            None if successful, error message otherwise.
+        Optional[str] or io.BytesIO or Iterator[bytes]
+            None if successful, error message otherwise. The content for 'serve' and 'stream' modes.
         """
         api_name = 'SYNO.FileStation.Download'
-        info = self.file_station_list[api_name]
-        api_path = info['path']
 
         if path is None:
             return 'Enter a valid path'
 
-        session = requests.session()
-
-        url = ('%s%s' % (self.base_url, api_path)) + '?api=%s&version=%s&method=download&path=%s&mode=%s&_sid=%s' % (
-            api_name, info['maxVersion'], parse.quote_plus(path), mode, self._sid)
-
         if mode is None:
-            return 'Enter a valid mode (open / download)'
+            return 'Enter a valid mode (open / download / serve / stream)'
 
         if mode == r'open':
-            with session.get(url, stream=True, verify=verify, headers={"X-SYNO-TOKEN": self.session._syno_token}) as r:
-                r.raise_for_status()
-                for chunk in r.iter_content(chunk_size=chunk_size):
-                    if chunk:  # filter out keep-alive new chunks
-                        sys.stdout.buffer.write(chunk)
+            for chunk in self.iter_file(path, chunk_size=chunk_size, verify=verify, mode='open'):
+                sys.stdout.buffer.write(chunk)
 
         if mode == r'download':
-            with session.get(url, stream=True, verify=verify, headers={"X-SYNO-TOKEN": self.session._syno_token}) as r:
-                r.raise_for_status()
-                if not os.path.isdir(dest_path):
-                    os.makedirs(dest_path)
-                with open(dest_path + "/" + os.path.basename(path), 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=chunk_size):
-                        if chunk:  # filter out keep-alive new chunks
-                            f.write(chunk)
+            self.download_file(path, dest_path, resume=False,
+                               chunk_size=chunk_size, verify=verify)
 
         if mode == r'serve':
-            with session.get(url, stream=True, verify=verify, headers={"X-SYNO-TOKEN": self.session._syno_token}) as r:
-                r.raise_for_status()
-                return io.BytesIO(r.content)
+            return io.BytesIO(b''.join(self.iter_file(path, chunk_size=chunk_size, verify=verify)))
+
+        if mode == r'stream':
+            return self.iter_file(path, chunk_size=chunk_size, verify=verify)
+
+    def iter_file(self,
+                  path: str,
+                  offset: int = 0,
+                  end: Optional[int] = None,
+                  chunk_size: int = 1024 * 1024,
+                  verify: bool = False,
+                  mode: str = 'download'
+                  ) -> Iterator[bytes]:
+        """
+        Stream the content of a file, without loading it in memory.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        offset : int, optional
+            Position of the first byte to read. Default is 0.
+        end : int, optional
+            Position of the last byte to read, included. Default is the end of the file.
+        chunk_size : int, optional
+            Size of the chunks yielded. Default is 1 MiB.
+        verify : bool, optional
+            If True, SSL certificates will be verified. Default is False.
+        mode : str, optional
+            Download mode sent to the API. Default is 'download'.
+
+        Yields
+        ------
+        bytes
+            The content of the file, chunk by chunk.
+
+        Examples
+        --------
+        ```python
+        with open('backup.img', 'wb') as f:
+            for chunk in fs.iter_file('/home/backup.img'):
+                f.write(chunk)
+        ```
+        """
+        api_name = 'SYNO.FileStation.Download'
+        headers = {"X-SYNO-TOKEN": self.session._syno_token}
+        if offset or end is not None:
+            headers['Range'] = 'bytes=%d-%s' % (offset,
+                                                '' if end is None else end)
+
+        # The slot is held until the whole range is read
+        with self.session.transfer('get', self._download_url(path, mode), api_name, 'download',
+                                   stream=True, verify=verify, headers=headers) as r:
+            r.raise_for_status()
+            # The server ignored the range, skip the bytes before it and stop after it
+            skip = offset if r.status_code != 206 else 0
+            left = None if end is None or r.status_code == 206 else end - offset + 1
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if skip:
+                    skipped = min(skip, len(chunk))
+                    chunk = chunk[skipped:]
+                    skip -= skipped
+                if left is not None:
+                    chunk = chunk[:left]
+                    left -= len(chunk)
+                if chunk:  # filter out keep-alive new chunks
+                    yield chunk
+                if left == 0:
+                    break
+
+    def download_file(self,
+                      path: str,
+                      dest_path: str = '.',
+                      resume: bool = True,
+                      max_workers: int = 1,
+                      part_size: int = 64 * 1024 * 1024,
+                      chunk_size: int = 1024 * 1024,
+                      retries: int = 3,
+                      verify: bool = False,
+                      progress_callback: Optional[Callable] = None
+                      ) -> str:
+        """
+        Download a file to disk, resuming interrupted downloads and splitting big files in parallel ranges.
+
+        The file is written to `<name>.part` and renamed once complete. A dropped connection is
+        retried from the last byte written, and with `resume` a later call continues an
+        interrupted download instead of starting over. Both need the server to honour HTTP Range
+        requests, otherwise the file is downloaded from the start in a single stream.
+
+        The size and modification time of the remote file are saved next to the `.part` file, a
+        download is only resumed if they did not change.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        dest_path : str, optional
+            Destination folder on the local machine. Default is the current folder.
+        resume : bool, optional
+            If True, continue from an existing `.part` file. Default is True.
+        max_workers : int, optional
+            Number of ranges downloaded at the same time, files smaller than `part_size` use one. Default is 1.
+        part_size : int, optional
+            Size of each range in parallel downloads. Default is 64 MiB.
+        chunk_size : int, optional
+            Size of the chunks read from the connection. Default is 1 MiB.
+        retries : int, optional
+            Number of times a dropped connection is retried, per range. Default is 3.
+        verify : bool, optional
+            If True, SSL certificates will be verified. Default is False.
+        progress_callback : Callable, optional
+            Called as `progress_callback(bytes_written, total_bytes)` every time data is written,
+            `total_bytes` is None if the server does not report the size.
+
+        Returns
+        -------
+        str
+            Path of the downloaded file.
+
+        Examples
+        --------
+        ```python
+        fs.download_file('/home/backup.img', '/data', max_workers=8)
+        ```
+        """
+        api_name = 'SYNO.FileStation.Download'
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+
+        os.makedirs(dest_path, exist_ok=True)
+        local_path = os.path.join(dest_path, os.path.basename(path))
+        part_path = local_path + '.part'
+        state_path = part_path + '.json'
+        total, ranges, validator = self._probe_download(path, verify)
+        version = self._download_version(
+            path, validator) if resume and ranges else None
+
+        # What a previous download of the same version of the file left, if any
+        state = {}
+        if version is not None and os.path.exists(state_path) and os.path.exists(part_path):
+            try:
+                with open(state_path, 'r') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                pass
+            if not isinstance(state, dict) or state.get('size') != total or state.get('version') != version:
+                state = {}
+
+        # Start offsets of the ranges already downloaded by a previous parallel download
+        done = set()
+        if state.get('part_size') == part_size:
+            done = set(state.get('done', []))
+
+        if ranges and total is not None and (done or (max_workers > 1 and total > part_size)):
+            self._download_ranges(path, part_path, state_path, total, done, max_workers, part_size,
+                                  chunk_size, retries, verify, progress_callback, version)
+        else:
+            offset = 0
+            if state and 'part_size' not in state:
+                offset = os.path.getsize(part_path)
+                if total is not None and offset > total:
+                    offset = 0
+            elif version is not None:
+                with open(state_path, 'w') as f:
+                    json.dump({'size': total, 'version': version}, f)
+            written = [offset]
+
+            def on_write(size: int) -> None:
+                """
+                Report the progress of the download.
+
+                Parameters
+                ----------
+                size : int
+                    Bytes written since the last call.
+                """
+                written[0] += size
+                if progress_callback is not None:
+                    progress_callback(written[0], total)
+
+            with open(part_path, 'r+b' if offset else 'wb') as f:
+                f.truncate(offset)
+                if total is None or offset < total:
+                    self._download_range(path, f, offset, None, chunk_size, retries if ranges else 0,
+                                         verify, on_write)
+
+        os.replace(part_path, local_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return local_path
+
+    def _download_url(self, path: str, mode: str = 'download') -> str:
+        """
+        Build the URL of a file download.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        mode : str, optional
+            Download mode sent to the API. Default is 'download'.
+
+        Returns
+        -------
+        str
+            URL of the download, including the session ID.
+        """
+        api_name = 'SYNO.FileStation.Download'
+        info = self.file_station_list[api_name]
+        api_path = info['path']
+
+        return ('%s%s' % (self.base_url, api_path)) + '?api=%s&version=%s&method=download&path=%s&mode=%s&_sid=%s' % (
+            api_name, info['maxVersion'], parse.quote_plus(path), mode, self._sid)
+
+    def _probe_download(self, path: str, verify: bool) -> tuple[Optional[int], bool, Optional[str]]:
+        """
+        Get the size of a file, whether its download supports HTTP Range requests and its HTTP validator.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        verify : bool
+            If True, SSL certificates will be verified.
+
+        Returns
+        -------
+        tuple[Optional[int], bool, Optional[str]]
+            The size of the file (None if unknown), whether ranges are supported and its `ETag`
+            or `Last-Modified` header (None if not sent).
+        """
+        # Ask for the first byte only, the total size comes back in Content-Range
+        with self.session.transfer('get', self._download_url(path), 'SYNO.FileStation.Download', 'download',
+                                   stream=True, verify=verify,
+                                   headers={"X-SYNO-TOKEN": self.session._syno_token,
+                                            'Range': 'bytes=0-0'}) as r:
+            content_range = r.headers.get('Content-Range', '')
+            validator = r.headers.get('ETag') or r.headers.get('Last-Modified')
+            if r.status_code == 416 and content_range.endswith('/0'):
+                # Empty file, there is no first byte
+                return 0, True, validator
+            r.raise_for_status()
+            if r.status_code == 206 and '/' in content_range:
+                size = content_range.rsplit('/', 1)[1]
+                return (int(size) if size.isdigit() else None), True, validator
+            length = r.headers.get('Content-Length')
+            return (int(length) if length and length.isdigit() else None), False, validator
+
+    def _download_version(self, path: str, validator: Optional[str]) -> Optional[str]:
+        """
+        Identify the version of a remote file, to tell whether a partial download of it can be resumed.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        validator : str, optional
+            `ETag` or `Last-Modified` header of the download, if the server sent one.
+
+        Returns
+        -------
+        str or None
+            The validator, or else the modification time of the file. None if unknown.
+        """
+        if validator:
+            return validator
+
+        api_name = 'SYNO.FileStation.List'
+        info = self.file_station_list[api_name]
+        try:
+            response = self.request_data(api_name, info['path'], {'version': info['maxVersion'],
+                                                                  'method': 'getinfo', 'path': path,
+                                                                  'additional': '["time"]'})
+        except FileStationError:
+            return None
+        files = response.get('data', {}).get('files') or [{}]
+        mtime = files[0].get('additional', {}).get('time', {}).get('mtime')
+        return None if mtime is None else 'mtime=%s' % mtime
+
+    def _download_range(self,
+                        path: str,
+                        f: io.BufferedRandom,
+                        start: int,
+                        end: Optional[int],
+                        chunk_size: int,
+                        retries: int,
+                        verify: bool,
+                        on_write: Callable
+                        ) -> None:
+        """
+        Write a range of a file at the same position of a local file, retrying dropped connections.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        f : io.BufferedRandom
+            Local file, opened for writing.
+        start : int
+            Position of the first byte of the range.
+        end : int, optional
+            Position of the last byte of the range, included. None for the end of the file.
+        chunk_size : int
+            Size of the chunks read from the connection.
+        retries : int
+            Number of times a dropped connection is retried.
+        verify : bool
+            If True, SSL certificates will be verified.
+        on_write : Callable
+            Called with the number of bytes written after each chunk.
+        """
+        position = start
+        while True:
+            try:
+                f.seek(position)
+                for chunk in self.iter_file(path, position, end, chunk_size, verify):
+                    f.write(chunk)
+                    position += len(chunk)
+                    on_write(len(chunk))
+                return
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                if retries <= 0:
+                    raise
+                retries -= 1
+
+    def _download_ranges(self,
+                         path: str,
+                         part_path: str,
+                         state_path: str,
+                         total: int,
+                         done: set[int],
+                         max_workers: int,
+                         part_size: int,
+                         chunk_size: int,
+                         retries: int,
+                         verify: bool,
+                         progress_callback: Optional[Callable],
+                         version: Optional[str] = None
+                         ) -> None:
+        """
+        Download the missing ranges of a file in parallel into a preallocated local file.
+
+        The start offsets of the completed ranges are saved next to the file, so an interrupted
+        download only fetches the missing ranges again.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file on the server.
+        part_path : str
+            Local file receiving the content.
+        state_path : str
+            Local file listing the completed ranges.
+        total : int
+            Size of the file.
+        done : set[int]
+            Start offsets of the ranges already downloaded.
+        max_workers : int
+            Number of ranges downloaded at the same time.
+        part_size : int
+            Size of each range.
+        chunk_size : int
+            Size of the chunks read from the connection.
+        retries : int
+            Number of times a dropped connection is retried, per range.
+        verify : bool
+            If True, SSL certificates will be verified.
+        progress_callback : Callable, optional
+            Called as `progress_callback(bytes_written, total_bytes)` every time data is written.
+        version : str, optional
+            Version of the remote file saved with the completed ranges, see `_download_version`.
+        """
+        if not done or not os.path.exists(part_path):
+            done = set()
+            with open(part_path, 'wb') as f:
+                f.truncate(total)
+
+        lock = threading.Lock()
+        written = [sum(min(part_size, total - start) for start in done)]
+
+        def on_write(size: int) -> None:
+            """
+            Report the progress of the download.
+
+            Parameters
+            ----------
+            size : int
+                Bytes written since the last call.
+            """
+            with lock:
+                written[0] += size
+                if progress_callback is not None:
+                    progress_callback(written[0], total)
+
+        def fetch(start: int) -> None:
+            """
+            Download one range and record it as completed.
+
+            Parameters
+            ----------
+            start : int
+                Position of the first byte of the range.
+            """
+            end = min(start + part_size, total) - 1
+            with open(part_path, 'r+b') as f:
+                self._download_range(path, f, start, end,
+                                     chunk_size, retries, verify, on_write)
+            with lock:
+                done.add(start)
+                with open(state_path, 'w') as f:
+                    json.dump({'size': total, 'version': version, 'part_size': part_size,
+                              'done': sorted(done)}, f)
+
+        starts = [start for start in range(0, total, part_size)
+                  if start not in done]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download') as pool:
+            for future in [pool.submit(fetch, start) for start in starts]:
+                future.result()
+
+    def walk(self,
+             folder_path: str,
+             max_depth: Optional[int] = None,
+             max_workers: int = 4,
+             page_size: int = 1000,
+             additional: Optional[str | list[str]] = None,
+             onerror: Optional[Callable] = None
+             ) -> Iterator[tuple[str, list[dict[str, object]], list[dict[str, object]]]]:
+        """
+        Walk a folder tree breadth-first, listing several folders at the same time.
+
+        Works like `os.walk` in top-down mode: removing entries from the yielded `dirs` list
+        prevents walking into them. Folders are listed page by page, so big folders are never
+        truncated and memory stays bounded by `page_size`, a folder larger than one page is
+        yielded once per page.
+
+        Parameters
+        ----------
+        folder_path : str
+            Folder to walk.
+        max_depth : int, optional
+            Depth of the deepest folders listed, `0` lists `folder_path` only. Default is no limit.
+        max_workers : int, optional
+            Number of pages requested at the same time. Default is 4.
+        page_size : int, optional
+            Number of entries requested per page. Default is 1000.
+        additional : str or list of str, optional
+            Additional attributes to include, see `get_file_list`.
+        onerror : Callable, optional
+            Called with the exception when a folder cannot be listed, the folder is then skipped.
+            By default the exception is raised.
+
+        Yields
+        ------
+        tuple[str, list[dict[str, object]], list[dict[str, object]]]
+            The folder path, its sub-folders and its files, as entries returned by `get_file_list`.
+
+        Examples
+        --------
+        ```python
+        for folder, dirs, files in fs.walk('/home', max_workers=8):
+            dirs[:] = [d for d in dirs if d['name'] != '#recycle']
+            for file in files:
+                print(file['path'])
+        ```
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+
+        def list_page(path: str, offset: int) -> dict[str, object]:
+            """
+            List one page of a folder.
+
+            Parameters
+            ----------
+            path : str
+                Folder path.
+            offset : int
+                Index of the first entry.
+
+            Returns
+            -------
+            dict[str, object]
+                The `data` of the response, with `files` and `total`.
+            """
+            response = self.get_file_list(folder_path=path, offset=offset, limit=page_size,
+                                          sort_by='name', additional=additional)
+            page_items(response, 'SYNO.FileStation.List', 'files')
+            return response['data']
+
+        # (folder path, depth, offset) of the pages to request, breadth-first
+        pending = deque([(folder_path, 0, 0)])
+        in_flight = deque()
+        pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='walk')
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max_workers:
+                    page = pending.popleft()
+                    in_flight.append(
+                        (page, pool.submit(list_page, page[0], page[2])))
+
+                (path, depth, offset), future = in_flight.popleft()
+                try:
+                    data = future.result()
+                except Exception as e:
+                    if onerror is None:
+                        raise
+                    onerror(e)
+                    continue
+
+                files = data.get('files', [])
+                if offset == 0:
+                    # The size is known now, request the next pages of the folder right away
+                    pending.extendleft(reversed([(path, depth, next_offset) for next_offset in
+                                                 range(len(files), data.get('total', 0), page_size)]
+                                                if files else []))
+
+                dirs = [entry for entry in files if entry.get('isdir')]
+                yield path, dirs, [entry for entry in files if not entry.get('isdir')]
+
+                if max_depth is None or depth < max_depth:
+                    pending.extend((entry['path'], depth + 1, 0)
+                                   for entry in dirs)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     def generate_file_tree(self,
                            folder_path: str,
                            tree: Tree,
                            max_depth: Optional[int] = 1,
-                           start_depth: Optional[int] = 0) -> None:
+                           start_depth: Optional[int] = 0,
+                           max_workers: int = 4) -> None:
         """
-        Recursively generate the file tree based on the folder path you give constrained with.
+        Generate the file tree based on the folder path you give constrained with.
 
-        You need to create the root node before calling this function.
+        You need to create the root node before calling this function. Folders are listed with
+        `walk`, concurrently and page by page.
 
         Parameters
         ----------
@@ -2172,6 +3169,8 @@ class FileStation(base_api.BaseApi):
             Non-negative number of maximum depth of tree generation if node tree is directory, default to '1' to generate full tree. If 'max_depth=0' it will be equivalent to no recursion.
         start_depth : int, optional
             Non negative number to start to control tree generation default to '0'.
+        max_workers : int, optional
+            Number of folders listed at the same time. Default is 4.
         """
         api_name = 'hotfix'  # fix for docs_parser.py issue
 
@@ -2188,28 +3187,17 @@ class FileStation(base_api.BaseApi):
         assert isinstance(tree, Tree), ValueError(
             "'tree' has to be a type of 'Tree'")
 
-        data: dict[str, object] = self.get_file_list(
-            folder_path=folder_path
-        ).get("data")
-
-        files = data.get("files")
-        _file_info_getter = map(lambda x: (
-            x.get('isdir'), x.get('name'), x.get('path')), files)
-        for isdir, file_name, file_path in _file_info_getter:
-
-            if isdir and (start_depth >= max_depth):
-                tree.create_node(file_name, file_path, parent=folder_path, data={
-                                 "isdir": isdir, "max_depth": True})
-
-            elif isdir:
-                tree.create_node(file_name, file_path, parent=folder_path, data={
-                                 "isdir": isdir, "max_depth": False})
-                self.generate_file_tree(
-                    file_path, tree, max_depth, start_depth + 1)
-
-            else:
-                tree.create_node(file_name, file_path, parent=folder_path, data={
-                                 "isdir": isdir, "max_depth": False})
+        walk_depth = max_depth - start_depth
+        root_level = tree.level(folder_path)
+        for path, dirs, files in self.walk(folder_path, walk_depth, max_workers):
+            # Sub-folders of the deepest listed folders are not walked into
+            at_max_depth = tree.level(path) - root_level >= walk_depth
+            for entry in dirs:
+                tree.create_node(entry.get('name'), entry.get('path'), parent=path, data={
+                                 "isdir": True, "max_depth": at_max_depth})
+            for entry in files:
+                tree.create_node(entry.get('name'), entry.get('path'), parent=path, data={
+                                 "isdir": False, "max_depth": False})
 
 
 # TODO SYNO.FileStation.Thumb to be done
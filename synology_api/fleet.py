@@ -0,0 +1,516 @@
+"""
+Run API calls on many NAS in parallel.
+
+A `Fleet` takes the connection settings of several NAS, logs in to them concurrently and runs a
+method of an API class, or a list of methods, on every host with a bounded number of threads.
+Results are keyed by host; a host that fails to log in or to answer is reported with its error
+and does not stop the others.
+"""
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Optional, Sequence, Union
+
+import requests
+
+from . import base_api
+from .circuit_breaker import CircuitBreaker
+from .exceptions import SynoConnectionError
+
+# A method name, or a (method name, args, kwargs) tuple
+Call = Union[str, tuple]
+
+
+class FleetResult(object):
+    """
+    Outcome of a fleet call on one host.
+
+    Parameters
+    ----------
+    host : str
+        Name of the host.
+    value : Any, optional
+        Value returned by the call. Defaults to `None`.
+    error : BaseException, optional
+        Error raised by the login or the call. Defaults to `None`.
+    elapsed : float, optional
+        Seconds spent on this host, login included. Defaults to `0`.
+    login_elapsed : float, optional
+        Seconds spent logging in, `0` when the session was already open. Defaults to `0`.
+    """
+
+    def __init__(self,
+                 host: str,
+                 value: Any = None,
+                 error: Optional[BaseException] = None,
+                 elapsed: float = 0.0,
+                 login_elapsed: float = 0.0
+                 ) -> None:
+        """
+        Initialize the FleetResult object.
+
+        Parameters
+        ----------
+        host : str
+            Name of the host.
+        value : Any, optional
+            Value returned by the call. Defaults to `None`.
+        error : BaseException, optional
+            Error raised by the login or the call. Defaults to `None`.
+        elapsed : float, optional
+            Seconds spent on this host, login included. Defaults to `0`.
+        login_elapsed : float, optional
+            Seconds spent logging in, `0` when the session was already open. Defaults to `0`.
+        """
+        self.host: str = host
+        self.value: Any = value
+        self.error: Optional[BaseException] = error
+        self.elapsed: float = elapsed
+        self.login_elapsed: float = login_elapsed
+
+    @property
+    def ok(self) -> bool:
+        """
+        Tell whether the call succeeded on this host.
+
+        Returns
+        -------
+        bool
+            True if no error was raised.
+        """
+        return self.error is None
+
+    def __repr__(self) -> str:
+        """
+        Describe the outcome for logs.
+
+        Returns
+        -------
+        str
+            Host, outcome and timing.
+        """
+        outcome = 'ok' if self.ok else 'error=%r' % self.error
+        return '<FleetResult %s %s elapsed=%.3fs>' % (self.host, outcome, self.elapsed)
+
+
+class Fleet(object):
+    """
+    Connection settings of several NAS, and the API class instances opened on them.
+
+    Parameters
+    ----------
+    specs : Iterable[dict[str, Any]]
+        One dict per NAS with the arguments of the API classes (`ip_address`, `port`, `username`,
+        `password`, `secure`, `dsm_version`, ...) and an optional `name`, which defaults to
+        `'<ip_address>:<port>'`.
+    max_workers : int, optional
+        Maximum number of hosts handled at the same time. Defaults to `16`.
+    circuit_breaker : CircuitBreaker, optional
+        Breaker given to the sessions of the fleet, hosts with an open circuit are skipped without
+        waiting for their login to time out. Defaults to `None`.
+
+    Examples
+    --------
+    ```python
+    fleet = Fleet([{'ip_address': '10.0.0.%d' % i, 'port': '5001', 'username': 'admin',
+                    'password': secret, 'secure': True} for i in range(1, 81)])
+    health = fleet.run(SysInfo, 'get_system_health')
+    for host, result in health.items():
+        print(host, result.value if result.ok else result.error)
+    ```
+    """
+
+    def __init__(self,
+                 specs: Iterable[dict[str, Any]],
+                 max_workers: int = 16,
+                 circuit_breaker: Optional[CircuitBreaker] = None
+                 ) -> None:
+        """
+        Initialize the Fleet object.
+
+        Parameters
+        ----------
+        specs : Iterable[dict[str, Any]]
+            One dict per NAS with the arguments of the API classes and an optional `name`.
+        max_workers : int, optional
+            Maximum number of hosts handled at the same time. Defaults to `16`.
+        circuit_breaker : CircuitBreaker, optional
+            Breaker given to the sessions of the fleet. Defaults to `None`.
+        """
+        self.specs: dict[str, dict[str, Any]] = {}
+        for spec in specs:
+            spec = dict(spec)
+            name = spec.pop('name', None) or '%s:%s' % (
+                spec['ip_address'], spec['port'])
+            if name in self.specs:
+                raise ValueError('Duplicated host name: %s' % name)
+            self.specs[name] = spec
+        self.max_workers: int = max_workers
+        self.circuit_breaker: Optional[CircuitBreaker] = circuit_breaker
+        self._apis: dict[tuple[str, type], base_api.BaseApi] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def hosts(self) -> list[str]:
+        """
+        List the names of the hosts.
+
+        Returns
+        -------
+        list[str]
+            Host names, in the order of the specs.
+        """
+        return list(self.specs)
+
+    def endpoint(self, host: str) -> str:
+        """
+        Get the base URL of a host, which keys its circuits in the circuit breaker.
+
+        Parameters
+        ----------
+        host : str
+            Name of the host.
+
+        Returns
+        -------
+        str
+            The base URL of the Web API of the host.
+        """
+        spec = self.specs[host]
+        return '%s://%s:%s/webapi/' % ('https' if spec.get('secure') else 'http',
+                                       spec['ip_address'], spec['port'])
+
+    def available(self, api_name: str = '') -> list[str]:
+        """
+        List the hosts whose circuit is not open, to skip the dead ones.
+
+        Parameters
+        ----------
+        api_name : str, optional
+            Name of an API or API prefix, for example `'SYNO.SurveillanceStation'`. Defaults to the hosts alone.
+
+        Returns
+        -------
+        list[str]
+            Host names, all of them without a circuit breaker.
+        """
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return self.hosts
+        return [host for host in self.specs if breaker.is_available(self.endpoint(host), api_name)]
+
+    def api(self, host: str, api_class: type) -> base_api.BaseApi:
+        """
+        Get the instance of an API class for a host, logging in on first use.
+
+        Parameters
+        ----------
+        host : str
+            Name of the host.
+        api_class : type
+            API class, for example `SysInfo`.
+
+        Returns
+        -------
+        BaseApi
+            The API class instance.
+        """
+        return self._get(host, api_class)[0]
+
+    def _get(self, host: str, api_class: type) -> tuple[base_api.BaseApi, bool]:
+        """
+        Get the instance of an API class for a host, and whether getting it logged in.
+
+        Parameters
+        ----------
+        host : str
+            Name of the host.
+        api_class : type
+            API class, for example `SysInfo`.
+
+        Returns
+        -------
+        tuple[BaseApi, bool]
+            The API class instance, and `True` if a new session was logged in.
+        """
+        key = (host, api_class)
+        api = self._apis.get(key)
+        if api is not None:
+            return api, False
+        api, logged_in = self._open(host, api_class)
+        with self._lock:
+            api = self._apis.setdefault(key, api)
+        return api, logged_in
+
+    def _open(self, host: str, api_class: type) -> tuple[base_api.BaseApi, bool]:
+        """
+        Create an API class instance for a host, through its circuit breaker if any.
+
+        Parameters
+        ----------
+        host : str
+            Name of the host.
+        api_class : type
+            API class, for example `SysInfo`.
+
+        Returns
+        -------
+        tuple[BaseApi, bool]
+            The API class instance, and `True` if it logged in a new session. Only such sessions use
+            the breaker of the fleet, the ones already open are shared with other code through
+            `BaseApi.session_registry` and keep their own.
+        """
+        # Sessions already open are reused by the API class instead of logging in
+        registry = base_api.BaseApi.session_registry
+        opened = [registry.get(key) for key in registry.keys()]
+        opened.append(base_api.BaseApi.shared_session)
+
+        breaker = self.circuit_breaker
+        if breaker is None:
+            api = api_class(**self.specs[host])
+            return api, not any(session is api.session for session in opened)
+
+        endpoint = self.endpoint(host)
+        # The login does not go through the transport, its outcome counts against the host
+        breaker.allow(endpoint, '')
+        try:
+            api = api_class(**self.specs[host])
+        except (SynoConnectionError, requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record(endpoint, '', transport_error=True)
+            raise
+        except BaseException:
+            breaker.release(endpoint, '')
+            raise
+        if any(session is api.session for session in opened):
+            breaker.release(endpoint, '')
+            return api, False
+        breaker.record(endpoint, '')
+        api.session.circuit_breaker = breaker
+        return api, True
+
+    def connect(self,
+                api_class: type,
+                hosts: Optional[Sequence[str]] = None,
+                timeout: Optional[float] = None
+                ) -> dict[str, FleetResult]:
+        """
+        Log in to the hosts concurrently and open an API class on each.
+
+        Parameters
+        ----------
+        api_class : type
+            API class, for example `SysInfo`.
+        hosts : Sequence[str], optional
+            Names of the hosts. Defaults to all the hosts.
+        timeout : float, optional
+            Seconds to wait for all the hosts, the late ones are reported with a `TimeoutError`. Defaults to no limit.
+
+        Returns
+        -------
+        dict[str, FleetResult]
+            Results keyed by host, with the API class instance as value.
+        """
+        return self._map(api_class, lambda api: api, hosts, timeout)
+
+    def run(self,
+            api_class: type,
+            method: str,
+            *args: Any,
+            hosts: Optional[Sequence[str]] = None,
+            timeout: Optional[float] = None,
+            **kwargs: Any
+            ) -> dict[str, FleetResult]:
+        """
+        Call a method of an API class on every host.
+
+        Parameters
+        ----------
+        api_class : type
+            API class, for example `SysInfo`.
+        method : str
+            Name of the method, for example `'get_system_health'`.
+        *args : Any
+            Positional arguments of the method.
+        hosts : Sequence[str], optional
+            Names of the hosts. Defaults to all the hosts.
+        timeout : float, optional
+            Seconds to wait for all the hosts, the late ones are reported with a `TimeoutError`. Defaults to no limit.
+        **kwargs : Any
+            Keyword arguments of the method.
+
+        Returns
+        -------
+        dict[str, FleetResult]
+            Results keyed by host, with the value returned by the method.
+        """
+        return self._map(api_class, lambda api: getattr(api, method)(*args, **kwargs), hosts, timeout)
+
+    def run_batch(self,
+                  api_class: type,
+                  calls: Sequence[Call],
+                  hosts: Optional[Sequence[str]] = None,
+                  timeout: Optional[float] = None
+                  ) -> dict[str, FleetResult]:
+        """
+        Call several methods of an API class on every host, one after the other on each host.
+
+        A host stops at its first failing call, which is reported as its error.
+
+        Parameters
+        ----------
+        api_class : type
+            API class, for example `CoreBackup`.
+        calls : Sequence[str or tuple]
+            Method names, or `(method, args, kwargs)` tuples where `args` and `kwargs` are optional.
+        hosts : Sequence[str], optional
+            Names of the hosts. Defaults to all the hosts.
+        timeout : float, optional
+            Seconds to wait for all the hosts, the late ones are reported with a `TimeoutError`. Defaults to no limit.
+
+        Returns
+        -------
+        dict[str, FleetResult]
+            Results keyed by host, with the list of the values returned by the calls.
+        """
+        calls = [_normalize_call(call) for call in calls]
+        return self._map(api_class,
+                         lambda api: [getattr(api, method)(*args, **kwargs)
+                                      for method, args, kwargs in calls],
+                         hosts, timeout)
+
+    def logout(self) -> None:
+        """Log out of every session opened by the fleet, errors are ignored."""
+        with self._lock:
+            apis = list(self._apis.values())
+            self._apis.clear()
+        sessions = set()
+        for api in apis:
+            if id(api.session) in sessions:
+                continue
+            sessions.add(id(api.session))
+            try:
+                api.logout()
+            except Exception:
+                pass
+
+    def __enter__(self) -> Fleet:
+        """
+        Use the fleet as a context manager, logging out at the end.
+
+        Returns
+        -------
+        Fleet
+            The fleet itself.
+        """
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """
+        Log out of every session.
+
+        Parameters
+        ----------
+        *exc_info : Any
+            Exception information, if any.
+        """
+        self.logout()
+
+    def _map(self,
+             api_class: type,
+             func: Callable[[base_api.BaseApi], Any],
+             hosts: Optional[Sequence[str]],
+             timeout: Optional[float]
+             ) -> dict[str, FleetResult]:
+        """
+        Run a function on the API class instance of every host, with bounded parallelism.
+
+        Parameters
+        ----------
+        api_class : type
+            API class to open on each host.
+        func : Callable[[BaseApi], Any]
+            Called with the API class instance of a host.
+        hosts : Sequence[str] or None
+            Names of the hosts, None for all of them.
+        timeout : float or None
+            Seconds to wait for all the hosts.
+
+        Returns
+        -------
+        dict[str, FleetResult]
+            Results keyed by host, in the order of `hosts`.
+        """
+        hosts = list(self.specs if hosts is None else hosts)
+        for host in hosts:
+            if host not in self.specs:
+                raise KeyError('Unknown host: %s' % host)
+
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(hosts))),
+                                  thread_name_prefix='fleet')
+        try:
+            futures = {host: pool.submit(self._run_host, host, api_class, func)
+                       for host in hosts}
+            wait(futures.values(), timeout)
+        finally:
+            # Hosts still running past the timeout are left behind
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        results = {}
+        for host, future in futures.items():
+            if future.done() and not future.cancelled():
+                results[host] = future.result()
+            else:
+                results[host] = FleetResult(host, error=TimeoutError(
+                    'No answer within %s seconds' % timeout), elapsed=timeout or 0.0)
+        return results
+
+    def _run_host(self, host: str, api_class: type, func: Callable[[base_api.BaseApi], Any]) -> FleetResult:
+        """
+        Open the API class on a host and run a function on it, capturing errors and timings.
+
+        Parameters
+        ----------
+        host : str
+            Name of the host.
+        api_class : type
+            API class to open.
+        func : Callable[[BaseApi], Any]
+            Called with the API class instance.
+
+        Returns
+        -------
+        FleetResult
+            The outcome on this host.
+        """
+        started = time.monotonic()
+        login_elapsed = 0.0
+        try:
+            api, logged_in = self._get(host, api_class)
+            if logged_in:
+                login_elapsed = time.monotonic() - started
+            value = func(api)
+        except Exception as e:
+            return FleetResult(host, error=e, elapsed=time.monotonic() - started,
+                               login_elapsed=login_elapsed)
+        return FleetResult(host, value, elapsed=time.monotonic() - started, login_elapsed=login_elapsed)
+
+
+def _normalize_call(call: Call) -> tuple[str, tuple, dict[str, Any]]:
+    """
+    Turn a method name or a partial call tuple into a `(method, args, kwargs)` tuple.
+
+    Parameters
+    ----------
+    call : str or tuple
+        Method name, or `(method,)`, `(method, args)` or `(method, args, kwargs)`.
+
+    Returns
+    -------
+    tuple[str, tuple, dict[str, Any]]
+        The method name, its positional and keyword arguments.
+    """
+    if isinstance(call, str):
+        return call, (), {}
+    method, args, kwargs = (tuple(call) + ((), {}))[:3]
+    return method, tuple(args), dict(kwargs)
@@ -0,0 +1,170 @@
+"""
+Hooks called around each request sent to the NAS.
+
+A `RequestHook` registered with `Authentication.add_hook` is told when a request starts, when its
+response arrives and when it fails, with a `RequestInfo` describing the call. Hooks can be written
+as subclasses or built from plain callables.
+"""
+from __future__ import annotations
+import time
+from typing import Any, Callable, Optional
+
+
+class RequestInfo(object):
+    """
+    Describe one request, from the first attempt to the final response or error.
+
+    Parameters
+    ----------
+    api_name : str
+        Name of the API called, `SYNO.Entry.Request` for compound requests.
+    method : str or None
+        DSM method called.
+    version : Any
+        Version of the API.
+    http_method : str
+        HTTP method used, `'get'` or `'post'`.
+    """
+
+    def __init__(self, api_name: str, method: Optional[str], version: Any, http_method: str) -> None:
+        """
+        Initialize the RequestInfo object.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API called, `SYNO.Entry.Request` for compound requests.
+        method : str or None
+            DSM method called.
+        version : Any
+            Version of the API.
+        http_method : str
+            HTTP method used, `'get'` or `'post'`.
+        """
+        self.api_name: str = api_name
+        self.method: str = str(method) if method is not None else ''
+        self.version: Any = version
+        self.http_method: str = http_method
+        self.started: float = time.monotonic()
+        # Filled in while the request runs
+        self.elapsed: float = 0.0
+        self.retries: int = 0
+        self.status_code: int = 0
+        self.error_code: int = 0
+        self.request_bytes: int = 0
+        self.response_bytes: int = 0
+        self.error: Optional[BaseException] = None
+
+    def finish(self, status_code: int = 0, error_code: int = 0, response_bytes: int = 0,
+               error: Optional[BaseException] = None, request_bytes: int = 0) -> None:
+        """
+        Record the outcome of the request.
+
+        Parameters
+        ----------
+        status_code : int, optional
+            HTTP status of the final response, `0` if none. Defaults to `0`.
+        error_code : int, optional
+            DSM error code of the final response. Defaults to `0`.
+        response_bytes : int, optional
+            Size of the response body. Defaults to `0`.
+        error : BaseException, optional
+            Error raised, if any. Defaults to `None`.
+        request_bytes : int, optional
+            Size of the request URL and body. Defaults to `0`.
+        """
+        self.elapsed = time.monotonic() - self.started
+        self.status_code = status_code
+        self.error_code = error_code
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.error = error
+
+    def __repr__(self) -> str:
+        """
+        Describe the request for logs.
+
+        Returns
+        -------
+        str
+            API, method, outcome and latency.
+        """
+        return '<RequestInfo %s.%s error_code=%s retries=%s elapsed=%.3fs>' % (
+            self.api_name, self.method, self.error_code, self.retries, self.elapsed)
+
+
+class RequestHook(object):
+    """
+    Receive the events of the requests sent by a session.
+
+    Subclasses override the methods they need, or callables are passed to the constructor.
+    Hooks run in the thread sending the request, errors they raise are propagated to the caller.
+
+    Parameters
+    ----------
+    before_request : Callable[[RequestInfo], Any], optional
+        Called before the request is sent.
+    after_response : Callable[[RequestInfo], Any], optional
+        Called when the final response is received, successful or carrying a DSM error code.
+    on_error : Callable[[RequestInfo, BaseException], Any], optional
+        Called when the request fails, on transport errors and DSM error codes.
+    """
+
+    def __init__(self,
+                 before_request: Optional[Callable] = None,
+                 after_response: Optional[Callable] = None,
+                 on_error: Optional[Callable] = None
+                 ) -> None:
+        """
+        Initialize the RequestHook object.
+
+        Parameters
+        ----------
+        before_request : Callable[[RequestInfo], Any], optional
+            Called before the request is sent.
+        after_response : Callable[[RequestInfo], Any], optional
+            Called when the final response is received, successful or carrying a DSM error code.
+        on_error : Callable[[RequestInfo, BaseException], Any], optional
+            Called when the request fails, on transport errors and DSM error codes.
+        """
+        self._before_request: Optional[Callable] = before_request
+        self._after_response: Optional[Callable] = after_response
+        self._on_error: Optional[Callable] = on_error
+
+    def before_request(self, info: RequestInfo) -> None:
+        """
+        Handle a request about to be sent.
+
+        Parameters
+        ----------
+        info : RequestInfo
+            The request.
+        """
+        if self._before_request is not None:
+            self._before_request(info)
+
+    def after_response(self, info: RequestInfo) -> None:
+        """
+        Handle the final response of a request, after the retries.
+
+        Parameters
+        ----------
+        info : RequestInfo
+            The request, with its outcome.
+        """
+        if self._after_response is not None:
+            self._after_response(info)
+
+    def on_error(self, info: RequestInfo, error: BaseException) -> None:
+        """
+        Handle a failed request, after `after_response` if a response was received.
+
+        Parameters
+        ----------
+        info : RequestInfo
+            The request, with its outcome.
+        error : BaseException
+            The transport error raised, or the exception matching the DSM error code.
+        """
+        if self._on_error is not None:
+            self._on_error(info, error)
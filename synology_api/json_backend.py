@@ -0,0 +1,63 @@
+"""
+JSON decoding backend used for the DSM responses.
+
+Responses are decoded with `orjson` when it is installed (`pip install orjson`), which is several
+times faster than the standard library on big list responses, and with `json` otherwise. Any
+other `loads`-like callable can be plugged with `set_json_loads`.
+"""
+from __future__ import annotations
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Both raise a ValueError subclass on invalid documents
+DEFAULT_LOADS: Callable = orjson.loads if orjson is not None else json.loads
+
+_loads: Callable = DEFAULT_LOADS
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Decode a JSON document with the configured backend.
+
+    Parameters
+    ----------
+    data : bytes or str
+        The JSON document, UTF-8 encoded if bytes.
+
+    Returns
+    -------
+    Any
+        The decoded document.
+    """
+    return _loads(data)
+
+
+def set_json_loads(func: Optional[Callable[[bytes], Any]] = None) -> None:
+    """
+    Replace the JSON decoder of every session.
+
+    Parameters
+    ----------
+    func : Callable[[bytes], Any], optional
+        Callable decoding UTF-8 bytes and raising `ValueError` on invalid documents, for example
+        `json.loads`. Defaults to `None`, which restores `orjson` if installed, else `json`.
+    """
+    global _loads
+    _loads = func if func is not None else DEFAULT_LOADS
+
+
+def get_json_loads() -> Callable[[bytes], Any]:
+    """
+    Get the JSON decoder in use.
+
+    Returns
+    -------
+    Callable[[bytes], Any]
+        The `loads`-like callable.
+    """
+    return _loads
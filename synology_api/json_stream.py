@@ -0,0 +1,147 @@
+"""
+Incremental parsing of huge DSM list responses.
+
+`iter_json_items` reads a JSON document chunk by chunk and yields the records of one of its
+arrays (for example `data.events`) as soon as each one is complete, so the whole response never
+has to be held in memory. Everything outside the array is small and decoded at the end.
+"""
+from __future__ import annotations
+import codecs
+import json
+from json.decoder import scanstring
+from typing import Any, Generator, Iterable, Sequence
+
+from . import json_backend
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# Characters allowed right after an array item
+_ITEM_END = _WHITESPACE + ',]'
+
+
+def iter_json_items(chunks: Iterable[bytes],
+                    path: Sequence[str]
+                    ) -> Generator[Any, None, dict[str, object]]:
+    """
+    Yield the items of the array found at `path` while the document is being read.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The UTF-8 encoded document, in chunks of any size.
+    path : Sequence[str]
+        Keys leading to the array, for example `('data', 'events')`.
+
+    Returns
+    -------
+    dict[str, object]
+        The rest of the document, with an empty array in place of the streamed one.
+
+    Yields
+    ------
+    Any
+        The decoded items of the array, one by one.
+    """
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    path = list(path)
+
+    buf = ''
+    pos = 0
+    eof = False
+    # Text of the document outside the streamed array
+    skeleton = []
+    seg_start = 0
+    in_array = False
+    # One frame per open container: [kind, current key, expecting a key]
+    stack = []
+
+    def refill() -> bool:
+        """
+        Drop the consumed text and read the next chunk.
+
+        Returns
+        -------
+        bool
+            False once the document is fully read.
+        """
+        nonlocal buf, pos, eof, seg_start
+        if not in_array:
+            skeleton.append(buf[seg_start:pos])
+        buf = buf[pos:]
+        pos = 0
+        seg_start = 0
+        for chunk in chunks:
+            if chunk:
+                buf += text_decoder.decode(chunk)
+                return True
+        buf += text_decoder.decode(b'', final=True)
+        eof = True
+        return False
+
+    while True:
+        if pos >= len(buf):
+            if eof:
+                break
+            refill()
+            continue
+
+        if in_array:
+            char = buf[pos]
+            if char in _WHITESPACE or char == ',':
+                pos += 1
+                continue
+            if char == ']':
+                in_array = False
+                seg_start = pos
+                pos += 1
+                continue
+            try:
+                item, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            if (end >= len(buf) or buf[end] not in _ITEM_END) and not eof:
+                # A number may continue in the next chunk ("12" of "12.5e3")
+                refill()
+                continue
+            pos = end
+            yield item
+            continue
+
+        char = buf[pos]
+        frame = stack[-1] if stack else None
+        if char == '"':
+            try:
+                value, end = scanstring(buf, pos + 1)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            if frame is not None and frame[0] == '{' and frame[2]:
+                frame[1] = value
+                frame[2] = False
+            pos = end
+            continue
+
+        if char == '{':
+            stack.append(['{', None, True])
+        elif char == '[':
+            keys = [f[1] for f in stack if f[0] == '{']
+            if len(keys) == len(stack) and keys == path:
+                in_array = True
+                skeleton.append(buf[seg_start:pos + 1])
+            else:
+                stack.append(['[', None, False])
+        elif char in '}]':
+            stack.pop()
+        elif char == ',' and frame is not None and frame[0] == '{':
+            frame[2] = True
+        pos += 1
+
+    if not in_array:
+        skeleton.append(buf[seg_start:pos])
+    return json_backend.loads(''.join(skeleton))
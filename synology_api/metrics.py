@@ -0,0 +1,241 @@
+"""
+Request metrics of a session.
+
+`MetricsCollector` is a request hook recording, per API and method, a latency histogram, the
+request and response sizes, the DSM error codes and the retries. The figures can be read as a dict or exported
+in the Prometheus text format to find which calls dominate the load of the NAS.
+"""
+from __future__ import annotations
+import bisect
+import threading
+from typing import Optional
+
+from .hooks import RequestHook, RequestInfo
+
+# Upper bounds in seconds of the latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Series(object):
+    """
+    Figures of one API method.
+
+    Parameters
+    ----------
+    buckets : int
+        Number of latency buckets, without the `+Inf` one.
+    """
+
+    def __init__(self, buckets: int) -> None:
+        """
+        Initialize the _Series object.
+
+        Parameters
+        ----------
+        buckets : int
+            Number of latency buckets, without the `+Inf` one.
+        """
+        self.count: int = 0
+        self.latency_sum: float = 0.0
+        self.latency_buckets: list[int] = [0] * (buckets + 1)
+        self.request_bytes: int = 0
+        self.response_bytes: int = 0
+        self.retries: int = 0
+        self.errors: dict[str, int] = {}
+
+
+class MetricsCollector(RequestHook):
+    """
+    Record latency, payload size, error and retry figures per API and method.
+
+    Parameters
+    ----------
+    buckets : tuple[float, ...], optional
+        Upper bounds in seconds of the latency histogram buckets. Defaults to `DEFAULT_BUCKETS`.
+
+    Examples
+    --------
+    ```python
+    metrics = MetricsCollector()
+    fs.session.add_hook(metrics)
+    fs.get_file_list('/home')
+    print(metrics.to_prometheus())
+    ```
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize the MetricsCollector object.
+
+        Parameters
+        ----------
+        buckets : tuple[float, ...], optional
+            Upper bounds in seconds of the latency histogram buckets. Defaults to `DEFAULT_BUCKETS`.
+        """
+        super().__init__()
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self._series: dict[tuple[str, str], _Series] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _record(self, info: RequestInfo, error: Optional[str] = None) -> None:
+        """
+        Add a finished request to the figures of its API method.
+
+        Parameters
+        ----------
+        info : RequestInfo
+            The finished request.
+        error : str, optional
+            Error label, for requests failing without a response.
+        """
+        key = (info.api_name, info.method)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.count += 1
+            series.latency_sum += info.elapsed
+            series.latency_buckets[bisect.bisect_left(
+                self.buckets, info.elapsed)] += 1
+            series.request_bytes += info.request_bytes
+            series.response_bytes += info.response_bytes
+            series.retries += info.retries
+            label = error or (str(info.error_code)
+                              if info.error_code else None)
+            if label is not None:
+                series.errors[label] = series.errors.get(label, 0) + 1
+
+    def after_response(self, info: RequestInfo) -> None:
+        """
+        Record a request that got a response.
+
+        Parameters
+        ----------
+        info : RequestInfo
+            The request, with its outcome.
+        """
+        self._record(info)
+
+    def on_error(self, info: RequestInfo, error: BaseException) -> None:
+        """
+        Record a request that failed without a response, the others are recorded by `after_response`.
+
+        Parameters
+        ----------
+        info : RequestInfo
+            The request, with its outcome.
+        error : BaseException
+            The error raised.
+        """
+        if info.status_code == 0:
+            self._record(info, type(error).__name__)
+
+    def reset(self) -> None:
+        """Drop all the recorded figures."""
+        with self._lock:
+            self._series.clear()
+
+    def as_dict(self) -> dict[str, dict[str, dict[str, object]]]:
+        """
+        Get the figures per API and method.
+
+        Returns
+        -------
+        dict[str, dict[str, dict[str, object]]]
+            `{api_name: {method: figures}}`, the figures holding `count`, `latency_sum`, the
+            cumulative `latency_buckets` keyed by upper bound, `request_bytes`, `response_bytes`,
+            `retries` and `errors` counted by DSM error code or exception name.
+        """
+        result: dict[str, dict[str, dict[str, object]]] = {}
+        with self._lock:
+            for (api_name, method), series in sorted(self._series.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + (float('inf'),), series.latency_buckets):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                result.setdefault(api_name, {})[method] = {
+                    'count': series.count,
+                    'latency_sum': series.latency_sum,
+                    'latency_buckets': buckets,
+                    'request_bytes': series.request_bytes,
+                    'response_bytes': series.response_bytes,
+                    'retries': series.retries,
+                    'errors': dict(series.errors),
+                }
+        return result
+
+    def to_prometheus(self, prefix: str = 'synology_api') -> str:
+        """
+        Export the figures in the Prometheus text exposition format.
+
+        Parameters
+        ----------
+        prefix : str, optional
+            Prefix of the metric names. Defaults to `'synology_api'`.
+
+        Returns
+        -------
+        str
+            The metrics, one sample per line.
+        """
+        figures = self.as_dict()
+        latency = '%s_request_duration_seconds' % prefix
+        lines = [
+            '# HELP %s Latency of the requests sent to the NAS.' % latency,
+            '# TYPE %s histogram' % latency,
+        ]
+        totals = {'request_bytes': [], 'response_bytes': [],
+                  'retries': [], 'errors': []}
+        for api_name, methods in figures.items():
+            for method, series in methods.items():
+                labels = 'api="%s",method="%s"' % (
+                    _escape(api_name), _escape(method))
+                for bound, count in series['latency_buckets'].items():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket{%s,le="%s"} %d' %
+                                 (latency, labels, le, count))
+                lines.append('%s_sum{%s} %r' %
+                             (latency, labels, series['latency_sum']))
+                lines.append('%s_count{%s} %d' %
+                             (latency, labels, series['count']))
+                totals['request_bytes'].append(
+                    '{%s} %d' % (labels, series['request_bytes']))
+                totals['response_bytes'].append(
+                    '{%s} %d' % (labels, series['response_bytes']))
+                totals['retries'].append('{%s} %d' %
+                                         (labels, series['retries']))
+                for code, count in sorted(series['errors'].items()):
+                    totals['errors'].append('{%s,code="%s"} %d' %
+                                            (labels, _escape(code), count))
+
+        helps = {
+            'request_bytes': 'Bytes sent to the NAS.',
+            'response_bytes': 'Bytes received from the NAS.',
+            'retries': 'Requests sent again after a failure.',
+            'errors': 'Failed requests, by DSM error code or exception name.',
+        }
+        for name, samples in totals.items():
+            metric = '%s_%s_total' % (prefix, name)
+            lines.append('# HELP %s %s' % (metric, helps[name]))
+            lines.append('# TYPE %s counter' % metric)
+            lines.extend(metric + sample for sample in samples)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    """
+    Escape a Prometheus label value.
+
+    Parameters
+    ----------
+    value : str
+        The raw value.
+
+    Returns
+    -------
+    str
+        The value with backslashes, quotes and newlines escaped.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,125 @@
+"""
+Auto-pagination of Synology DSM list endpoints.
+
+List methods return a single page selected with `offset` and `limit`. `iter_pages` turns such a
+method into a generator over all the items, requesting the next page in the background while the
+caller consumes the current one.
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+from .auth import Authentication
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def page_items(response: dict[str, object], api_name: str, items_key: Optional[str] = None) -> list[Any]:
+    """
+    Extract the items of a page, raising the API error if the request failed.
+
+    Parameters
+    ----------
+    response : dict[str, object]
+        Response of the list method.
+    api_name : str
+        Name of the API, used to pick the exception type.
+    items_key : str, optional
+        Key of the items in `data`. Defaults to the only list found in `data`, a `ValueError` is
+        raised when `data` holds no list or several ones.
+
+    Returns
+    -------
+    list[Any]
+        Items of the page.
+    """
+    if not isinstance(response, dict):
+        # Methods return an error message for invalid arguments
+        raise ValueError(response)
+    if not response.get('success'):
+        raise Authentication._get_error_exception(
+            response.get('error', {}).get('code', 100), api_name)
+
+    data = response.get('data') or {}
+    if items_key is None:
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) != 1:
+            raise ValueError(
+                f'{api_name} response holds {len(lists)} lists, items_key must be given')
+        return lists[0]
+    return data.get(items_key) or []
+
+
+def iter_pages(fetch: Callable[[int, int], dict[str, object]],
+               api_name: str,
+               items_key: Optional[str] = None,
+               page_size: int = DEFAULT_PAGE_SIZE,
+               offset: int = 0,
+               prefetch: bool = True,
+               session: Optional[Authentication] = None
+               ) -> Iterator[Any]:
+    """
+    Iterate over all the items of a paginated list method.
+
+    When the API reports `data.total`, stops once that many items are read, or on an empty page: some
+    APIs return fewer items than the requested limit. Otherwise stops after a page shorter than
+    `page_size`.
+
+    Parameters
+    ----------
+    fetch : Callable[[int, int], dict[str, object]]
+        Called with the offset and limit of a page, returns the response of the list method.
+    api_name : str
+        Name of the API, used to pick the exception type on errors.
+    items_key : str, optional
+        Key of the items in `data`. Defaults to the only list found in `data`.
+    page_size : int, optional
+        Number of items requested per page. Defaults to `500`.
+    offset : int, optional
+        Index of the first item. Defaults to `0`.
+    prefetch : bool, optional
+        Whether to request the next page while the current one is consumed. Defaults to `True`.
+    session : Authentication, optional
+        Session used by `fetch`. Its `request_options` and `streaming` state in the calling thread is
+        applied to the prefetched pages too. Defaults to `None`, pages are prefetched with the session
+        defaults.
+
+    Yields
+    ------
+    Any
+        The items, in the order of the pages.
+    """
+    if page_size < 1:
+        raise ValueError('page_size must be greater than 0')
+
+    pool = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix='prefetch') if prefetch else None
+    try:
+        next_page = None
+        while True:
+            if next_page is not None:
+                response = next_page.result()
+            else:
+                response = fetch(offset, page_size)
+            items = page_items(response, api_name, items_key)
+
+            offset += len(items)
+            total = (response.get('data') or {}).get('total')
+            if isinstance(total, int):
+                more = bool(items) and offset < total
+            else:
+                more = len(items) >= page_size
+
+            next_page = None
+            if more and pool:
+                # Runs in another thread, which does not see the caller's options
+                next_page = pool.submit(session._bind_thread_options(fetch) if session else fetch,
+                                        offset, page_size)
+            yield from items
+
+            if not more:
+                return
+    finally:
+        # The caller may stop early, a prefetched page is then dropped
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -5,8 +5,9 @@ This module provides a class to interact with the Synology Photos API.
 """
 
 from __future__ import annotations
-from typing import Optional, Any
+from typing import Iterator, Optional, Any
 from . import base_api
+from .pagination import iter_pages
 import json
 
 
@@ -404,6 +405,38 @@ class Photos(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_albums(self,
+                    page_size: int = 100,
+                    offset: int = 0,
+                    prefetch: bool = True,
+                    **kwargs: Any
+                    ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over all the albums.
+
+        Pages through `list_albums` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of items requested per page. Defaults to `100`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `list_albums`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.list_albums(offset=offset, limit=limit, **kwargs),
+                              'SYNO.Foto.Browse.Album', 'list', page_size, offset, prefetch, self.session)
+
     def suggest_condition(self,
                           keyword: str,
                           condition: Optional[list[str]] = None,
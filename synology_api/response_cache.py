@@ -0,0 +1,236 @@
+"""
+In-memory cache of the responses of read-only DSM methods.
+
+Dashboards poll endpoints such as `SYNO.Core.System` or `SYNO.SurveillanceStation.Camera` every
+few seconds although their answers rarely change. A `ResponseCache` set on the session serves the
+successful responses of read-only methods for a TTL chosen per API, within a bounded LRU. Any other
+method drops the cached entries of its API and of the APIs below it (for example `SYNO.Core.Share`
+`create` drops `SYNO.Core.Share` and `SYNO.Core.Share.Permission`). One cache may be shared by the
+sessions of several NAS, their responses are kept apart by the session key.
+"""
+from __future__ import annotations
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from .retry import is_read_method
+
+# Seconds the responses of the usual dashboard endpoints stay cached
+DEFAULT_TTLS = {
+    'SYNO.DSM.Info': 30,
+    'SYNO.Core.System': 10,
+    # Live metrics, not cached although below SYNO.Core.System
+    'SYNO.Core.System.Utilization': 0,
+    'SYNO.Core.Share': 30,
+    'SYNO.Core.Group': 60,
+    'SYNO.Core.Package': 60,
+    'SYNO.SurveillanceStation.Camera': 10,
+}
+
+# Parameters that do not change the answer
+_IGNORED_PARAMS = ('api', 'method', 'version', '_sid')
+
+
+class ResponseCache(object):
+    """
+    TTL and LRU bounded cache of DSM responses, keyed by API, method, version, parameters and session.
+
+    Parameters
+    ----------
+    ttls : dict[str, float], optional
+        Seconds the responses stay cached, per API name or API name prefix (`'SYNO.FileStation'`
+        matches every FileStation API). The longest matching prefix wins. Defaults to `DEFAULT_TTLS`.
+    default_ttl : float, optional
+        Seconds for the APIs not found in `ttls`, `0` does not cache them. Defaults to `0`.
+    max_entries : int, optional
+        Maximum number of responses kept, the least recently used are dropped first. Defaults to `1024`.
+    """
+
+    def __init__(self,
+                 ttls: Optional[dict[str, float]] = None,
+                 default_ttl: float = 0,
+                 max_entries: int = 1024
+                 ) -> None:
+        """
+        Initialize the ResponseCache object.
+
+        Parameters
+        ----------
+        ttls : dict[str, float], optional
+            Seconds the responses stay cached, per API name or API name prefix. Defaults to `DEFAULT_TTLS`.
+        default_ttl : float, optional
+            Seconds for the APIs not found in `ttls`, `0` does not cache them. Defaults to `0`.
+        max_entries : int, optional
+            Maximum number of responses kept. Defaults to `1024`.
+        """
+        self.ttls: dict[str, float] = dict(
+            DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl: float = default_ttl
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Count the cached responses, including expired ones not dropped yet.
+
+        Returns
+        -------
+        int
+            Number of entries.
+        """
+        return len(self._entries)
+
+    def ttl(self, api_name: str) -> float:
+        """
+        Get the time to live of the responses of an API.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API.
+
+        Returns
+        -------
+        float
+            Seconds, `0` if the API is not cached.
+        """
+        name = api_name
+        while name:
+            if name in self.ttls:
+                return self.ttls[name]
+            name = name.rpartition('.')[0]
+        return self.default_ttl
+
+    @staticmethod
+    def key(api_name: str, req_param: dict[str, object], scope: Hashable = None) -> tuple:
+        """
+        Build the cache key of a request.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API.
+        req_param : dict[str, object]
+            Parameters of the request.
+        scope : Hashable, optional
+            Session sending the request, usually its `session_key`. Defaults to `None`.
+
+        Returns
+        -------
+        tuple
+            `(api_name, method, version, params, scope)`, hashable.
+        """
+        params = tuple(sorted((k, str(v)) for k, v in req_param.items()
+                              if k not in _IGNORED_PARAMS))
+        return api_name, str(req_param.get('method')), str(req_param.get('version')), params, scope
+
+    def get(self,
+            api_name: str,
+            req_param: dict[str, object],
+            scope: Hashable = None
+            ) -> Optional[dict[str, object]]:
+        """
+        Get the cached response of a request, if still valid.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API.
+        req_param : dict[str, object]
+            Parameters of the request.
+        scope : Hashable, optional
+            Session sending the request, usually its `session_key`. Defaults to `None`.
+
+        Returns
+        -------
+        dict[str, object] or None
+            A copy of the response, None on a miss.
+        """
+        if not is_read_method(req_param.get('method')) or self.ttl(api_name) <= 0:
+            return None
+        key = self.key(api_name, req_param, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            response = entry[1]
+        # Callers may modify what they get
+        return copy.deepcopy(response)
+
+    def update(self,
+               api_name: str,
+               req_param: dict[str, object],
+               response: Any,
+               scope: Hashable = None
+               ) -> None:
+        """
+        Store the response of a read-only request, or invalidate the API of any other request.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API.
+        req_param : dict[str, object]
+            Parameters of the request.
+        response : Any
+            Decoded response, only stored when successful.
+        scope : Hashable, optional
+            Session sending the request, usually its `session_key`. Defaults to `None`.
+        """
+        if not is_read_method(req_param.get('method')):
+            # Even a failed mutation may have changed something, other users of the NAS see it too
+            self.invalidate(api_name)
+            return
+
+        ttl = self.ttl(api_name)
+        if ttl <= 0 or not isinstance(response, dict) or not response.get('success'):
+            return
+        key = self.key(api_name, req_param, scope)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl,
+                                  copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, api_name: Optional[str] = None, method: Optional[str] = None) -> int:
+        """
+        Drop cached responses.
+
+        Parameters
+        ----------
+        api_name : str, optional
+            API name or API name prefix, for example `'SYNO.Core.Share'` or `'SYNO.Core'`.
+            Defaults to `None`, every API.
+        method : str, optional
+            Only drop the responses of this method. Defaults to `None`, every method.
+
+        Returns
+        -------
+        int
+            Number of entries dropped.
+        """
+        with self._lock:
+            keys = [key for key in self._entries
+                    if (api_name is None or key[0] == api_name or key[0].startswith(api_name + '.'))
+                    and (method is None or key[1] == method)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """Drop every cached response and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
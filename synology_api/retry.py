@@ -0,0 +1,346 @@
+"""
+Timeouts and retries of the requests sent to the NAS.
+
+Every request gets a connect and a read timeout, so a hung NAS raises an error instead of blocking
+the calling thread forever. Failed requests are retried with exponential backoff and full jitter
+when it is safe: read-only methods are retried on timeouts, dropped connections and the DSM "system
+is busy" codes, other methods only when the request never reached the NAS. A retry budget per host
+caps the retries to a fraction of the requests, so retries cannot multiply the load of a NAS that
+is already struggling.
+"""
+from __future__ import annotations
+import random
+import threading
+from typing import Callable, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from .error_codes import BUSY_ERROR_CODES
+
+# Seconds to connect and seconds to wait between two bytes of the response
+DEFAULT_TIMEOUT = (10.0, 120.0)
+
+# DSM methods that only read state, whatever the API (`get`, `list`, `getinfo`, `List`, ...)
+READ_METHOD_PREFIXES = ('get', 'list', 'info', 'query', 'status',
+                        'load', 'read', 'check', 'count', 'enum')
+
+# Answers of the DSM web server while the API backend restarts or is overloaded
+RETRY_STATUS_CODES = (502, 503, 504)
+
+Timeout = Union[None, float, tuple[float, float]]
+
+
+class RetryBudget(object):
+    """
+    Limit the retries sent to a host to a fraction of its requests.
+
+    Each request adds `ratio` token, each retry takes one. The budget starts full with `reserve`
+    tokens so that occasional failures are always retried.
+
+    Parameters
+    ----------
+    ratio : float, optional
+        Retries allowed per request once the reserve is spent. Defaults to `0.1`.
+    reserve : float, optional
+        Maximum number of tokens, i.e. of consecutive retries. Defaults to `10`.
+    """
+
+    def __init__(self, ratio: float = 0.1, reserve: float = 10) -> None:
+        """
+        Initialize the RetryBudget object.
+
+        Parameters
+        ----------
+        ratio : float, optional
+            Retries allowed per request once the reserve is spent. Defaults to `0.1`.
+        reserve : float, optional
+            Maximum number of tokens, i.e. of consecutive retries. Defaults to `10`.
+        """
+        self.ratio: float = ratio
+        self.reserve: float = reserve
+        self._tokens: float = reserve
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """
+        Get the number of retries currently allowed.
+
+        Returns
+        -------
+        float
+            Tokens left in the budget.
+        """
+        return self._tokens
+
+    def deposit(self) -> None:
+        """Credit the budget for a new request."""
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Take one retry from the budget.
+
+        Returns
+        -------
+        bool
+            True if the retry is allowed.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Decide which failed requests are sent again, and after how long.
+
+    A policy can be shared by several sessions, the sessions to the same host then share its
+    retry budget.
+
+    Parameters
+    ----------
+    max_retries : int, optional
+        Maximum number of retries of a request, `0` disables retries. Defaults to `3`.
+    backoff_factor : float, optional
+        Base delay in seconds, the delay before retry `n` is drawn in `[0, backoff_factor * 2 ** n]`. Defaults to `0.5`.
+    max_backoff : float, optional
+        Maximum delay in seconds between two attempts. Defaults to `30`.
+    retry_codes : tuple[int, ...], optional
+        DSM error codes retried for read-only methods. Defaults to the "system is busy" codes.
+    retry_status : tuple[int, ...], optional
+        HTTP status codes retried for read-only methods. Defaults to `(502, 503, 504)`.
+    budget_ratio : float, optional
+        Retries allowed per request and per host once the reserve is spent. Defaults to `0.1`.
+    budget_reserve : float, optional
+        Retries always allowed per host, refilled by the requests. Defaults to `10`.
+    """
+
+    def __init__(self,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 max_backoff: float = 30.0,
+                 retry_codes: tuple[int, ...] = BUSY_ERROR_CODES,
+                 retry_status: tuple[int, ...] = RETRY_STATUS_CODES,
+                 budget_ratio: float = 0.1,
+                 budget_reserve: float = 10
+                 ) -> None:
+        """
+        Initialize the RetryPolicy object.
+
+        Parameters
+        ----------
+        max_retries : int, optional
+            Maximum number of retries of a request, `0` disables retries. Defaults to `3`.
+        backoff_factor : float, optional
+            Base delay in seconds, the delay before retry `n` is drawn in `[0, backoff_factor * 2 ** n]`. Defaults to `0.5`.
+        max_backoff : float, optional
+            Maximum delay in seconds between two attempts. Defaults to `30`.
+        retry_codes : tuple[int, ...], optional
+            DSM error codes retried for read-only methods. Defaults to the "system is busy" codes.
+        retry_status : tuple[int, ...], optional
+            HTTP status codes retried for read-only methods. Defaults to `(502, 503, 504)`.
+        budget_ratio : float, optional
+            Retries allowed per request and per host once the reserve is spent. Defaults to `0.1`.
+        budget_reserve : float, optional
+            Retries always allowed per host, refilled by the requests. Defaults to `10`.
+        """
+        self.max_retries: int = max_retries
+        self.backoff_factor: float = backoff_factor
+        self.max_backoff: float = max_backoff
+        self.retry_codes: tuple[int, ...] = tuple(retry_codes)
+        self.retry_status: tuple[int, ...] = tuple(retry_status)
+        self.budget_ratio: float = budget_ratio
+        self.budget_reserve: float = budget_reserve
+        self._budgets: dict[str, RetryBudget] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def budget(self, host: str) -> RetryBudget:
+        """
+        Get the retry budget of a host.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+
+        Returns
+        -------
+        RetryBudget
+            The budget shared by all the requests to this host.
+        """
+        with self._lock:
+            budget = self._budgets.get(host)
+            if budget is None:
+                budget = self._budgets[host] = RetryBudget(
+                    self.budget_ratio, self.budget_reserve)
+            return budget
+
+    def is_idempotent(self, api_name: str, method_name: Optional[str]) -> bool:
+        """
+        Tell whether a request can be sent twice without side effects.
+
+        Override it to declare more methods as safe to retry.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API called.
+        method_name : str or None
+            DSM method called, for example `list` or `getinfo`.
+
+        Returns
+        -------
+        bool
+            True if the method only reads state.
+        """
+        return is_read_method(method_name)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Get the delay before a retry, with full jitter so that clients do not retry in lockstep.
+
+        Parameters
+        ----------
+        attempt : int
+            Number of the retry, starting at 0.
+
+        Returns
+        -------
+        float
+            Seconds to wait.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def should_retry(self,
+                     host: str,
+                     attempt: int,
+                     idempotent: bool,
+                     error: Optional[Exception] = None,
+                     status_code: int = 200,
+                     error_code: int = 0
+                     ) -> bool:
+        """
+        Decide whether a failed attempt is sent again, taking a token from the host budget if so.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        attempt : int
+            Number of retries already made.
+        idempotent : bool
+            Whether the request only reads state.
+        error : Exception, optional
+            Transport error raised by the attempt, if any.
+        status_code : int, optional
+            HTTP status of the response. Defaults to `200`.
+        error_code : int, optional
+            DSM error code of the response. Defaults to `0`.
+
+        Returns
+        -------
+        bool
+            True if the request should be sent again.
+        """
+        if attempt >= self.max_retries:
+            return False
+
+        if error is not None:
+            retryable = idempotent or not _request_sent(error)
+        else:
+            retryable = idempotent and (
+                status_code in self.retry_status or error_code in self.retry_codes)
+
+        return retryable and self.budget(host).withdraw()
+
+
+def is_read_method(method_name: Optional[str]) -> bool:
+    """
+    Tell whether a DSM method only reads state, judging by its name.
+
+    Parameters
+    ----------
+    method_name : str or None
+        DSM method, for example `list`, `getinfo` or `List`.
+
+    Returns
+    -------
+    bool
+        True if the name starts with one of `READ_METHOD_PREFIXES`.
+    """
+    return bool(method_name) and str(method_name).lower().startswith(READ_METHOD_PREFIXES)
+
+
+def _request_sent(error: Exception) -> bool:
+    """
+    Tell whether the NAS may have received a request that failed with a transport error.
+
+    Parameters
+    ----------
+    error : Exception
+        Error raised by `requests`.
+
+    Returns
+    -------
+    bool
+        False only if the connection could not be opened.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter applying a default timeout to the requests sent without one.
+
+    Parameters
+    ----------
+    timeout : Callable[[], Timeout]
+        Called for each request, returns the timeout to apply.
+    **kwargs : Any
+        Arguments of `HTTPAdapter`.
+    """
+
+    def __init__(self, timeout: Callable, **kwargs) -> None:
+        """
+        Initialize the TimeoutHTTPAdapter object.
+
+        Parameters
+        ----------
+        timeout : Callable[[], Timeout]
+            Called for each request, returns the timeout to apply.
+        **kwargs : Any
+            Arguments of `HTTPAdapter`.
+        """
+        self._timeout: Callable = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, timeout: Timeout = None, **kwargs) -> requests.Response:
+        """
+        Send a request, with the default timeout if none is given.
+
+        Parameters
+        ----------
+        request : requests.PreparedRequest
+            The request to send.
+        timeout : Timeout, optional
+            Seconds to connect and to read, as a number or a `(connect, read)` tuple. Defaults to the session timeout.
+        **kwargs : Any
+            Arguments of `HTTPAdapter.send`.
+
+        Returns
+        -------
+        requests.Response
+            The response.
+        """
+        if timeout is None:
+            timeout = self._timeout()
+        return super().send(request, timeout=timeout, **kwargs)
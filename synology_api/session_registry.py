@@ -0,0 +1,178 @@
+"""
+Registry of the open DSM sessions of a process.
+
+Sessions are keyed by `(host, port, username, secure)`: API classes created for the same user on the
+same NAS share one session, API classes for another NAS or user get their own. Sessions to
+different NAS log in concurrently, while threads asking for the same session wait for a single
+login.
+"""
+from __future__ import annotations
+import threading
+from typing import Callable, Optional
+
+from .auth import Authentication, session_key
+
+SessionKey = tuple[str, str, str, bool]
+
+
+class SessionRegistry(object):
+    """Thread-safe map of session keys to logged in `Authentication` objects."""
+
+    def __init__(self) -> None:
+        """Initialize the SessionRegistry object."""
+        self._sessions: dict[SessionKey, Authentication] = {}
+        self._creating: dict[SessionKey, threading.Lock] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def key(ip_address: str, port: str | int, username: str, secure: bool = False) -> SessionKey:
+        """
+        Build the key of a session.
+
+        Parameters
+        ----------
+        ip_address : str
+            The IP address or host name of the NAS.
+        port : str or int
+            The port of the NAS.
+        username : str
+            The username.
+        secure : bool, optional
+            Whether HTTPS is used. Defaults to `False`.
+
+        Returns
+        -------
+        SessionKey
+            Host, port, username and whether HTTPS is used.
+        """
+        return session_key(ip_address, port, username, secure)
+
+    def __len__(self) -> int:
+        """
+        Count the registered sessions.
+
+        Returns
+        -------
+        int
+            Number of sessions.
+        """
+        return len(self._sessions)
+
+    def __contains__(self, key: SessionKey) -> bool:
+        """
+        Tell whether a session is registered for a key.
+
+        Parameters
+        ----------
+        key : SessionKey
+            The key, see `key`.
+
+        Returns
+        -------
+        bool
+            True if registered.
+        """
+        return key in self._sessions
+
+    def keys(self) -> list[SessionKey]:
+        """
+        List the keys of the registered sessions.
+
+        Returns
+        -------
+        list[SessionKey]
+            The keys.
+        """
+        with self._lock:
+            return list(self._sessions)
+
+    def get(self, key: SessionKey) -> Optional[Authentication]:
+        """
+        Get the session registered for a key.
+
+        Parameters
+        ----------
+        key : SessionKey
+            The key, see `key`.
+
+        Returns
+        -------
+        Authentication or None
+            The session, if any.
+        """
+        return self._sessions.get(key)
+
+    def get_or_create(self, key: SessionKey, factory: Callable[[], Authentication]) -> Authentication:
+        """
+        Get the session registered for a key, creating it with `factory` if missing.
+
+        Only one thread runs the factory for a given key, the others wait for its session.
+        Factories of different keys run concurrently.
+
+        Parameters
+        ----------
+        key : SessionKey
+            The key, see `key`.
+        factory : Callable[[], Authentication]
+            Creates and logs in the session.
+
+        Returns
+        -------
+        Authentication
+            The registered session.
+        """
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session
+            creating = self._creating.setdefault(key, threading.Lock())
+
+        with creating:
+            session = self._sessions.get(key)
+            if session is None:
+                # Nothing is registered if the login fails, the next caller tries again
+                session = factory()
+                with self._lock:
+                    self._sessions[key] = session
+            with self._lock:
+                if self._creating.get(key) is creating:
+                    del self._creating[key]
+            return session
+
+    def register(self, session: Authentication) -> Authentication:
+        """
+        Register a session created by the caller, for example with custom timeouts.
+
+        API classes created afterwards for the same host, port, user and scheme use it.
+
+        Parameters
+        ----------
+        session : Authentication
+            A logged in session.
+
+        Returns
+        -------
+        Authentication
+            The session.
+        """
+        with self._lock:
+            self._sessions[session.session_key] = session
+        return session
+
+    def remove(self, session: Authentication) -> None:
+        """
+        Unregister a session, without logging out.
+
+        Parameters
+        ----------
+        session : Authentication
+            The session to forget.
+        """
+        with self._lock:
+            for key in [k for k, s in self._sessions.items() if s is session]:
+                del self._sessions[key]
+
+    def clear(self) -> None:
+        """Unregister every session, without logging out."""
+        with self._lock:
+            self._sessions.clear()
@@ -0,0 +1,97 @@
+"""
+Coalescing of identical requests in flight.
+
+When several threads send the same read request at the same moment, only the first one reaches
+the NAS; the others wait for its answer and get a copy of the decoded response (or the same error).
+"""
+from __future__ import annotations
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight(object):
+    """
+    Run a function once for all the concurrent callers using the same key.
+
+    The caller running `func` gets its result, the callers that waited for it get deep copies, so
+    modifying a result does not affect the others.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the SingleFlight object."""
+        self.executed: int = 0
+        self.coalesced: int = 0
+        self._calls: dict[Hashable, Future] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Call `func`, or wait for the call already running with the same key.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies the call, for example the API, method and parameters of a request.
+        func : Callable[[], Any]
+            Function to run if no identical call is running.
+
+        Returns
+        -------
+        Any
+            The result of `func`, or a deep copy of it for the callers that waited.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            # Later calls start a new flight
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """
+        Count the calls currently running.
+
+        Returns
+        -------
+        int
+            Number of distinct keys being executed.
+        """
+        return len(self._calls)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the counters of the coalescing.
+
+        Returns
+        -------
+        dict[str, int]
+            `executed` calls that ran, `coalesced` calls that waited for another one, and `in_flight` calls running.
+        """
+        with self._lock:
+            return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+    def reset_stats(self) -> None:
+        """Reset the counters to zero."""
+        with self._lock:
+            self.executed = 0
+            self.coalesced = 0
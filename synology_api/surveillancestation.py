@@ -1,7 +1,8 @@
 """Synology Surveillance Station API Wrapper."""
 from __future__ import annotations
-from typing import Optional, Any
+from typing import Iterator, Optional, Any
 from . import base_api
+from .pagination import iter_pages
 
 
 class SurveillanceStation(base_api.BaseApi):
@@ -1589,6 +1590,38 @@ class SurveillanceStation(base_api.BaseApi):
 
         return self.request_data(api_name, api_path, req_param)
 
+    def iter_events_by_filter(self,
+                              page_size: int = 500,
+                              offset: int = 0,
+                              prefetch: bool = True,
+                              **kwargs: Any
+                              ) -> Iterator[dict[str, object]]:
+        """
+        Iterate over all the events matching the filters.
+
+        Pages through `query_event_list_by_filter` lazily, the next page is requested in the background while the
+        current one is consumed.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of items requested per page. Defaults to `500`.
+        offset : int, optional
+            Index of the first item. Defaults to `0`.
+        prefetch : bool, optional
+            Whether to request the next page while the current one is consumed. Defaults to `True`.
+        **kwargs : Any
+            Other parameters of `query_event_list_by_filter`.
+
+        Yields
+        ------
+        dict[str, object]
+            The items, one by one.
+        """
+        api_name = 'hotfix'  # fix for docs_parser.py issue
+        yield from iter_pages(lambda offset, limit: self.query_event_list_by_filter(offset=offset, limit=limit, **kwargs),
+                              'SYNO.SurveillanceStation.Recording', 'events', page_size, offset, prefetch, self.session)
+
     def delete_recordings(self,
                           idList: int = None,
                           dsld: int = None) -> dict[str, object] | str:
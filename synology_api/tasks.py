@@ -0,0 +1,453 @@
+"""
+Handles on FileStation background tasks.
+
+Copy/move, delete, extract, compress, folder size, MD5 and search run as DSM background tasks: a
+`start` call returns a task id whose `status` is polled until it is `finished`. `BackgroundTask`
+wraps one of them with `wait()` and `stop()`, and `as_completed` follows many tasks at once,
+checking the status of all the pending ones with a single compound request per round.
+Polling adapts to each task: the interval grows while a task runs, and for tasks reporting their
+progress it follows the estimated time left. `wait_async` and `async_as_completed` are the asyncio
+counterparts.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional, TYPE_CHECKING
+
+from .exceptions import FileStationError
+
+if TYPE_CHECKING:
+    from .filestation import FileStation
+
+# Kind of task -> DSM API
+TASK_APIS = {
+    'copy_move': 'SYNO.FileStation.CopyMove',
+    'delete': 'SYNO.FileStation.Delete',
+    'extract': 'SYNO.FileStation.Extract',
+    'compress': 'SYNO.FileStation.Compress',
+    'dir_size': 'SYNO.FileStation.DirSize',
+    'md5': 'SYNO.FileStation.MD5',
+    'search': 'SYNO.FileStation.Search',
+}
+
+# Kind of task -> FileStation method starting it
+START_METHODS = {
+    'copy_move': 'start_copy_move',
+    'delete': 'start_delete_task',
+    'extract': 'start_extract_task',
+    'compress': 'start_file_compression',
+    'dir_size': 'start_dir_size_calc',
+    'md5': 'start_md5_calc',
+    'search': 'search_start',
+}
+
+# Kind of task -> FileStation attribute holding the id of the last task started
+LAST_TASKID = {
+    'copy_move': '_copy_move_taskid',
+    'delete': '_delete_taskid',
+    'extract': '_extract_taskid',
+    'compress': '_compress_taskid',
+    'dir_size': '_dir_taskid',
+    'md5': '_md5_calc_taskid',
+    'search': '_search_taskid',
+}
+
+MIN_INTERVAL = 0.2
+MAX_INTERVAL = 5.0
+# Growth of the polling interval of a task that does not report its progress
+BACKOFF = 1.5
+
+
+class BackgroundTask(object):
+    """
+    Handle on a FileStation background task.
+
+    Parameters
+    ----------
+    fs : FileStation
+        The FileStation instance the task was started with.
+    kind : str
+        Kind of task, one of `TASK_APIS`: `'copy_move'`, `'delete'`, `'extract'`, `'compress'`,
+        `'dir_size'`, `'md5'` or `'search'`.
+    taskid : str
+        The id returned by DSM when the task was started.
+    min_interval : float, optional
+        Minimum seconds between two status checks. Defaults to `0.2`.
+    max_interval : float, optional
+        Maximum seconds between two status checks. Defaults to `5`.
+
+    Examples
+    --------
+    ```python
+    task = fs.start_task('copy_move', ['/share/a', '/share/b'], '/backup')
+    data = task.wait(timeout=600, progress_callback=lambda task: print(task.progress))
+
+    tasks = [fs.start_task('md5', path) for path in paths]
+    for task in as_completed(tasks):
+        print(task.taskid, task.data['md5'])
+    ```
+    """
+
+    def __init__(self,
+                 fs: FileStation,
+                 kind: str,
+                 taskid: str,
+                 min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL
+                 ) -> None:
+        """
+        Initialize the BackgroundTask object.
+
+        Parameters
+        ----------
+        fs : FileStation
+            The FileStation instance the task was started with.
+        kind : str
+            Kind of task, one of `TASK_APIS`.
+        taskid : str
+            The id returned by DSM when the task was started.
+        min_interval : float, optional
+            Minimum seconds between two status checks. Defaults to `0.2`.
+        max_interval : float, optional
+            Maximum seconds between two status checks. Defaults to `5`.
+        """
+        if kind not in TASK_APIS:
+            raise ValueError('kind must be one of ' + ', '.join(TASK_APIS))
+
+        self.fs: FileStation = fs
+        self.kind: str = kind
+        self.api_name: str = TASK_APIS[kind]
+        self.taskid: str = taskid.strip('"')
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        # `data` of the last status response, and the error the task failed with
+        self.data: Optional[dict[str, object]] = None
+        self.error: Optional[FileStationError] = None
+        self.interval: float = min_interval
+        self.started: float = time.monotonic()
+
+    @property
+    def done(self) -> bool:
+        """
+        Tell whether the task is finished or failed, as of the last status check.
+
+        Returns
+        -------
+        bool
+            True if no more status checks are needed.
+        """
+        return self.error is not None or bool(self.data and self.data.get('finished'))
+
+    @property
+    def progress(self) -> Optional[float]:
+        """
+        Get the progress of the task, as of the last status check.
+
+        Returns
+        -------
+        float or None
+            Progress between `0` and `1`, None if the task does not report it.
+        """
+        if self.data is not None and 'progress' in self.data:
+            return float(self.data['progress'])
+        return None
+
+    def _request(self, method: str) -> dict[str, object]:
+        """
+        Send a request about the task to its API.
+
+        Parameters
+        ----------
+        method : str
+            The API method, `'status'` or `'stop'`.
+
+        Returns
+        -------
+        dict[str, object]
+            The response, or a `BatchFuture` inside a batch.
+        """
+        info = self.fs.file_station_list[self.api_name]
+        req_param = {'version': info['maxVersion'], 'method': method,
+                     'taskid': json.dumps(self.taskid)}
+        if self.kind == 'search' and method == 'status':
+            # Search tasks have no status method, any page of results holds it, a limit of 0 means all
+            req_param.update(method='list', offset=0, limit=1)
+        return self.fs.request_data(self.api_name, info['path'], req_param)
+
+    def _update(self, response: Optional[dict[str, object]] = None, error: Optional[Exception] = None) -> None:
+        """
+        Record the result of a status check and schedule the next one.
+
+        Parameters
+        ----------
+        response : dict[str, object], optional
+            The status response.
+        error : Exception, optional
+            The error the status check failed with.
+        """
+        if error is None and not response.get('success', True):
+            error = FileStationError(
+                response.get('error', {}).get('code', 100))
+        if error is not None:
+            self.error = error
+            return
+
+        self.data = response.get('data', {})
+        progress = self.progress
+        if progress is not None and 0 < progress < 1:
+            # Check again halfway to the estimated end
+            elapsed = time.monotonic() - self.started
+            interval = elapsed * (1 - progress) / progress / 2
+        else:
+            interval = self.interval * BACKOFF
+        self.interval = min(self.max_interval, max(
+            self.min_interval, interval))
+
+    def poll(self) -> Optional[dict[str, object]]:
+        """
+        Check the status of the task.
+
+        Returns
+        -------
+        dict[str, object] or None
+            The `data` of the status response.
+        """
+        poll([self])
+        return self.result()
+
+    def result(self) -> Optional[dict[str, object]]:
+        """
+        Get the status of the task as of the last status check.
+
+        Returns
+        -------
+        dict[str, object] or None
+            The `data` of the last status response, None before the first check.
+
+        Raises
+        ------
+        FileStationError
+            If the task failed.
+        """
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+    def wait(self,
+             timeout: Optional[float] = None,
+             progress_callback: Optional[Callable[[
+                 BackgroundTask], None]] = None
+             ) -> dict[str, object]:
+        """
+        Wait for the task to finish.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait. Defaults to `None` (wait forever).
+        progress_callback : Callable[[BackgroundTask], None], optional
+            Called with the task after each status check.
+
+        Returns
+        -------
+        dict[str, object]
+            The `data` of the last status response.
+
+        Raises
+        ------
+        TimeoutError
+            If the task is still running after `timeout` seconds, it is not stopped.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.poll()
+            if progress_callback is not None:
+                progress_callback(self)
+            if self.done:
+                return self.result()
+            time.sleep(_delay(self.interval, deadline, self))
+
+    async def wait_async(self,
+                         timeout: Optional[float] = None,
+                         progress_callback: Optional[Callable[[
+                             BackgroundTask], None]] = None
+                         ) -> dict[str, object]:
+        """
+        Wait for the task to finish without blocking the event loop, see `wait`.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait. Defaults to `None` (wait forever).
+        progress_callback : Callable[[BackgroundTask], None], optional
+            Called with the task after each status check.
+
+        Returns
+        -------
+        dict[str, object]
+            The `data` of the last status response.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, poll, [self])
+            if progress_callback is not None:
+                progress_callback(self)
+            if self.done:
+                return self.result()
+            await asyncio.sleep(_delay(self.interval, deadline, self))
+
+    def stop(self) -> dict[str, object]:
+        """
+        Stop the task.
+
+        Returns
+        -------
+        dict[str, object]
+            Response from the API.
+        """
+        return self._request('stop')
+
+    def __repr__(self) -> str:
+        """
+        Describe the task.
+
+        Returns
+        -------
+        str
+            The kind, id and state of the task.
+        """
+        state = 'failed' if self.error is not None else 'finished' if self.done else 'running'
+        return '<BackgroundTask {} {} {}>'.format(self.kind, self.taskid, state)
+
+
+def poll(tasks: Iterable[BackgroundTask]) -> None:
+    """
+    Check the status of many tasks, with one compound request per session.
+
+    The failure of a task is recorded in its `error`, errors of the transport are raised.
+
+    Parameters
+    ----------
+    tasks : Iterable[BackgroundTask]
+        The tasks to check, finished ones are skipped.
+    """
+    by_session: dict[int, list[BackgroundTask]] = {}
+    for task in tasks:
+        if not task.done:
+            by_session.setdefault(id(task.fs.session), []).append(task)
+
+    for group in by_session.values():
+        if len(group) == 1:
+            try:
+                group[0]._update(group[0]._request('status'))
+            except FileStationError as e:
+                group[0]._update(error=e)
+            continue
+
+        with group[0].fs.session.batch() as batch:
+            futures = [task._request('status') for task in group]
+        for task, future in zip(group, futures):
+            try:
+                task._update(future.result())
+            except FileStationError as e:
+                task._update(error=e)
+
+
+def as_completed(tasks: Iterable[BackgroundTask], timeout: Optional[float] = None) -> Iterator[BackgroundTask]:
+    """
+    Iterate over tasks as they finish.
+
+    Each round checks the status of all the pending tasks with a single compound request, then
+    sleeps until the soonest next check one of them asks for.
+
+    Parameters
+    ----------
+    tasks : Iterable[BackgroundTask]
+        The tasks to follow.
+    timeout : float, optional
+        Maximum seconds to wait for all of them. Defaults to `None` (wait forever).
+
+    Yields
+    ------
+    BackgroundTask
+        The tasks, finished or failed, in the order they complete. `result()` raises the error of
+        failed ones.
+
+    Raises
+    ------
+    TimeoutError
+        If some tasks are still running after `timeout` seconds, they are not stopped.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = list(tasks)
+    while pending:
+        poll(pending)
+        yield from [task for task in pending if task.done]
+        pending = [task for task in pending if not task.done]
+        if pending:
+            time.sleep(
+                _delay(min(task.interval for task in pending), deadline, pending))
+
+
+async def async_as_completed(tasks: Iterable[BackgroundTask],
+                             timeout: Optional[float] = None
+                             ) -> AsyncIterator[BackgroundTask]:
+    """
+    Iterate over tasks as they finish without blocking the event loop, see `as_completed`.
+
+    Parameters
+    ----------
+    tasks : Iterable[BackgroundTask]
+        The tasks to follow.
+    timeout : float, optional
+        Maximum seconds to wait for all of them. Defaults to `None` (wait forever).
+
+    Yields
+    ------
+    BackgroundTask
+        The tasks, finished or failed, in the order they complete.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    loop = asyncio.get_running_loop()
+    pending = list(tasks)
+    while pending:
+        await loop.run_in_executor(None, poll, pending)
+        for task in [task for task in pending if task.done]:
+            yield task
+        pending = [task for task in pending if not task.done]
+        if pending:
+            await asyncio.sleep(_delay(min(task.interval for task in pending), deadline, pending))
+
+
+def _delay(interval: float, deadline: Optional[float], pending: object) -> float:
+    """
+    Clip the delay before the next status check to the deadline.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds the tasks asked to wait.
+    deadline : float, optional
+        `time.monotonic()` value after which waiting stops.
+    pending : object
+        The tasks still running, for the error message.
+
+    Returns
+    -------
+    float
+        Seconds to sleep.
+
+    Raises
+    ------
+    TimeoutError
+        If the deadline has passed.
+    """
+    if deadline is None:
+        return interval
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(
+            'Background tasks still running: {!r}'.format(pending))
+    return min(interval, remaining)
@@ -0,0 +1,329 @@
+"""
+Client-side rate limiting of the requests sent to a NAS.
+
+The DSM web server is shared with the users of the web interface; bulk loops can saturate it.
+A `Throttle` limits, per host and optionally per API family, the request rate with a token bucket
+and the number of requests in flight with a semaphore. When the NAS starts answering with the
+"system is busy" codes, the requests of the host and family are spaced further apart, and the
+spacing shrinks again as requests succeed.
+"""
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from .error_codes import BUSY_ERROR_CODES
+
+
+class Limit(object):
+    """
+    Limits applied to a host or to an API family.
+
+    Parameters
+    ----------
+    rate : float, optional
+        Requests per second, `None` for no rate limit. Defaults to `None`.
+    burst : int, optional
+        Requests allowed at once before the rate applies. Defaults to `max(1, rate)`.
+    max_in_flight : int, optional
+        Requests running at the same time, `None` for no limit. Defaults to `None`.
+    """
+
+    def __init__(self,
+                 rate: Optional[float] = None,
+                 burst: Optional[int] = None,
+                 max_in_flight: Optional[int] = None
+                 ) -> None:
+        """
+        Initialize the Limit object.
+
+        Parameters
+        ----------
+        rate : float, optional
+            Requests per second, `None` for no rate limit. Defaults to `None`.
+        burst : int, optional
+            Requests allowed at once before the rate applies. Defaults to `max(1, rate)`.
+        max_in_flight : int, optional
+            Requests running at the same time, `None` for no limit. Defaults to `None`.
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be greater than 0')
+        self.rate: Optional[float] = rate
+        self.burst: int = burst if burst is not None else max(
+            1, int(rate or 1))
+        self.max_in_flight: Optional[int] = max_in_flight
+
+
+class _Limiter(object):
+    """
+    Token bucket, semaphore and adaptive spacing of one host or API family of a host.
+
+    Parameters
+    ----------
+    limit : Limit
+        The limits to apply.
+    """
+
+    def __init__(self, limit: Limit) -> None:
+        """
+        Initialize the _Limiter object.
+
+        Parameters
+        ----------
+        limit : Limit
+            The limits to apply.
+        """
+        self.limit: Limit = limit
+        self.semaphore: Optional[threading.BoundedSemaphore] = threading.BoundedSemaphore(
+            limit.max_in_flight) if limit.max_in_flight else None
+        self.tokens: float = float(limit.burst)
+        self.updated: float = time.monotonic()
+        # Seconds imposed between two requests while the NAS reports it is busy
+        self.spacing: float = 0.0
+        self.next_start: float = 0.0
+        self.lock: threading.Lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserve the next request slot.
+
+        Returns
+        -------
+        float
+            Seconds to wait before sending the request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = 0.0
+            rate = self.limit.rate
+            if rate is not None:
+                self.tokens = min(float(self.limit.burst),
+                                  self.tokens + (now - self.updated) * rate)
+                self.updated = now
+                # A negative balance is a reservation on future tokens
+                self.tokens -= 1
+                if self.tokens < 0:
+                    delay = -self.tokens / rate
+            if self.spacing:
+                start = max(now + delay, self.next_start)
+                delay = start - now
+                self.next_start = start + self.spacing
+            return delay
+
+
+class Throttle(object):
+    """
+    Rate and concurrency limits per host and per API family, with adaptive slowdown.
+
+    A throttle can be shared by several sessions, the sessions to the same host then share its
+    limits.
+
+    Parameters
+    ----------
+    rate : float, optional
+        Requests per second per host, `None` for no rate limit. Defaults to `None`.
+    burst : int, optional
+        Requests allowed at once per host before the rate applies. Defaults to `max(1, rate)`.
+    max_in_flight : int, optional
+        Requests running at the same time per host, `None` for no limit. Defaults to `None`.
+    families : dict[str, Limit], optional
+        Additional limits per API name prefix, for example `{'SYNO.FileStation': Limit(max_in_flight=2)}`.
+        The longest matching prefix applies. Defaults to `None`.
+    min_spacing : float, optional
+        Seconds between two requests imposed on the first busy answer. Defaults to `0.1`.
+    max_spacing : float, optional
+        Maximum seconds between two requests while the NAS stays busy. Defaults to `5`.
+    busy_codes : tuple[int, ...], optional
+        DSM error codes triggering the slowdown. Defaults to the "system is busy" codes.
+
+    Examples
+    --------
+    ```python
+    throttle = Throttle(rate=20, max_in_flight=8,
+                        families={'SYNO.SurveillanceStation': Limit(rate=5, max_in_flight=2)})
+    session = Authentication(ip, port, user, password, throttle=throttle)
+    ```
+    """
+
+    def __init__(self,
+                 rate: Optional[float] = None,
+                 burst: Optional[int] = None,
+                 max_in_flight: Optional[int] = None,
+                 families: Optional[dict[str, Limit]] = None,
+                 min_spacing: float = 0.1,
+                 max_spacing: float = 5.0,
+                 busy_codes: tuple[int, ...] = BUSY_ERROR_CODES
+                 ) -> None:
+        """
+        Initialize the Throttle object.
+
+        Parameters
+        ----------
+        rate : float, optional
+            Requests per second per host, `None` for no rate limit. Defaults to `None`.
+        burst : int, optional
+            Requests allowed at once per host before the rate applies. Defaults to `max(1, rate)`.
+        max_in_flight : int, optional
+            Requests running at the same time per host, `None` for no limit. Defaults to `None`.
+        families : dict[str, Limit], optional
+            Additional limits per API name prefix. Defaults to `None`.
+        min_spacing : float, optional
+            Seconds between two requests imposed on the first busy answer. Defaults to `0.1`.
+        max_spacing : float, optional
+            Maximum seconds between two requests while the NAS stays busy. Defaults to `5`.
+        busy_codes : tuple[int, ...], optional
+            DSM error codes triggering the slowdown. Defaults to the "system is busy" codes.
+        """
+        self.host_limit: Limit = Limit(rate, burst, max_in_flight)
+        self.families: dict[str, Limit] = dict(families or {})
+        self.min_spacing: float = min_spacing
+        self.max_spacing: float = max_spacing
+        self.busy_codes: tuple[int, ...] = tuple(busy_codes)
+        self._limiters: dict[tuple[str, str], _Limiter] = {}
+        # (thread id, limiter id) of the semaphores each thread holds
+        self._holders: set[tuple[int, int]] = set()
+        self._lock: threading.Lock = threading.Lock()
+
+    def family(self, api_name: str) -> Optional[str]:
+        """
+        Get the configured family of an API.
+
+        Parameters
+        ----------
+        api_name : str
+            Name of the API.
+
+        Returns
+        -------
+        str or None
+            The longest prefix of `families` matching the API, None if none does.
+        """
+        name = api_name
+        while name:
+            if name in self.families:
+                return name
+            name = name.rpartition('.')[0]
+        return None
+
+    def _scopes(self, host: str, api_name: str) -> list[_Limiter]:
+        """
+        Get the limiters applying to a request, host first.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str
+            Name of the API.
+
+        Returns
+        -------
+        list[_Limiter]
+            The limiter of the host, then the one of the API family if configured.
+        """
+        family = self.family(api_name)
+        scopes = [('', self.host_limit)]
+        if family is not None:
+            scopes.append((family, self.families[family]))
+
+        limiters = []
+        with self._lock:
+            for name, limit in scopes:
+                limiter = self._limiters.get((host, name))
+                if limiter is None:
+                    limiter = self._limiters[(host, name)] = _Limiter(limit)
+                limiters.append(limiter)
+        return limiters
+
+    @contextmanager
+    def slot(self, host: str, api_name: str) -> Iterator[None]:
+        """
+        Wait for the right to send a request, and hold it while the `with` block runs.
+
+        A thread already holding the slot of the host or family, for example while it reads a
+        streamed response, reuses it for the requests it sends meanwhile instead of waiting for
+        itself.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str
+            Name of the API.
+
+        Yields
+        ------
+        None
+            Nothing, the request is sent inside the block.
+        """
+        limiters = self._scopes(host, api_name)
+        thread_id = threading.get_ident()
+        acquired = []
+        try:
+            # Always host then family, so two requests never wait for each other's semaphore
+            for limiter in limiters:
+                if limiter.semaphore is None:
+                    continue
+                holder = (thread_id, id(limiter))
+                with self._lock:
+                    if holder in self._holders:
+                        continue
+                limiter.semaphore.acquire()
+                with self._lock:
+                    self._holders.add(holder)
+                acquired.append((holder, limiter.semaphore))
+            delay = max(limiter.reserve() for limiter in limiters)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            for holder, semaphore in reversed(acquired):
+                with self._lock:
+                    self._holders.discard(holder)
+                semaphore.release()
+
+    def report(self, host: str, api_name: str, error_code: int) -> None:
+        """
+        Adapt the spacing of the requests to the answer of the NAS.
+
+        A busy code doubles the spacing of the host and family (starting at `min_spacing`), any
+        other answer shrinks it by 10% until it drops below half of `min_spacing` and is removed.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str
+            Name of the API.
+        error_code : int
+            DSM error code of the answer, `0` on success.
+        """
+        busy = error_code in self.busy_codes
+        for limiter in self._scopes(host, api_name):
+            with limiter.lock:
+                if busy:
+                    limiter.spacing = min(self.max_spacing, max(
+                        self.min_spacing, limiter.spacing * 2))
+                elif limiter.spacing:
+                    limiter.spacing *= 0.9
+                    if limiter.spacing < self.min_spacing / 2:
+                        limiter.spacing = 0.0
+
+    def spacing(self, host: str, api_name: str = '') -> float:
+        """
+        Get the spacing currently imposed by the slowdown.
+
+        Parameters
+        ----------
+        host : str
+            Base URL of the NAS.
+        api_name : str, optional
+            Name of the API, to include its family. Defaults to the host alone.
+
+        Returns
+        -------
+        float
+            Seconds between two requests, `0` when the NAS is not busy.
+        """
+        return max(limiter.spacing for limiter in self._scopes(host, api_name))
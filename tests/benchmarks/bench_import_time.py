@@ -0,0 +1,70 @@
+"""
+Measure the import cost of synology_api with ``python -X importtime``.
+
+Each statement runs in a fresh interpreter, the cumulative time of the top level package is
+reported as the median of several runs. Run from the repository root::
+
+    python tests/benchmarks/bench_import_time.py [runs]
+"""
+import pathlib
+import statistics
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+
+STATEMENTS = [
+    'import synology_api',
+    'from synology_api import core_sys_info',
+    'from synology_api import filestation',
+    'from synology_api import surveillancestation',
+    'from synology_api import *',
+]
+
+
+def import_time(statement: str) -> float:
+    """
+    Measure the import time of the `synology_api` package and its submodules, in milliseconds.
+
+    Parameters
+    ----------
+    statement : str
+        Python statement run in a fresh interpreter.
+
+    Returns
+    -------
+    float
+        Cumulative time of the modules imported from the first `synology_api` import on.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total = 0
+    started = False
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting is shown by indentation
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Interpreter startup modules come first, submodules loaded lazily are not nested
+        started = started or name.strip() == 'synology_api'
+        if started and not name[1:].startswith(' '):
+            total += int(cumulative)
+    return total / 1000
+
+
+def main(runs: int) -> None:
+    """
+    Print the median import time of each statement.
+
+    Parameters
+    ----------
+    runs : int
+        Number of fresh interpreters per statement.
+    """
+    for statement in STATEMENTS:
+        times = [import_time(statement) for _ in range(runs)]
+        print('%8.1f ms  %s' % (statistics.median(times), statement))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
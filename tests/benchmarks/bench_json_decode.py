@@ -0,0 +1,113 @@
+"""
+Compare the CPU time per call of decoding a multi-MB response twice, as request_data used to, with
+the single decode of the current pipeline, for the standard library and orjson backends.
+
+The response mimics a SurveillanceStation event list. Run from the repository root::
+
+    python tests/benchmarks/bench_json_decode.py [calls] [events]
+"""
+import json
+import pathlib
+import sys
+import time
+
+sys.path[:0] = [str(pathlib.Path(__file__).resolve().parents[2]),
+                str(pathlib.Path(__file__).resolve().parents[1])]
+
+from synology_api import auth as syn  # noqa: E402
+from synology_api import json_backend  # noqa: E402
+from dsm_stub import DsmStub  # noqa: E402
+
+
+def event_list(events: int) -> bytes:
+    """
+    Build a SYNO.SurveillanceStation.Recording list response.
+
+    Parameters
+    ----------
+    events : int
+        Number of events in the response.
+
+    Returns
+    -------
+    bytes
+        The encoded response.
+    """
+    return json.dumps({'success': True, 'data': {'total': events, 'offset': 0, 'events': [
+        {'id': i, 'cameraId': i % 16, 'camera_name': 'Camera %d' % (i % 16), 'eventSize': 1.5 + i % 7,
+         'startTime': 1700000000 + i * 60, 'stopTime': 1700000030 + i * 60, 'reason': 2,
+         'path': '/volume1/surveillance/Camera %d/%d.mp4' % (i % 16, i), 'recording': False,
+         'markAsDel': False, 'archived': False, 'snapshot_medium': 'data:image/jpeg;base64,' + 'A' * 200}
+        for i in range(events)]}}).encode('utf-8')
+
+
+def cpu_per_call(func, calls: int) -> float:
+    """
+    Measure the CPU time of the calling process per call, in milliseconds.
+
+    Parameters
+    ----------
+    func : Callable[[], Any]
+        The call to measure.
+    calls : int
+        Number of calls.
+
+    Returns
+    -------
+    float
+        CPU milliseconds per call.
+    """
+    start = time.process_time()
+    for _ in range(calls):
+        func()
+    return (time.process_time() - start) * 1000 / calls
+
+
+def run(calls: int, events: int) -> None:
+    """
+    Print the CPU time per call of each decoding strategy.
+
+    Parameters
+    ----------
+    calls : int
+        Number of calls per strategy.
+    events : int
+        Number of events in the response.
+    """
+    body = event_list(events)
+    with DsmStub() as stub:
+        stub.route('SYNO.SurveillanceStation.Recording', 'List',
+                   lambda params: (200, {'Content-Type': 'application/json'}, body))
+        session = syn.Authentication('127.0.0.1', str(stub.port), 'admin', 'secret',
+                                     dsm_version=6, debug=False, api_cache_ttl=0)
+        session.login()
+        params = {'version': 6, 'method': 'List'}
+
+        def twice():
+            # Previous request_data: once for the error code, once for the result
+            response = session.http_session.get(session.base_url + 'entry.cgi?api=SYNO.SurveillanceStation.Recording',
+                                                dict(params, _sid=session.sid))
+            response.json().get('success')
+            return response.json()
+
+        def once():
+            return session.request_data('SYNO.SurveillanceStation.Recording', 'entry.cgi', dict(params))
+
+        print('response size: %.1f MB, %d events' % (len(body) / 1e6, events))
+        print('%8.1f ms  decode twice (json, previous request_data)' %
+              cpu_per_call(twice, calls))
+        json_backend.set_json_loads(json.loads)
+        print('%8.1f ms  decode once (json)' % cpu_per_call(once, calls))
+        if json_backend.orjson is not None:
+            json_backend.set_json_loads(json_backend.orjson.loads)
+            print('%8.1f ms  decode once (orjson)' %
+                  cpu_per_call(once, calls))
+        else:
+            print('     n/a   decode once (orjson), not installed')
+        json_backend.set_json_loads()
+        session.close()
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
@@ -0,0 +1,48 @@
+"""
+Compare requests/sec of one-shot ``requests.get`` calls with the pooled Authentication transport.
+
+Run from the repository root::
+
+    python tests/benchmarks/bench_pooled_transport.py [calls] [--tls]
+"""
+import pathlib
+import sys
+import time
+
+sys.path[:0] = [str(pathlib.Path(__file__).resolve().parents[2]),
+                str(pathlib.Path(__file__).resolve().parents[1])]
+
+import requests  # noqa: E402
+from synology_api import auth as syn  # noqa: E402
+from dsm_stub import DsmStub  # noqa: E402
+
+
+def run(calls: int, tls: bool) -> None:
+    with DsmStub(tls=tls) as stub:
+        session = syn.Authentication('127.0.0.1', str(stub.port), 'admin', 'secret',
+                                     secure=tls, dsm_version=6, debug=False)
+        session.login()
+        url = session.base_url + 'entry.cgi?api=SYNO.Core.System'
+        params = {'version': 1, 'method': 'info', '_sid': session.sid}
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            requests.get(url, params, verify=False,
+                         headers={'X-SYNO-TOKEN': session.syno_token}).json()
+        one_shot = calls / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            session.request_data('SYNO.Core.System', 'entry.cgi', {
+                                 'version': 1, 'method': 'info'})
+        pooled = calls / (time.perf_counter() - start)
+        session.close()
+
+    print('one-shot requests.get : %8.1f req/s' % one_shot)
+    print('pooled transport      : %8.1f req/s (x%.2f)' %
+          (pooled, pooled / one_shot))
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--tls']
+    run(int(args[0]) if args else 2000, '--tls' in sys.argv)
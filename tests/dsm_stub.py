@@ -0,0 +1,182 @@
+import datetime
+import json
+import ssl
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.x509.oid import NameOID
+
+__ALL__ = ['DsmStub']
+
+API_LIST = {
+    'SYNO.API.Info': {'path': 'query.cgi', 'minVersion': 1, 'maxVersion': 1},
+    'SYNO.API.Auth': {'path': 'auth.cgi', 'minVersion': 1, 'maxVersion': 7},
+    'SYNO.API.Encryption': {'path': 'encryption.cgi', 'minVersion': 1, 'maxVersion': 1},
+    'SYNO.Entry.Request': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.Core.System': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 3},
+    'SYNO.Core.System.Utilization': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 1},
+    'SYNO.FileStation.Info': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.List': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.Search': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.CreateFolder': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.Upload': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 3},
+    'SYNO.FileStation.Download': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.MD5': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.Delete': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+    'SYNO.FileStation.CopyMove': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 3},
+    'SYNO.FileStation.DirSize': {'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2},
+}
+
+_RSA_KEY = []
+
+
+def _public_modulus():
+    # DSM encrypts a 501 bytes passphrase with PKCS1v15, which needs a 4096 bits key
+    if not _RSA_KEY:
+        _RSA_KEY.append(rsa.generate_private_key(
+            public_exponent=65537, key_size=4096))
+    return _RSA_KEY[0].public_key().public_numbers().n
+
+
+def _tls_context():
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(key.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    with tempfile.NamedTemporaryFile(suffix='.pem', delete=False) as pem:
+        pem.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()))
+        pem.write(cert.public_bytes(serialization.Encoding.PEM))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(pem.name)
+    return context
+
+
+class DsmStub:
+    """Minimal in-process DSM web API used to exercise the transport offline."""
+
+    def __init__(self, tls=False):
+        self.routes = {}
+        self.calls = []
+        self.connections = set()
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), _make_handler(self))
+        self._server.daemon_threads = True
+        if tls:
+            self._server.socket = _tls_context().wrap_socket(
+                self._server.socket, server_side=True)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, api, method, handler):
+        """Register ``handler(params) -> dict`` (or ``(status, headers, bytes)``) for ``api``/``method``.
+
+        A ``Content-Length`` header bigger than the body closes the connection mid-response.
+        """
+        self.routes[(api, method)] = handler
+
+    def count(self, api, method=None):
+        with self._lock:
+            return len([c for c in self.calls if c[0] == api and (method is None or c[1] == method)])
+
+    def dispatch(self, params):
+        api = params.get('api')
+        method = params.get('method')
+        with self._lock:
+            self.calls.append((api, method))
+        handler = self.routes.get((api, method))
+        if handler is not None:
+            return handler(params)
+        if api == 'SYNO.Entry.Request':
+            result = []
+            for request in json.loads(params['compound']):
+                response = self.dispatch({k: str(v)
+                                         for k, v in request.items()})
+                response.update(
+                    {'api': request['api'], 'method': request['method']})
+                result.append(response)
+            return {'success': True, 'data': {'has_fail': not all(r['success'] for r in result),
+                                              'result': result}}
+        if api == 'SYNO.API.Info':
+            return {'success': True, 'data': API_LIST}
+        if api == 'SYNO.API.Encryption':
+            return {'success': True, 'data': {
+                'public_key': '%x' % _public_modulus(),
+                'cipherkey': '__cIpHeRtExT',
+                'ciphertoken': '__cIpHeRtOkEn',
+                'server_time': 0,
+            }}
+        if api == 'SYNO.API.Auth' and method == 'login':
+            with self._lock:
+                self.logins += 1
+                sid = 'sid-%d' % self.logins
+            return {'success': True, 'data': {'sid': sid, 'synotoken': 'token-' + sid}}
+        return {'success': True, 'data': {}}
+
+
+def _make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _params(self):
+            split = urlsplit(self.path)
+            params = dict(parse_qsl(split.query))
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            content_type = self.headers.get('Content-Type', '')
+            if body and content_type.startswith('application/x-www-form-urlencoded'):
+                params.update(parse_qsl(body.decode('utf-8')))
+            params['__body__'] = body
+            params['__headers__'] = self.headers
+            return params
+
+        def _handle(self):
+            with stub._lock:
+                stub.connections.add(self.client_address)
+            result = stub.dispatch(self._params())
+            if isinstance(result, tuple):
+                status, headers, body = result
+            else:
+                status, headers, body = 200, {'Content-Type': 'application/json'}, json.dumps(
+                    result).encode('utf-8')
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            # A handler announcing more bytes than it sends simulates a dropped connection
+            if 'Content-Length' not in headers:
+                self.send_header('Content-Length', str(len(body)))
+            elif int(headers['Content-Length']) != len(body):
+                self.close_connection = True
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = _handle
+        do_POST = _handle
+
+    return Handler
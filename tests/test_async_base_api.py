@@ -0,0 +1,119 @@
+from unittest import TestCase
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from synology_api.async_base_api import AsyncAuthentication, AsyncBaseApi
+from synology_api.filestation import FileStation
+from tests.dsm_stub import DsmStub
+
+
+class TestAsyncBaseApi(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        # Keep the API catalog cache out of the user cache directory
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME'] = self.cache_dir.name
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.stub.route('SYNO.FileStation.Info', 'get', self.slow_info)
+
+    def tearDown(self):
+        self.stub.__exit__()
+        if self.xdg_cache_home is None:
+            del os.environ['XDG_CACHE_HOME']
+        else:
+            os.environ['XDG_CACHE_HOME'] = self.xdg_cache_home
+        self.cache_dir.cleanup()
+
+    def slow_info(self, params):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return {'success': True, 'data': {'hostname': 'stub'}}
+
+    def test_concurrent_calls_are_limited(self):
+        async def main():
+            async with AsyncBaseApi(FileStation, '127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                                    dsm_version=6, debug=False, max_concurrency=4) as fs:
+                return await asyncio.gather(*[fs.get_info() for _ in range(20)])
+
+        results = asyncio.run(main())
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(r['data']['hostname'] == 'stub' for r in results))
+        self.assertEqual(self.max_in_flight, 4)
+
+    def test_async_authentication(self):
+        async def main():
+            session = await AsyncAuthentication.create('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                                                       dsm_version=6, debug=False)
+            response = await session.request_data('SYNO.FileStation.Info', 'entry.cgi',
+                                                  {'version': 2, 'method': 'get'})
+            session.close()
+            return session, response
+
+        session, response = asyncio.run(main())
+        self.assertEqual(session.sid, 'sid-1')
+        self.assertTrue(response['success'])
+
+    def test_shared_session_is_left_as_configured(self):
+        fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                         dsm_version=6, debug=False)
+        fs.session.configure_pool(pool_maxsize=2)
+        adapter = fs.session.http_session.get_adapter(fs.base_url)
+
+        async def main():
+            session = AsyncAuthentication(fs.session, max_concurrency=8)
+            response = await session.request_data('SYNO.FileStation.Info', 'entry.cgi',
+                                                  {'version': 2, 'method': 'get'})
+            session.close()
+            return response
+
+        self.assertTrue(asyncio.run(main())['success'])
+        # The pool of the synchronous instances is neither replaced nor closed
+        self.assertIs(fs.session.http_session.get_adapter(
+            fs.base_url), adapter)
+        self.assertEqual(adapter._pool_maxsize, 2)
+        self.assertEqual(len(adapter.poolmanager.pools), 1)
+        self.assertTrue(fs.get_info()['success'])
+        fs.logout()
+
+    def test_shared_session_stays_logged_in(self):
+        fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                         dsm_version=6, debug=False)
+
+        async def main():
+            async with AsyncBaseApi(FileStation, '127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                                    dsm_version=6, debug=False) as afs:
+                self.assertIs(afs.api.session, fs.session)
+                return await afs.get_info()
+
+        self.assertTrue(asyncio.run(main())['success'])
+        # The session of the synchronous instance is still open and registered
+        self.assertEqual(self.stub.count('SYNO.API.Auth', 'logout'), 0)
+        self.assertIn(fs.session, [FileStation.session_registry.get(key)
+                                   for key in FileStation.session_registry.keys()])
+        self.assertTrue(fs.get_info()['success'])
+        fs.logout()
+        self.assertEqual(self.stub.count('SYNO.API.Auth', 'logout'), 1)
+
+        async def own():
+            async with AsyncBaseApi(FileStation, '127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                                    dsm_version=6, debug=False) as afs:
+                return await afs.get_info()
+
+        # A session opened by the wrapper is logged out with it
+        self.assertTrue(asyncio.run(own())['success'])
+        self.assertEqual(self.stub.count('SYNO.API.Auth', 'logout'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+from unittest import TestCase, mock
+import os
+import re
+import tempfile
+import unittest
+from synology_api import base_api
+from synology_api.bulk_ops import BulkOperation, collapse_paths, plan_batches
+from synology_api.exceptions import FileStationError
+from synology_api.filestation import FileStation
+from tests.dsm_stub import DsmStub
+
+
+class TestBulkOperation(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(
+            os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+        self.fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                              dsm_version=6, debug=False, interactive_output=False)
+        # taskid -> [api, params, status checks left]
+        self.tasks = {}
+        self.peak = 0
+
+        for api in ('SYNO.FileStation.CopyMove', 'SYNO.FileStation.Delete'):
+            self.stub.route(api, 'start', self.start(api))
+            self.stub.route(api, 'status', self.status)
+
+    def tearDown(self):
+        self.fs.logout()
+        self.stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.shared_session = None
+
+    def start(self, api):
+        def start(params):
+            taskid = 'task%d' % (len(self.tasks) + 1)
+            params['paths'] = re.findall(r'"(.*?)"', params['path'])
+            self.tasks[taskid] = [api, params, 2]
+            self.peak = max(self.peak, len(
+                [t for t in self.tasks.values() if t[2]]))
+            return {'success': True, 'data': {'taskid': taskid}}
+        return start
+
+    def status(self, params):
+        task = self.tasks[params['taskid'].strip('"')]
+        task[2] = max(0, task[2] - 1)
+        if task[2]:
+            return {'success': True, 'data': {'finished': False, 'progress': 0.5}}
+        if any('bad' in path for path in task[1]['paths']):
+            return {'success': False, 'error': {'code': 1000}}
+        return {'success': True, 'data': {'finished': True, 'progress': 1}}
+
+    def started(self):
+        return [(params['api'], params['paths'], params.get('dest_folder_path'))
+                for _, params, _ in self.tasks.values()]
+
+    def test_plan_batches(self):
+        paths = ['/share/f%02d' % i for i in range(10)]
+        self.assertEqual([len(b) for b in plan_batches(paths, max_tasks=4)],
+                         [3, 3, 3, 1])
+        self.assertEqual([len(b) for b in plan_batches(paths, max_tasks=2, max_paths=3)],
+                         [3, 3, 3, 1])
+        self.assertEqual([len(b) for b in plan_batches(paths, max_chars=75)],
+                         [3, 3, 3, 1])
+        self.assertEqual(plan_batches(['/b', '/a']), [['/a', '/b']])
+        self.assertEqual(plan_batches(['/' + 'x' * 100, '/y'], max_chars=50),
+                         [['/' + 'x' * 100], ['/y']])
+
+        self.assertEqual(collapse_paths(['/s/a/1', '/s/a', '/s/ab', '/s/a/b/2', '/s/c/']),
+                         {'/s/a': ['/s/a', '/s/a/1', '/s/a/b/2'], '/s/ab': ['/s/ab'], '/s/c': ['/s/c/']})
+
+    def test_copy_and_move(self):
+        bulk = BulkOperation(self.fs, max_tasks=2, max_paths=3)
+        paths = ['/share/f%02d' % i for i in range(10)]
+        progress = []
+        result = bulk.copy(paths, '/backup', overwrite=True,
+                           progress_callback=lambda done, total: progress.append((done, total)))
+        self.assertEqual(sorted(result['done']), paths)
+        self.assertEqual(result['failed'], {})
+        self.assertEqual(result['tasks'], 4)
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(progress[-1], (10, 10))
+        self.assertEqual([p for _, p, _ in self.started()],
+                         [paths[0:3], paths[3:6], paths[6:9], paths[9:]])
+        self.assertEqual(self.tasks['task1'][1]['overwrite'], 'true')
+        self.assertNotIn('remove_src', self.tasks['task1'][1])
+
+        # Paths grouped by destination, nested paths are kept
+        self.tasks.clear()
+        result = bulk.move(
+            {'/share/a': '/x', '/share/a/b': '/y', '/share/c': '/x'})
+        self.assertEqual(sorted(result['done']), [
+                         '/share/a', '/share/a/b', '/share/c'])
+        self.assertEqual(self.started(), [
+            ('SYNO.FileStation.CopyMove', ['/share/a'], '/x'),
+            ('SYNO.FileStation.CopyMove', ['/share/c'], '/x'),
+            ('SYNO.FileStation.CopyMove', ['/share/a/b'], '/y')])
+        self.assertEqual(self.tasks['task1'][1]['remove_src'], 'true')
+        self.assertRaises(ValueError, bulk.copy, paths)
+
+    def test_delete_reports_failures(self):
+        bulk = BulkOperation(self.fs, max_tasks=3, max_paths=2)
+        result = bulk.delete(['/share/a', '/share/a/x', '/share/bad',
+                             '/share/c', '/share/d', '/share/e'])
+        self.assertEqual(result['tasks'], 3)
+        # The folder deletion covers its content
+        self.assertEqual([p for _, p, _ in self.started()], [
+            ['/share/a', '/share/bad'], ['/share/c', '/share/d'], ['/share/e']])
+        self.assertEqual(sorted(result['done']), [
+                         '/share/c', '/share/d', '/share/e'])
+        self.assertEqual(sorted(result['failed']), [
+                         '/share/a', '/share/a/x', '/share/bad'])
+        self.assertIsInstance(result['failed']['/share/bad'], FileStationError)
+        self.assertEqual(self.tasks['task1'][1]['recursive'], 'true')
+
+    def test_interrupted_run_stops_tasks(self):
+        stopped = []
+        self.stub.route('SYNO.FileStation.Delete', 'stop',
+                        lambda params: stopped.append(params['taskid']) or {'success': True})
+
+        def interrupt(done, total):
+            raise KeyboardInterrupt
+
+        bulk = BulkOperation(self.fs, max_tasks=2, max_paths=1)
+        self.assertRaises(KeyboardInterrupt, bulk.delete, ['/a', '/b', '/c'],
+                          progress_callback=interrupt)
+        self.assertEqual(stopped, ['"task1"', '"task2"'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+from unittest import TestCase
+import socket
+import tempfile
+import time
+import unittest
+from synology_api import auth as syn
+from synology_api.circuit_breaker import CircuitBreaker
+from synology_api.exceptions import CircuitOpenError, CoreError, SynoConnectionError, UndefinedError
+from synology_api.retry import RetryPolicy
+from tests.dsm_stub import DsmStub
+
+HOST = 'http://nas:5000/webapi/'
+CAMERA = 'SYNO.SurveillanceStation.Camera'
+
+
+class TestCircuitBreaker(TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+        for _ in range(2):
+            breaker.allow(HOST, CAMERA)
+            breaker.record(HOST, CAMERA, error_code=102)
+        # A success resets the count
+        breaker.record(HOST, CAMERA)
+        for _ in range(3):
+            breaker.allow(HOST, CAMERA)
+            breaker.record(HOST, CAMERA, status_code=502)
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.allow(HOST, 'SYNO.SurveillanceStation.Event')
+        self.assertEqual(raised.exception.prefix, 'SYNO.SurveillanceStation')
+        self.assertGreater(raised.exception.retry_after, 59)
+        # Other API prefixes and hosts are not affected
+        breaker.allow(HOST, 'SYNO.Core.System')
+        breaker.allow('http://other:5000/webapi/', CAMERA)
+        self.assertEqual(breaker.state(HOST, CAMERA), 'open')
+        self.assertEqual(breaker.state(HOST, 'SYNO.Core.System'), 'closed')
+        self.assertFalse(breaker.is_available(
+            HOST, 'SYNO.SurveillanceStation'))
+        self.assertTrue(breaker.is_available(HOST))
+
+        snapshot = breaker.snapshot()
+        self.assertEqual(
+            snapshot[HOST]['SYNO.SurveillanceStation']['state'], 'open')
+        self.assertEqual(
+            snapshot[HOST]['SYNO.SurveillanceStation']['failures'], 3)
+        self.assertEqual(snapshot[HOST]['']['state'], 'closed')
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+        breaker.allow(HOST, CAMERA)
+        breaker.record(HOST, CAMERA, transport_error=True)
+        self.assertRaises(CircuitOpenError, breaker.allow,
+                          HOST, 'SYNO.Core.System')
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state(HOST), 'half_open')
+        breaker.allow(HOST, 'SYNO.Core.System')
+        # Only one trial at a time
+        self.assertRaises(CircuitOpenError, breaker.allow, HOST, CAMERA)
+        breaker.record(HOST, 'SYNO.Core.System', transport_error=True)
+        self.assertEqual(breaker.state(HOST), 'open')
+
+        time.sleep(0.06)
+        breaker.allow(HOST, 'SYNO.Core.System')
+        breaker.record(HOST, 'SYNO.Core.System')
+        self.assertEqual(breaker.state(HOST), 'closed')
+        breaker.allow(HOST, CAMERA)
+
+    def test_transport(self):
+        with DsmStub() as stub, tempfile.TemporaryDirectory() as cache_dir:
+            stub.route(CAMERA, 'List', lambda params: {
+                       'success': False, 'error': {'code': 102}})
+            stub.route('SYNO.Core.System', 'info', lambda params: {
+                       'success': False, 'error': {'code': 105}})
+            breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+            auth = syn.Authentication('127.0.0.1', str(stub.port), 'admin', 'secret', dsm_version=6, debug=False,
+                                      api_cache_dir=cache_dir, circuit_breaker=breaker,
+                                      retry_policy=RetryPolicy(max_retries=0))
+            auth.login()
+            for _ in range(2):
+                self.assertRaises(UndefinedError, auth.request_data, CAMERA, 'entry.cgi',
+                                  {'version': 1, 'method': 'List'})
+            self.assertRaises(CircuitOpenError, auth.request_data, CAMERA, 'entry.cgi',
+                              {'version': 1, 'method': 'List'})
+            self.assertEqual(stub.count(CAMERA, 'List'), 2)
+            self.assertFalse(auth.endpoint_available(
+                'SYNO.SurveillanceStation'))
+
+            # Permission errors and the like do not count, the endpoint answered
+            for _ in range(3):
+                self.assertRaises(CoreError, auth.request_data, 'SYNO.Core.System', 'entry.cgi',
+                                  {'version': 1, 'method': 'info'})
+            self.assertTrue(auth.endpoint_available('SYNO.Core.System'))
+            auth.close()
+
+    def test_unreachable_host(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        auth = syn.Authentication('127.0.0.1', str(port), 'admin', 'secret', debug=False,
+                                  circuit_breaker=CircuitBreaker(
+                                      failure_threshold=1),
+                                  retry_policy=RetryPolicy(max_retries=0))
+        self.assertRaises(SynoConnectionError, auth.request_data, 'SYNO.Core.System', 'entry.cgi',
+                          {'version': 1, 'method': 'info'}, response_json=False)
+        self.assertRaises(CircuitOpenError, auth.request_data, 'SYNO.Core.System', 'entry.cgi',
+                          {'version': 1, 'method': 'info'}, response_json=False)
+        self.assertFalse(auth.endpoint_available())
+        auth.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
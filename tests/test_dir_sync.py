@@ -0,0 +1,251 @@
+from unittest import TestCase, mock
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unittest
+from synology_api import base_api
+from synology_api.dir_sync import DirectorySync
+from synology_api.filestation import FileStation
+from tests.dsm_stub import DsmStub
+
+MTIME = 1700000000
+
+
+class TestDirectorySync(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(
+            os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+        self.fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                              dsm_version=6, debug=False, interactive_output=False)
+        self.local = os.path.join(self.tmp.name, 'local')
+        os.makedirs(self.local)
+        # Remote files: path -> [content, mtime]
+        self.remote = {}
+        self.deleted = []
+        self.serve_remote()
+
+    def tearDown(self):
+        self.fs.logout()
+        self.stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.shared_session = None
+
+    def serve_remote(self):
+        lock = threading.Lock()
+
+        def list_folder(params):
+            folder = params['folder_path']
+            with lock:
+                paths = list(self.remote)
+            children = {}
+            for path in paths:
+                if not path.startswith(folder + '/'):
+                    continue
+                name = path[len(folder) + 1:].split('/')[0]
+                child = folder + '/' + name
+                children[name] = {'name': name,
+                                  'path': child, 'isdir': child != path}
+                if child == path:
+                    children[name]['additional'] = {'size': len(self.remote[path][0]),
+                                                    'time': {'mtime': self.remote[path][1]}}
+            if not children:
+                return {'success': False, 'error': {'code': 408}}
+            entries = [children[name] for name in sorted(children)]
+            offset, limit = int(params['offset']), int(params['limit'])
+            return {'success': True, 'data': {'total': len(entries), 'offset': offset,
+                                              'files': entries[offset:offset + limit]}}
+
+        def upload(params):
+            body = params['__body__']
+            folder = re.search(
+                rb'name="path"\r\n\r\n(.*?)\r\n', body).group(1).decode()
+            mtime = int(
+                re.search(rb'name="mtime"\r\n\r\n(.*?)\r\n', body).group(1)) // 1000
+            name, content = re.search(
+                rb'filename="(.*?)"\r\nContent-Type: application/octet-stream\r\n\r\n(.*)\r\n--',
+                body, re.DOTALL).groups()
+            with lock:
+                self.remote[folder + '/' + name.decode()] = [content, mtime]
+            return {'success': True, 'data': {}}
+
+        def download(params):
+            return 200, {'Content-Type': 'application/octet-stream'}, self.remote[params['path']][0]
+
+        def delete(params):
+            paths = re.findall(r'"(.*?)"', params['path'])
+            with lock:
+                self.deleted += paths
+                for path in list(self.remote):
+                    if any(path == p or path.startswith(p + '/') for p in paths):
+                        del self.remote[path]
+            return {'success': True, 'data': {'taskid': 'delete1'}}
+
+        def md5(params):
+            return {'success': True, 'data': {'taskid': params['file_path']}}
+
+        def md5_status(params):
+            path = params['taskid'].strip('"')
+            return {'success': True, 'data': {'finished': True,
+                                              'md5': hashlib.md5(self.remote[path][0]).hexdigest()}}
+
+        self.stub.route('SYNO.FileStation.List', 'list', list_folder)
+        self.stub.route('SYNO.FileStation.Upload', 'upload', upload)
+        self.stub.route('SYNO.FileStation.Download', 'download', download)
+        self.stub.route('SYNO.FileStation.Delete', 'start', delete)
+        self.stub.route('SYNO.FileStation.Delete', 'status', lambda params: {
+                        'success': True, 'data': {'finished': True}})
+        self.stub.route('SYNO.FileStation.MD5', 'start', md5)
+        self.stub.route('SYNO.FileStation.MD5', 'status', md5_status)
+
+    def write_local(self, files, mtime=MTIME):
+        for name, content in files.items():
+            path = os.path.join(self.local, *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+            os.utime(path, (mtime, mtime))
+
+    def read_local(self, name):
+        with open(os.path.join(self.local, *name.split('/')), 'rb') as f:
+            return f.read()
+
+    def test_push_is_incremental(self):
+        self.write_local({'a.bin': b'a' * 100, 'sub/b.bin': b'b' * 200,
+                          'sub/@eaDir/thumb': b'x', 'c.txt': b'c'})
+        self.remote['/share/dst/c.txt'] = [b'c', MTIME]
+        self.remote['/share/dst/stale.txt'] = [b's', MTIME]
+        self.remote['/share/dst/old/x.txt'] = [b'x', MTIME]
+        self.remote['/share/dst/old/y.txt'] = [b'y', MTIME]
+        sync = DirectorySync(self.fs, self.local,
+                             '/share/dst', delete=True, max_workers=3)
+
+        plan = sync.plan()
+        self.assertEqual([(a.kind, a.path) for a in plan], [
+            ('upload', 'a.bin'),
+            ('delete_remote', 'old'),
+            ('delete_remote', 'stale.txt'),
+            ('upload', 'sub/b.bin')])
+        self.assertEqual(plan.bytes, 300)
+        self.assertIn('2 delete_remote, 2 upload', str(plan))
+
+        progress = []
+        result = sync.run(plan, progress_callback=lambda done,
+                          total: progress.append((done, total)))
+        self.assertEqual(sorted(result['uploaded']), ['a.bin', 'sub/b.bin'])
+        self.assertEqual(result['failed'], {})
+        self.assertEqual(progress[-1], (300, 300))
+        self.assertEqual(sorted(self.deleted), [
+                         '/share/dst/old', '/share/dst/stale.txt'])
+        self.assertEqual(sorted(self.remote), [
+            '/share/dst/a.bin', '/share/dst/c.txt', '/share/dst/sub/b.bin'])
+        self.assertEqual(
+            self.remote['/share/dst/sub/b.bin'], [b'b' * 200, MTIME])
+
+        # Nothing changed: nothing to do
+        self.assertEqual(len(sync.plan()), 0)
+        self.write_local({'a.bin': b'A' * 100}, MTIME + 60)
+        self.assertEqual([(a.kind, a.reason)
+                         for a in sync.plan()], [('upload', 'changed')])
+
+    def test_push_creates_many_folders(self):
+        self.write_local({'folder-with-a-long-name-%03d/f.bin' % i: b'f'
+                         for i in range(200)})
+        requests = []
+        self.stub.route('SYNO.FileStation.CreateFolder', 'create',
+                        lambda params: requests.append(params['folder_path']) or {'success': True, 'data': {}})
+        sync = DirectorySync(self.fs, self.local, '/share/dst')
+
+        result = sync.run()
+        # DSM rejects long request lines, the folders are created a few at a time
+        self.assertGreater(len(requests), 1)
+        self.assertEqual(sum(r.count('"') for r in requests), 2 * 200)
+        self.assertEqual(len(result['uploaded']), 200)
+
+    def test_push_when_folders_cannot_be_created(self):
+        self.write_local({'sub/a.bin': b'a'})
+        self.stub.route('SYNO.FileStation.CreateFolder', 'create', lambda params: {
+                        'success': False, 'error': {'code': 1100}})
+        parents = []
+        upload = self.stub.routes[('SYNO.FileStation.Upload', 'upload')]
+        self.stub.route('SYNO.FileStation.Upload', 'upload', lambda params: parents.append(
+            re.search(rb'name="create_parents"\r\n\r\n(.*?)\r\n', params['__body__']).group(1))
+            or upload(params))
+
+        result = DirectorySync(self.fs, self.local, '/share/dst').run()
+        # The upload creates the folder itself
+        self.assertEqual(result['uploaded'], ['sub/a.bin'])
+        self.assertEqual(parents, [b'true'])
+
+    def test_dry_run(self):
+        self.write_local({'a.bin': b'a'})
+        sync = DirectorySync(self.fs, self.local, '/share/dst')
+        with mock.patch('builtins.print') as printed:
+            result = sync.run(dry_run=True)
+        self.assertEqual(result['uploaded'], ['a.bin'])
+        self.assertIn('upload        a.bin (new)',
+                      str(printed.call_args[0][0]))
+        self.assertEqual(self.remote, {})
+        self.assertFalse(os.path.exists(sync.manifest_path))
+
+    def test_checksum_skips_identical_files(self):
+        self.write_local({'same.bin': b'same', 'diff.bin': b'1234'})
+        self.remote['/share/dst/same.bin'] = [b'same', MTIME + 3600]
+        self.remote['/share/dst/diff.bin'] = [b'abcd', MTIME + 3600]
+
+        plan = DirectorySync(self.fs, self.local,
+                             '/share/dst', checksum=True).plan()
+        self.assertEqual([(a.kind, a.path)
+                         for a in plan], [('upload', 'diff.bin')])
+        self.assertEqual(self.stub.count('SYNO.FileStation.MD5', 'start'), 2)
+
+    def test_two_way(self):
+        self.write_local(
+            {'both.txt': b'v1', 'local.txt': b'l1', 'gone.txt': b'g'})
+        self.remote['/share/dst/remote.txt'] = [b'r1', MTIME]
+        sync = DirectorySync(self.fs, self.local,
+                             '/share/dst', direction='both', delete=True)
+        result = sync.run()
+        self.assertEqual(sorted(result['uploaded']), [
+                         'both.txt', 'gone.txt', 'local.txt'])
+        self.assertEqual(result['downloaded'], ['remote.txt'])
+        self.assertEqual(self.read_local('remote.txt'), b'r1')
+        self.assertEqual(os.stat(os.path.join(
+            self.local, 'remote.txt')).st_mtime, MTIME)
+
+        # One change on each side, a deletion, and a conflict won by the newer side
+        self.write_local({'local.txt': b'l2'}, MTIME + 10)
+        self.remote['/share/dst/remote.txt'] = [b'r2', MTIME + 10]
+        os.remove(os.path.join(self.local, 'gone.txt'))
+        self.write_local({'both.txt': b'local'}, MTIME + 20)
+        self.remote['/share/dst/both.txt'] = [b'remote!', MTIME + 30]
+
+        plan = sync.plan()
+        self.assertEqual([(a.kind, a.path, a.reason) for a in plan], [
+            ('download', 'both.txt', 'changed on both sides, remote kept'),
+            ('delete_remote', 'gone.txt', 'deleted locally'),
+            ('upload', 'local.txt', 'changed locally'),
+            ('download', 'remote.txt', 'changed on the NAS')])
+        sync.run(plan)
+        self.assertEqual(self.read_local('both.txt'), b'remote!')
+        self.assertEqual(self.remote['/share/dst/local.txt'][0], b'l2')
+        self.assertNotIn('/share/dst/gone.txt', self.remote)
+        self.assertEqual(len(sync.plan()), 0)
+
+        # Conflicts can be left alone
+        self.write_local({'both.txt': b'mine'}, MTIME + 100)
+        self.remote['/share/dst/both.txt'] = [b'theirs', MTIME + 50]
+        sync.conflict = 'skip'
+        result = sync.run()
+        self.assertEqual(result['conflicts'], ['both.txt'])
+        self.assertEqual([a.kind for a in sync.plan()], ['conflict'])
+
+
+if __name__ == '__main__':
+    unittest.main()
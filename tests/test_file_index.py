@@ -0,0 +1,188 @@
+from unittest import TestCase, mock
+from datetime import datetime, timezone
+import json
+import os
+import posixpath
+import tempfile
+import unittest
+from urllib.parse import quote
+from synology_api import base_api
+from synology_api.file_index import FileIndex
+from synology_api.filestation import FileStation
+from tests.dsm_stub import DsmStub
+
+
+class TestFileIndex(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(
+            os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+        self.fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                              dsm_version=6, debug=False)
+        # Remote entries: path -> (isdir, size, mtime)
+        self.tree = {
+            '/photo': (True, 0, 100),
+            '/photo/2023': (True, 0, 100),
+            '/photo/2023/IMG_0001.JPG': (False, 3000, 1000),
+            '/photo/2023/IMG_0002.cr2': (False, 90000, 2000),
+            '/photo/2023/trip': (True, 0, 100),
+            '/photo/2023/trip/a_b.jpg': (False, 10, 3000),
+            '/photo/2024': (True, 0, 100),
+            '/photo/2024/x.nef': (False, 80000, 4000),
+            '/photo/readme.txt': (False, 5, 500),
+        }
+        self.listed = []
+        self.serve_tree()
+        self.index = FileIndex(self.fs, max_workers=3,
+                               page_size=2, info_batch=2)
+
+    def tearDown(self):
+        self.index.close()
+        self.fs.logout()
+        self.stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.shared_session = None
+
+    def entry(self, path):
+        isdir, size, mtime = self.tree[path]
+        return {'path': path, 'name': posixpath.basename(path), 'isdir': isdir,
+                'additional': {'size': size, 'time': {'mtime': mtime, 'crtime': 1}}}
+
+    def serve_tree(self):
+        def list_folder(params):
+            folder = params['folder_path']
+            self.listed.append((folder, int(params['offset'])))
+            if folder not in self.tree:
+                return {'success': False, 'error': {'code': 408}}
+            entries = [self.entry(path) for path in sorted(self.tree)
+                       if posixpath.dirname(path) == folder]
+            offset, limit = int(params['offset']), int(params['limit'])
+            return {'success': True, 'data': {'total': len(entries), 'offset': offset,
+                                              'files': entries[offset:offset + limit]}}
+
+        def get_info(params):
+            paths = json.loads(params['path']) if params['path'].startswith(
+                '[') else [params['path']]
+            return {'success': True, 'data': {'files': [
+                self.entry(path) if path in self.tree else {
+                    'code': 408, 'path': path}
+                for path in paths]}}
+
+        self.stub.route('SYNO.FileStation.List', 'list', list_folder)
+        self.stub.route('SYNO.FileStation.List', 'getinfo', get_info)
+
+    def test_crawl_and_queries(self):
+        counts = self.index.crawl('/photo')
+        self.assertEqual((counts['folders'], counts['files']), (3, 5))
+        self.assertEqual(self.index.count(), {
+                         'files': 5, 'folders': 4, 'bytes': 173015})
+
+        paths = [e['path'] for e in self.index.find(ext=['CR2', 'nef'])]
+        self.assertEqual(
+            paths, ['/photo/2023/IMG_0002.cr2', '/photo/2024/x.nef'])
+        self.assertEqual([e['name'] for e in self.index.find(
+            name='img_*.jpg')], ['IMG_0001.JPG'])
+        # LIKE wildcards in names are literal
+        self.assertEqual([e['name']
+                         for e in self.index.find(name='a_b*')], ['a_b.jpg'])
+        self.assertEqual([e['name'] for e in self.index.find(
+            name='[ax]*')], ['a_b.jpg', 'x.nef'])
+        self.assertEqual([e['size'] for e in self.index.find(min_size=3000, max_size=80000)],
+                         [3000, 80000])
+        self.assertEqual([e['name'] for e in self.index.find(
+            modified_after=datetime.fromtimestamp(1500, timezone.utc), modified_before=4000)],
+            ['IMG_0002.cr2', 'a_b.jpg'])
+        self.assertEqual([e['name'] for e in self.index.find(under='/photo/2023', order_by='-size', limit=2)],
+                         ['IMG_0002.cr2', 'IMG_0001.JPG'])
+        self.assertEqual([e['name'] for e in self.index.listdir('/photo')],
+                         ['2023', '2024', 'readme.txt'])
+        self.assertTrue(self.index.get('/photo/2024')['isdir'])
+        self.assertIsNone(self.index.get('/photo/missing'))
+
+    def test_refresh_lists_changed_folders_only(self):
+        self.index.crawl('/photo')
+        self.listed.clear()
+        stats = self.index.refresh('/photo')
+        self.assertEqual(stats['relisted'], 0)
+        self.assertEqual(self.listed, [])
+        # 4 folders, 2 per getinfo request
+        self.assertEqual(self.stub.count(
+            'SYNO.FileStation.List', 'getinfo'), 3)
+
+        # A file added in one folder, a new sub-folder in another, a folder deleted
+        self.tree['/photo/2023/IMG_0003.JPG'] = (False, 7, 5000)
+        self.tree['/photo/2023'] = (True, 0, 200)
+        self.tree['/photo/2024/new'] = (True, 0, 300)
+        self.tree['/photo/2024/new/y.nef'] = (False, 1, 300)
+        self.tree['/photo/2024'] = (True, 0, 300)
+        del self.tree['/photo/2023/trip/a_b.jpg']
+        del self.tree['/photo/2023/trip']
+
+        self.listed.clear()
+        stats = self.index.refresh('/photo')
+        self.assertEqual(sorted({path for path, _ in self.listed}),
+                         ['/photo/2023', '/photo/2024', '/photo/2024/new'])
+        self.assertEqual(stats['relisted'], 2)
+        self.assertEqual(stats['removed'], 2)
+        self.assertEqual(stats['added'], 3)
+        self.assertIsNotNone(self.index.get('/photo/2023/IMG_0003.JPG'))
+        self.assertIsNotNone(self.index.get('/photo/2024/new/y.nef'))
+        self.assertIsNone(self.index.get('/photo/2023/trip/a_b.jpg'))
+
+        # Up to date again
+        self.listed.clear()
+        self.assertEqual(self.index.refresh('/photo')['relisted'], 0)
+        self.assertEqual(self.listed, [])
+
+    def test_refresh_with_long_paths(self):
+        deep = '/photo/' + '/'.join(['a-rather-long-folder-name'] * 4)
+        for i in range(100):
+            self.tree['%s-%03d' % (deep, i)] = (True, 0, 100)
+        for path in list(self.tree):
+            parent = posixpath.dirname(path)
+            while parent != '/' and parent not in self.tree:
+                self.tree[parent] = (True, 0, 100)
+                parent = posixpath.dirname(parent)
+        index = FileIndex(self.fs, os.path.join(self.tmp.name, 'long.db'))
+        self.addCleanup(index.close)
+        index.crawl('/photo')
+
+        lengths = []
+        get_info = self.stub.routes[('SYNO.FileStation.List', 'getinfo')]
+        self.stub.route('SYNO.FileStation.List', 'getinfo', lambda params: lengths.append(
+            len(quote(params['path'], safe=''))) or get_info(params))
+        self.assertEqual(index.refresh('/photo')['relisted'], 0)
+        # DSM rejects long request lines, the folders are asked a few at a time
+        self.assertGreater(len(lengths), 1)
+        self.assertLessEqual(max(lengths), 4000)
+
+    def test_paths_are_case_sensitive(self):
+        self.tree['/Photo'] = (True, 0, 100)
+        self.tree['/Photo/z.jpg'] = (False, 1, 100)
+        self.index.crawl('/Photo')
+        self.index.crawl('/photo')
+        # Crawling one folder leaves the other one alone
+        self.assertIsNotNone(self.index.get('/Photo/z.jpg'))
+        self.assertEqual(self.index.count('/Photo')['files'], 1)
+        self.assertEqual(self.index.count('/photo')['files'], 5)
+        self.assertEqual([e['path'] for e in self.index.find(under='/Photo')],
+                         ['/Photo/z.jpg'])
+
+        del self.tree['/photo/readme.txt']
+        self.tree['/photo'] = (True, 0, 200)
+        self.assertEqual(self.index.refresh('/photo')['removed'], 1)
+        self.assertIsNotNone(self.index.get('/Photo/z.jpg'))
+
+    def test_index_persists(self):
+        self.index.crawl('/photo')
+        self.index.close()
+        self.index = FileIndex(self.fs)
+        self.assertEqual(self.index.count('/photo/2023')['files'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
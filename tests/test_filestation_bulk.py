@@ -0,0 +1,397 @@
+from unittest import TestCase, mock
+import os
+import re
+import requests
+import tempfile
+import threading
+import time
+import unittest
+from synology_api import base_api
+from synology_api.filestation import FileStation
+from synology_api.circuit_breaker import CircuitBreaker
+from synology_api.exceptions import CircuitOpenError, FileStationError
+from synology_api.metrics import MetricsCollector
+from treelib import Tree
+from tests.dsm_stub import DsmStub
+
+
+class TestFileStationBulk(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.tmp = tempfile.TemporaryDirectory()
+        # Keep the API catalog cache out of the user cache directory
+        env = mock.patch.dict(
+            os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+        self.fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                              dsm_version=6, debug=False)
+
+    def tearDown(self):
+        self.fs.logout()
+        self.stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.shared_session = None
+
+    def write_tree(self, files):
+        root = os.path.join(self.tmp.name, 'src')
+        for name, size in files.items():
+            path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size))
+        return root
+
+    def test_upload_files_in_parallel(self):
+        uploads = []
+        in_flight = [0, 0]
+        lock = threading.Lock()
+
+        def upload(params):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.05)
+            body = params['__body__']
+            folder = re.search(
+                rb'name="path"\r\n\r\n(.*?)\r\n', body).group(1).decode()
+            name = re.search(rb'filename="(.*?)"', body).group(1).decode()
+            parents = re.search(
+                rb'name="create_parents"\r\n\r\n(.*?)\r\n', body).group(1)
+            with lock:
+                uploads.append((folder + '/' + name, parents))
+                in_flight[0] -= 1
+            return {'success': True, 'data': {}}
+
+        folders = []
+        self.stub.route('SYNO.FileStation.Upload', 'upload', upload)
+        self.stub.route('SYNO.FileStation.CreateFolder', 'create',
+                        lambda params: folders.append((params['folder_path'], params['name'])) or
+                        {'success': True, 'data': {}})
+
+        root = self.write_tree({'a.bin': 1000, 'b.bin': 2000, 'sub/c.bin': 3000,
+                                'sub/d.bin': 4000, 'sub/deep/e.bin': 5000, 'f.bin': 6000})
+        progress = []
+        result = self.fs.upload_files('/home/dst/', root, max_workers=3, progress_bar=False,
+                                      progress_callback=lambda sent, total: progress.append((sent, total)))
+
+        self.assertEqual(
+            folders, [('["/home","/home/dst","/home/dst/sub"]', '["dst","sub","deep"]')])
+
+        self.assertEqual(sorted(path for path, _ in uploads), [
+            '/home/dst/a.bin', '/home/dst/b.bin', '/home/dst/f.bin',
+            '/home/dst/sub/c.bin', '/home/dst/sub/d.bin', '/home/dst/sub/deep/e.bin'])
+        self.assertTrue(all(parents == b'false' for _, parents in uploads))
+        self.assertEqual(sorted(result['uploaded']), sorted(
+            path for path, _ in uploads))
+        self.assertEqual(result['failed'], {})
+        self.assertEqual(result['bytes'], 21000)
+        self.assertEqual(progress[-1], (21000, 21000))
+        self.assertEqual(in_flight[1], 3)
+        self.assertLessEqual(len(self.stub.connections), 4)
+
+    def test_upload_files_creates_many_folders(self):
+        uploads = []
+        self.stub.route('SYNO.FileStation.Upload', 'upload', lambda params: uploads.append(
+            re.search(rb'name="create_parents"\r\n\r\n(.*?)\r\n', params['__body__']).group(1))
+            or {'success': True, 'data': {}})
+        requests = []
+        self.stub.route('SYNO.FileStation.CreateFolder', 'create',
+                        lambda params: requests.append(params['folder_path']) or {'success': True, 'data': {}})
+        root = self.write_tree({'folder-with-a-long-name-%03d/f.bin' % i: 1
+                                for i in range(200)})
+
+        result = self.fs.upload_files('/home/dst', root, progress_bar=False)
+
+        # DSM rejects long request lines, the folders are created a few at a time
+        self.assertGreater(len(requests), 1)
+        self.assertEqual(sum(r.count('"') for r in requests), 2 * 200)
+        self.assertEqual(len(result['uploaded']), 200)
+        self.assertTrue(all(parents == b'false' for parents in uploads))
+
+        # Folders that could not be created are left to each upload
+        uploads.clear()
+        self.stub.route('SYNO.FileStation.CreateFolder', 'create', lambda params: {
+                        'success': False, 'error': {'code': 1100}})
+        result = self.fs.upload_files('/home/dst', root, progress_bar=False)
+        self.assertEqual(len(result['uploaded']), 200)
+        self.assertTrue(all(parents == b'true' for parents in uploads))
+
+    def test_upload_files_reports_failures(self):
+        self.stub.route('SYNO.FileStation.Upload', 'upload', lambda params: {'success': False, 'error': {'code': 1805}}
+                        if b'bad.bin' in params['__body__'] else {'success': True, 'data': {}})
+        root = self.write_tree({'good.bin': 10, 'bad.bin': 10})
+        paths = [os.path.join(root, 'good.bin'), os.path.join(root, 'bad.bin')]
+
+        result = self.fs.upload_files('/home', paths, progress_bar=False)
+
+        self.assertEqual(self.stub.count('SYNO.FileStation.CreateFolder'), 0)
+        self.assertEqual(result['uploaded'], ['/home/good.bin'])
+        self.assertEqual(list(result['failed']), [paths[1]])
+        self.assertEqual(result['failed'][paths[1]].error_code, 1805)
+
+    def serve_file(self, data, ranges=True, drop_once=()):
+        requested = []
+        dropped = set()
+
+        def download(params):
+            header = params['__headers__'].get('Range')
+            requested.append(header)
+            if not header or not ranges:
+                return 200, {'Content-Type': 'application/octet-stream'}, data
+            start, end = header[len('bytes='):].split('-')
+            start, end = int(start), int(end) if end else len(data) - 1
+            body = data[start:end + 1]
+            headers = {'Content-Type': 'application/octet-stream',
+                       'Content-Range': 'bytes %d-%d/%d' % (start, end, len(data))}
+            if start in drop_once and start not in dropped:
+                dropped.add(start)
+                headers['Content-Length'] = str(len(body))
+                body = body[:len(body) // 2]
+            return 206, headers, body
+
+        self.stub.route('SYNO.FileStation.Download', 'download', download)
+        return requested
+
+    def test_stream_and_serve(self):
+        data = os.urandom(300000)
+        self.serve_file(data)
+
+        self.assertEqual(b''.join(self.fs.get_file(
+            '/home/a.bin', 'stream', chunk_size=4096)), data)
+        self.assertEqual(self.fs.get_file(
+            '/home/a.bin', 'serve').getvalue(), data)
+        self.assertEqual(b''.join(self.fs.iter_file(
+            '/home/a.bin', 1000, 1999)), data[1000:2000])
+
+    def test_parallel_download_with_retry(self):
+        data = os.urandom(1000000)
+        requested = self.serve_file(data, drop_once={300000})
+        progress = []
+
+        local = self.fs.download_file('/home/big.bin', self.tmp.name, max_workers=4, part_size=100000,
+                                      progress_callback=lambda done, total: progress.append((done, total)))
+
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.listdir(self.tmp.name).count('big.bin.part'), 0)
+        self.assertIn('bytes=0-99999', requested)
+        self.assertIn('bytes=900000-999999', requested)
+        self.assertEqual(
+            len([r for r in requested if r.startswith('bytes=3')]), 2)
+        self.assertEqual(progress[-1], (1000000, 1000000))
+
+    def test_transfers_are_reported_to_hooks(self):
+        metrics = self.fs.session.add_hook(MetricsCollector())
+        self.stub.route('SYNO.FileStation.Upload', 'upload',
+                        lambda params: {'success': True, 'data': {}})
+        root = self.write_tree({'a.bin': 100000})
+        self.fs.upload_files(
+            '/home', [os.path.join(root, 'a.bin')], progress_bar=False)
+        data = os.urandom(200000)
+        self.serve_file(data)
+        self.fs.download_file('/home/big.bin', self.tmp.name,
+                              max_workers=2, part_size=100000)
+
+        figures = metrics.as_dict()
+        upload = figures['SYNO.FileStation.Upload']['upload']
+        self.assertEqual(upload['count'], 1)
+        self.assertGreater(upload['request_bytes'], 100000)
+        # A probe of the first byte, then two ranges
+        download = figures['SYNO.FileStation.Download']['download']
+        self.assertEqual(download['count'], 3)
+        self.assertGreaterEqual(download['response_bytes'], 200000)
+
+        # Failed downloads count for the circuit breaker too
+        self.fs.session.circuit_breaker = CircuitBreaker(failure_threshold=1)
+        self.stub.route('SYNO.FileStation.Download', 'download',
+                        lambda params: (503, {}, b''))
+        self.assertRaises(requests.HTTPError, self.fs.get_file,
+                          '/home/a.bin', 'serve')
+        self.assertRaises(CircuitOpenError, self.fs.get_file,
+                          '/home/a.bin', 'serve')
+
+    def test_resume_partial_download(self):
+        data = os.urandom(50000)
+        requested = self.serve_file(data)
+        mtime = [1000]
+        self.stub.route('SYNO.FileStation.List', 'getinfo', lambda params: {'success': True, 'data': {
+            'files': [{'path': params['path'], 'additional': {'time': {'mtime': mtime[0]}}}]}})
+
+        def interrupt(done, total):
+            if done >= 20000:
+                raise KeyboardInterrupt
+
+        self.assertRaises(KeyboardInterrupt, self.fs.download_file, '/home/a.bin', self.tmp.name,
+                          chunk_size=10000, progress_callback=interrupt)
+        requested.clear()
+        local = self.fs.download_file('/home/a.bin', self.tmp.name)
+
+        self.assertEqual(requested, ['bytes=0-0', 'bytes=20000-'])
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        # The file changed on the NAS since the interrupted download, it is downloaded again
+        self.assertRaises(KeyboardInterrupt, self.fs.download_file, '/home/a.bin', self.tmp.name,
+                          chunk_size=10000, progress_callback=interrupt)
+        data = os.urandom(50000)
+        requested = self.serve_file(data)
+        mtime[0] = 2000
+        self.fs.download_file('/home/a.bin', self.tmp.name)
+
+        self.assertEqual(requested, ['bytes=0-0', None])
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_stale_part_is_not_resumed(self):
+        data = os.urandom(50000)
+        requested = self.serve_file(data)
+        # Left by an older version of the library or another program, its origin is unknown
+        with open(os.path.join(self.tmp.name, 'a.bin.part'), 'wb') as f:
+            f.write(os.urandom(20000))
+
+        local = self.fs.download_file('/home/a.bin', self.tmp.name)
+
+        self.assertEqual(requested, ['bytes=0-0', None])
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_download_without_range_support(self):
+        data = os.urandom(50000)
+        requested = self.serve_file(data, ranges=False)
+        with open(os.path.join(self.tmp.name, 'a.bin.part'), 'wb') as f:
+            f.write(b'stale')
+
+        local = self.fs.download_file(
+            '/home/a.bin', self.tmp.name, max_workers=4, part_size=1000)
+
+        self.assertEqual(requested, ['bytes=0-0', None])
+        with open(local, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def serve_tree(self, folders):
+        listed = []
+
+        def list_folder(params):
+            path = params['folder_path']
+            listed.append((path, int(params['offset'])))
+            if path not in folders:
+                return {'success': False, 'error': {'code': 408}}
+            entries = [{'name': name, 'path': path + '/' + name, 'isdir': path + '/' + name in folders}
+                       for name in folders[path]]
+            offset, limit = int(params['offset']), int(params['limit'])
+            return {'success': True, 'data': {'total': len(entries), 'offset': offset,
+                                              'files': entries[offset:offset + limit]}}
+
+        self.stub.route('SYNO.FileStation.List', 'list', list_folder)
+        return listed
+
+    def test_walk_pages_through_folders(self):
+        listed = self.serve_tree({
+            '/home': ['a', 'b', 'x.txt'],
+            '/home/a': ['f%02d' % i for i in range(25)] + ['c'],
+            '/home/a/c': ['deep.txt'],
+            '/home/b': ['skip'],
+            '/home/b/skip': ['hidden.txt'],
+        })
+
+        files = []
+        for path, dirs, page in self.fs.walk('/home', max_workers=3, page_size=10):
+            dirs[:] = [d for d in dirs if d['name'] != 'skip']
+            files += [entry['path'] for entry in page]
+
+        self.assertEqual(len(files), 27)
+        self.assertIn('/home/a/c/deep.txt', files)
+        self.assertNotIn('/home/b/skip/hidden.txt', files)
+        self.assertEqual(
+            sorted(offset for path, offset in listed if path == '/home/a'), [0, 10, 20])
+        self.assertNotIn(('/home/b/skip', 0), listed)
+
+    def test_iter_file_list(self):
+        listed = self.serve_tree({'/home': ['f%02d' % i for i in range(25)]})
+
+        names = [entry['name']
+                 for entry in self.fs.iter_file_list('/home', page_size=10)]
+
+        self.assertEqual(names, ['f%02d' % i for i in range(25)])
+        self.assertEqual(listed, [('/home', 0), ('/home', 10), ('/home', 20)])
+
+    def test_walk_errors(self):
+        self.serve_tree({'/home': ['gone'], '/home/gone': []})
+        self.stub.route('SYNO.FileStation.List', 'list', lambda params: {'success': False, 'error': {'code': 408}}
+                        if params['folder_path'] == '/home/gone' else
+                        {'success': True, 'data': {'total': 1, 'files': [
+                            {'name': 'gone', 'path': '/home/gone', 'isdir': True}]}})
+
+        errors = []
+        self.assertEqual(
+            len(list(self.fs.walk('/home', onerror=errors.append))), 1)
+        self.assertEqual(errors[0].error_code, 408)
+        with self.assertRaises(FileStationError):
+            list(self.fs.walk('/home'))
+
+    def test_generate_file_tree(self):
+        self.serve_tree({
+            '/home': ['a', 'x.txt'],
+            '/home/a': ['b', 'y.txt'],
+            '/home/a/b': ['z.txt'],
+        })
+        tree = Tree()
+        tree.create_node('home', '/home')
+
+        self.fs.generate_file_tree('/home', tree, max_depth=1)
+
+        self.assertEqual(sorted(tree.nodes), [
+                         '/home', '/home/a', '/home/a/b', '/home/a/y.txt', '/home/x.txt'])
+        self.assertFalse(tree['/home/a'].data['max_depth'])
+        self.assertTrue(tree['/home/a/b'].data['max_depth'])
+
+    def serve_search(self, batches):
+        # Results found by the NAS before each list request, the search finishes with the last batch
+        found = []
+        requests = []
+
+        def list_results(params):
+            if batches:
+                found.extend(batches.pop(0))
+            offset, limit = int(params['offset']), int(params['limit'])
+            requests.append((params['taskid'], offset))
+            return {'success': True, 'data': {'finished': not batches, 'total': len(found), 'offset': offset,
+                                              'files': [{'path': path} for path in found[offset:offset + limit]]}}
+
+        self.stub.route('SYNO.FileStation.Search', 'start', lambda params: {
+                        'success': True, 'data': {'taskid': 'search1'}})
+        self.stub.route('SYNO.FileStation.Search', 'list', list_results)
+        self.stub.route('SYNO.FileStation.Search', 'stop',
+                        lambda params: requests.append(('stop', params['taskid'])) or {'success': True})
+        self.stub.route('SYNO.FileStation.Search', 'clean',
+                        lambda params: requests.append(('clean', params['taskid'])) or {'success': True})
+        return requests
+
+    def test_iter_search_streams_new_results(self):
+        requests = self.serve_search(
+            [['/a', '/b', '/c'], [], ['/d'], ['/e', '/f']])
+
+        paths = [entry['path'] for entry in self.fs.iter_search(
+            '/home', pattern='*.mkv', page_size=2, poll_interval=0.01)]
+
+        self.assertEqual(paths, ['/a', '/b', '/c', '/d', '/e', '/f'])
+        self.assertEqual(requests, [
+            ('"search1"', 0), ('"search1"', 2), ('"search1"',
+                                                 3), ('"search1"', 4), ('"search1"', 6),
+            ('stop', '"search1"'), ('clean', '"search1"')])
+        self.assertEqual(self.fs._search_taskid_list, [])
+
+    def test_iter_search_stops_early(self):
+        requests = self.serve_search([['/a', '/b'], ['/c']])
+
+        for entry in self.fs.iter_search('/home', page_size=10):
+            break
+
+        self.assertEqual(
+            requests, [('"search1"', 0), ('stop', '"search1"'), ('clean', '"search1"')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+from unittest import TestCase, mock
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from synology_api import base_api
+from synology_api.circuit_breaker import CircuitBreaker
+from synology_api.core_sys_info import SysInfo
+from synology_api.exceptions import CircuitOpenError, LoginError, SynoConnectionError
+from synology_api.fleet import Fleet
+from tests.dsm_stub import DsmStub
+
+
+class TestFleet(TestCase):
+
+    def setUp(self):
+        self.stubs = [DsmStub().__enter__() for _ in range(3)]
+        self.tmp = tempfile.TemporaryDirectory()
+        # Keep the API catalog cache out of the user cache directory
+        env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmp.name})
+        env.start()
+        self.addCleanup(env.stop)
+        self.fleet = Fleet([{'name': 'nas%d' % i, 'ip_address': '127.0.0.1', 'port': str(stub.port),
+                             'username': 'admin', 'password': 'secret', 'dsm_version': 6, 'debug': False}
+                            for i, stub in enumerate(self.stubs)], max_workers=3)
+
+    def tearDown(self):
+        self.fleet.logout()
+        for stub in self.stubs:
+            stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.session_registry.clear()
+        base_api.BaseApi.shared_session = None
+
+    def test_run_on_every_host(self):
+        for i, stub in enumerate(self.stubs):
+            stub.route('SYNO.Core.System', 'info', lambda params, i=i: {
+                       'success': True, 'data': {'model': 'DS%d' % i}})
+        self.stubs[1].route('SYNO.API.Auth', 'login', lambda params: {
+                            'success': False, 'error': {'code': 400}})
+
+        results = self.fleet.run(SysInfo, 'get_system_info')
+        self.assertEqual(list(results), ['nas0', 'nas1', 'nas2'])
+        self.assertEqual(results['nas0'].value['data']['model'], 'DS0')
+        self.assertEqual(results['nas2'].value['data']['model'], 'DS2')
+        self.assertFalse(results['nas1'].ok)
+        self.assertIsInstance(results['nas1'].error, LoginError)
+        self.assertGreater(results['nas0'].login_elapsed, 0)
+
+        # Sessions stay open for the next calls
+        results = self.fleet.run_batch(SysInfo, ['get_system_info', ('get_volume_info',)],
+                                       hosts=['nas0', 'nas2'])
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertEqual(len(results['nas0'].value), 2)
+        self.assertEqual([stub.logins for stub in self.stubs], [1, 0, 1])
+
+    def test_logins_are_concurrent(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def login(params):
+            barrier.wait()
+            return {'success': True, 'data': {'sid': 'sid', 'synotoken': 'token'}}
+
+        for stub in self.stubs:
+            stub.route('SYNO.API.Auth', 'login', login)
+        results = self.fleet.connect(SysInfo)
+        self.assertTrue(all(result.ok for result in results.values()))
+
+    def test_slow_hosts_time_out(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.stubs[2].route('SYNO.Core.System', 'info',
+                            lambda params: release.wait(5) and {'success': True, 'data': {}})
+        self.fleet.connect(SysInfo)
+        results = self.fleet.run(SysInfo, 'get_system_info', timeout=0.5)
+        self.assertTrue(results['nas0'].ok)
+        self.assertIsInstance(results['nas2'].error, TimeoutError)
+
+    def test_dead_hosts_are_skipped(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        specs = [dict(spec, name=name)
+                 for name, spec in self.fleet.specs.items()]
+        specs.append(dict(specs[0], name='dead', port=str(port)))
+        breaker = CircuitBreaker(failure_threshold=1)
+        fleet = Fleet(specs, circuit_breaker=breaker)
+        self.addCleanup(fleet.logout)
+
+        results = fleet.run(SysInfo, 'get_volume_info')
+        self.assertIsInstance(results['dead'].error, SynoConnectionError)
+        self.assertEqual(fleet.available(), ['nas0', 'nas1', 'nas2'])
+        self.assertIs(
+            fleet.api('nas0', SysInfo).session.circuit_breaker, breaker)
+
+        results = fleet.run(SysInfo, 'get_volume_info')
+        self.assertIsInstance(results['dead'].error, CircuitOpenError)
+        self.assertTrue(results['nas1'].ok)
+
+    def test_shared_sessions_keep_their_breaker(self):
+        shared = SysInfo(**self.fleet.specs['nas0'])
+        breaker = CircuitBreaker(failure_threshold=1)
+        fleet = Fleet([dict(spec, name=name) for name, spec in self.fleet.specs.items()],
+                      circuit_breaker=breaker)
+        self.addCleanup(fleet.logout)
+
+        results = fleet.connect(SysInfo)
+        self.assertIs(results['nas0'].value.session, shared.session)
+        self.assertIsNone(shared.session.circuit_breaker)
+        self.assertIs(results['nas1'].value.session.circuit_breaker, breaker)
+
+    def test_login_elapsed_only_on_login(self):
+        SysInfo(**self.fleet.specs['nas0'])
+        results = self.fleet.connect(SysInfo)
+        self.assertEqual(results['nas0'].login_elapsed, 0)
+        self.assertGreater(results['nas1'].login_elapsed, 0)
+
+        results = self.fleet.run(SysInfo, 'get_system_info')
+        self.assertTrue(all(result.login_elapsed == 0
+                            for result in results.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+from unittest import TestCase
+import json
+import unittest
+from synology_api.json_stream import iter_json_items
+
+
+def chunked(document, size):
+    body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def consume(chunks, path):
+    items = []
+    generator = iter_json_items(chunks, path)
+    while True:
+        try:
+            items.append(next(generator))
+        except StopIteration as stop:
+            return items, stop.value
+
+
+class TestJsonStream(TestCase):
+
+    def test_items_split_across_chunks(self):
+        events = [{'name': 'é]["', 'id': 12345}, 123456789, 's,]',
+                  [1, [2]], None, True, -1.5e10, 0.25]
+        document = {'data': {'total': 8, 'other': [1, {'events': [9]}], 'events': events,
+                             'after': {'k': 'v'}}, 'success': True}
+
+        for size in range(1, 40):
+            items, rest = consume(chunked(document, size), ('data', 'events'))
+            self.assertEqual(items, events)
+            self.assertEqual(rest, {'data': {'total': 8, 'other': [1, {'events': [9]}], 'events': [],
+                                             'after': {'k': 'v'}}, 'success': True})
+
+    def test_error_response(self):
+        document = {'error': {'code': 105}, 'success': False}
+        self.assertEqual(consume(chunked(document, 3),
+                         ('data', 'events')), ([], document))
+
+    def test_truncated_document(self):
+        chunks = chunked({'data': {'events': [{'id': 1}, {'id': 2}]}}, 5)[:-2]
+        with self.assertRaises(ValueError):
+            consume(chunks, ('data', 'events'))
+
+
+if __name__ == '__main__':
+    unittest.main()
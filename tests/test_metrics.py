@@ -0,0 +1,93 @@
+from unittest import TestCase
+import tempfile
+import unittest
+from synology_api import auth as syn
+from synology_api.exceptions import CoreError, SynoConnectionError
+from synology_api.hooks import RequestHook
+from synology_api.metrics import MetricsCollector
+from synology_api.retry import RetryPolicy
+from tests.dsm_stub import DsmStub
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.auth = syn.Authentication('127.0.0.1', str(self.stub.port), 'admin', 'secret', dsm_version=6,
+                                       debug=False, api_cache_dir=self.cache_dir.name,
+                                       retry_policy=RetryPolicy(backoff_factor=0))
+        self.auth.login()
+        self.metrics = self.auth.add_hook(MetricsCollector(buckets=(0.5, 5)))
+
+    def tearDown(self):
+        self.auth.close()
+        self.stub.__exit__()
+        self.cache_dir.cleanup()
+
+    def info(self):
+        return self.auth.request_data('SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+
+    def test_hook_callbacks(self):
+        events = []
+        hook = self.auth.add_hook(RequestHook(
+            before_request=lambda info: events.append(
+                ('before', info.api_name, info.method)),
+            after_response=lambda info: events.append(
+                ('after', info.error_code)),
+            on_error=lambda info, error: events.append(('error', type(error)))))
+
+        self.info()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {
+                        'success': False, 'error': {'code': 105}})
+        self.assertRaises(CoreError, self.info)
+        self.auth.remove_hook(hook)
+        self.assertRaises(CoreError, self.info)
+
+        self.assertEqual(events, [('before', 'SYNO.Core.System', 'info'), ('after', 0),
+                                  ('before', 'SYNO.Core.System', 'info'), ('after', 105), ('error', CoreError)])
+
+    def test_metrics_per_api_method(self):
+        replies = [{'success': False, 'error': {'code': 111}}]
+        self.stub.route('SYNO.Core.System', 'info', lambda params: replies.pop(0)
+                        if replies else {'success': True, 'data': {'model': 'DS920+'}})
+        self.info()
+        self.info()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {
+                        'success': False, 'error': {'code': 105}})
+        self.assertRaises(CoreError, self.info)
+
+        figures = self.metrics.as_dict()['SYNO.Core.System']['info']
+        self.assertEqual(figures['count'], 3)
+        self.assertEqual(figures['retries'], 1)
+        self.assertEqual(figures['errors'], {'105': 1})
+        self.assertGreater(figures['response_bytes'], 0)
+        self.assertGreater(figures['request_bytes'],
+                           3 * len(self.auth.base_url))
+        self.assertEqual(figures['latency_buckets'][float('inf')], 3)
+
+    def test_transport_errors_are_counted(self):
+        self.auth.close()
+        self.stub.__exit__()
+        self.auth.retry_policy = RetryPolicy(max_retries=0)
+        self.assertRaises(SynoConnectionError, self.info)
+        figures = self.metrics.as_dict()['SYNO.Core.System']['info']
+        self.assertEqual(figures['errors'], {'SynoConnectionError': 1})
+
+    def test_prometheus_export(self):
+        self.info()
+        text = self.metrics.to_prometheus()
+        labels = 'api="SYNO.Core.System",method="info"'
+        self.assertIn(
+            '# TYPE synology_api_request_duration_seconds histogram', text)
+        self.assertIn(
+            'synology_api_request_duration_seconds_bucket{%s,le="+Inf"} 1' % labels, text)
+        self.assertIn(
+            'synology_api_request_duration_seconds_count{%s} 1' % labels, text)
+        self.assertIn('synology_api_retries_total{%s} 0' % labels, text)
+        self.assertIn('# TYPE synology_api_request_bytes_total counter', text)
+        self.assertTrue(text.endswith('\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from unittest import TestCase
+import threading
+import unittest
+from synology_api.auth import Authentication
+from synology_api.exceptions import FileStationError
+from synology_api.pagination import iter_pages, page_items
+
+
+class TestPagination(TestCase):
+
+    def setUp(self):
+        self.items = list(range(23))
+        self.calls = []
+
+    def fetch(self, offset, limit, total=True):
+        self.calls.append((offset, limit))
+        data = {'list': self.items[offset:offset + limit]}
+        if total:
+            data['total'] = len(self.items)
+        return {'success': True, 'data': data}
+
+    def test_all_pages_are_read(self):
+        self.assertEqual(
+            list(iter_pages(self.fetch, 'SYNO.Test', 'list', page_size=5)), self.items)
+        self.assertEqual(
+            self.calls, [(0, 5), (5, 5), (10, 5), (15, 5), (20, 5)])
+
+    def test_without_total_stops_on_short_page(self):
+        self.items = list(range(10))
+        pages = iter_pages(lambda offset, limit: self.fetch(offset, limit, total=False),
+                           'SYNO.Test', page_size=5, offset=2, prefetch=False)
+        self.assertEqual(list(pages), self.items[2:])
+        self.assertEqual(self.calls, [(2, 5), (7, 5)])
+
+    def test_capped_page_size_is_followed_by_total(self):
+        # The API returns at most 4 items whatever the limit
+        pages = iter_pages(lambda offset, limit: self.fetch(offset, min(limit, 4)),
+                           'SYNO.Test', 'list', page_size=10, prefetch=False)
+        self.assertEqual(list(pages), self.items)
+        self.assertEqual([offset for offset, _ in self.calls],
+                         [0, 4, 8, 12, 16, 20])
+
+    def test_next_page_is_prefetched(self):
+        second_page = threading.Event()
+
+        def fetch(offset, limit):
+            if offset == 5:
+                second_page.set()
+            return self.fetch(offset, limit)
+
+        pages = iter_pages(fetch, 'SYNO.Test', 'list', page_size=5)
+        self.assertEqual(next(pages), 0)
+        self.assertTrue(second_page.wait(5))
+        pages.close()
+
+    def test_prefetched_pages_keep_the_caller_options(self):
+        session = Authentication(
+            '127.0.0.1', '5000', 'admin', 'secret', debug=False)
+        self.addCleanup(session.close)
+        seen = []
+
+        def fetch(offset, limit):
+            seen.append((session._current_timeout(), getattr(
+                session._local, 'stream_items', None)))
+            return self.fetch(offset, limit)
+
+        with session.request_options(timeout=(1, 7)), session.streaming('list'):
+            self.assertEqual(list(iter_pages(fetch, 'SYNO.Test', 'list', page_size=5, session=session)),
+                             self.items)
+        self.assertEqual(seen, [((1, 7), 'list')] * 5)
+        self.assertEqual(session._current_timeout(), session.timeout)
+
+    def test_errors_are_raised(self):
+        pages = iter_pages(lambda offset, limit: {'success': False, 'error': {'code': 408}},
+                           'SYNO.FileStation.List', 'files')
+        with self.assertRaises(FileStationError):
+            list(pages)
+        with self.assertRaises(ValueError):
+            list(iter_pages(lambda offset, limit: 'Enter a valid path', 'SYNO.Test'))
+
+    def test_items_key_is_found_or_required(self):
+        def page(**data):
+            return {'success': True, 'data': data}
+
+        self.assertEqual(page_items(page(list=[1], total=1), 'SYNO.Test'), [1])
+        for response in (page(total=0), page(events=[1], cameras=[2])):
+            with self.assertRaises(ValueError):
+                page_items(response, 'SYNO.Test')
+        self.assertEqual(page_items(page(total=0), 'SYNO.Test', 'events'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+from unittest import TestCase
+from unittest import mock
+import unittest
+from synology_api.response_cache import ResponseCache
+
+
+def ok(value):
+    return {'success': True, 'data': {'value': value}}
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(
+            {'SYNO.Core': 10, 'SYNO.Core.Share': 30}, max_entries=3)
+
+    def test_read_responses_are_cached_per_params(self):
+        params = {'version': 1, 'method': 'list', 'offset': 0}
+        self.assertIsNone(self.cache.get('SYNO.Core.Share', params))
+        self.cache.update('SYNO.Core.Share', dict(params, _sid='a'), ok(1))
+
+        cached = self.cache.get('SYNO.Core.Share', dict(params, _sid='b'))
+        self.assertEqual(cached, ok(1))
+        cached['data']['value'] = 2
+        self.assertEqual(self.cache.get('SYNO.Core.Share', params), ok(1))
+        self.assertIsNone(self.cache.get(
+            'SYNO.Core.Share', dict(params, offset=10)))
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+    def test_sessions_are_kept_apart(self):
+        params = {'version': 1, 'method': 'info'}
+        self.cache.update('SYNO.Core.System', params, ok(1), scope='nas1')
+        self.cache.update('SYNO.Core.System', params, ok(2), scope='nas2')
+        self.assertEqual(self.cache.get(
+            'SYNO.Core.System', params, 'nas1'), ok(1))
+        self.assertEqual(self.cache.get(
+            'SYNO.Core.System', params, 'nas2'), ok(2))
+        self.assertIsNone(self.cache.get('SYNO.Core.System', params))
+
+    def test_ttl_per_api_prefix(self):
+        self.assertEqual(self.cache.ttl('SYNO.Core.Share.Permission'), 30)
+        self.assertEqual(self.cache.ttl('SYNO.Core.System'), 10)
+        self.assertEqual(self.cache.ttl('SYNO.FileStation.List'), 0)
+        # Live metrics are not cached by default
+        self.assertEqual(ResponseCache().ttl(
+            'SYNO.Core.System.Utilization'), 0)
+
+        params = {'version': 1, 'method': 'info'}
+        with mock.patch('time.monotonic', return_value=100):
+            self.cache.update('SYNO.Core.System', params, ok(1))
+            self.cache.update('SYNO.FileStation.List', params, ok(1))
+        with mock.patch('time.monotonic', return_value=109):
+            self.assertIsNotNone(self.cache.get('SYNO.Core.System', params))
+        with mock.patch('time.monotonic', return_value=111):
+            self.assertIsNone(self.cache.get('SYNO.Core.System', params))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_errors_are_not_cached(self):
+        params = {'version': 1, 'method': 'info'}
+        self.cache.update('SYNO.Core.System', params, {
+                          'success': False, 'error': {'code': 105}})
+        self.assertIsNone(self.cache.get('SYNO.Core.System', params))
+
+    def test_least_recently_used_are_dropped(self):
+        for index in range(3):
+            self.cache.update('SYNO.Core.System', {
+                              'method': 'info', 'index': index}, ok(index))
+        self.cache.get('SYNO.Core.System', {'method': 'info', 'index': 0})
+        self.cache.update('SYNO.Core.System', {
+                          'method': 'info', 'index': 3}, ok(3))
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNotNone(self.cache.get(
+            'SYNO.Core.System', {'method': 'info', 'index': 0}))
+        self.assertIsNone(self.cache.get(
+            'SYNO.Core.System', {'method': 'info', 'index': 1}))
+
+    def test_mutations_invalidate_their_api(self):
+        self.cache = ResponseCache({'SYNO.Core': 10, 'SYNO.FileStation': 10})
+        self.cache.update('SYNO.Core.Share', {'method': 'list'}, ok(1))
+        self.cache.update('SYNO.Core.Share.Permission',
+                          {'method': 'get'}, ok(1))
+        self.cache.update('SYNO.Core.Group', {'method': 'list'}, ok(1))
+        self.cache.update('SYNO.FileStation.List', {'method': 'list'}, ok(1))
+
+        self.cache.update('SYNO.Core.Share', {'method': 'create'}, ok(None))
+        self.assertIsNone(self.cache.get(
+            'SYNO.Core.Share', {'method': 'list'}))
+        self.assertIsNone(self.cache.get(
+            'SYNO.Core.Share.Permission', {'method': 'get'}))
+        # Other APIs of SYNO.Core are kept
+        self.assertIsNotNone(self.cache.get(
+            'SYNO.Core.Group', {'method': 'list'}))
+        self.assertEqual(self.cache.invalidate('SYNO.Core.Group'), 1)
+
+        self.assertEqual(self.cache.invalidate('SYNO.FileStation'), 1)
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
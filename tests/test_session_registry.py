@@ -0,0 +1,75 @@
+from unittest import TestCase, mock
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import unittest
+from synology_api import auth as syn
+from synology_api import base_api
+from synology_api.core_sys_info import SysInfo
+from synology_api.filestation import FileStation
+from tests.dsm_stub import DsmStub
+
+
+class TestSessionRegistry(TestCase):
+
+    def setUp(self):
+        self.stubs = [DsmStub().__enter__(), DsmStub().__enter__()]
+        self.tmp = tempfile.TemporaryDirectory()
+        # Keep the API catalog cache out of the user cache directory
+        env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmp.name})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        for stub in self.stubs:
+            stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.session_registry.clear()
+        base_api.BaseApi.shared_session = None
+
+    def connect(self, api_class, stub, username='admin'):
+        return api_class('127.0.0.1', str(stub.port), username, 'secret', dsm_version=6, debug=False)
+
+    def test_sessions_are_shared_per_host_and_user(self):
+        fs = self.connect(FileStation, self.stubs[0])
+        info = self.connect(SysInfo, self.stubs[0])
+        other_user = self.connect(SysInfo, self.stubs[0], 'backup')
+        other_nas = self.connect(FileStation, self.stubs[1])
+
+        self.assertIs(fs.session, info.session)
+        self.assertIsNot(fs.session, other_user.session)
+        self.assertIsNot(fs.session, other_nas.session)
+        self.assertEqual(other_nas.base_url, other_nas.session.base_url)
+        self.assertEqual(len(base_api.BaseApi.session_registry), 3)
+        self.assertEqual((self.stubs[0].logins, self.stubs[1].logins), (2, 1))
+
+        # Without credentials, the first session opened is used
+        self.assertIs(SysInfo('', '', '', '').session, fs.session)
+
+        fs.logout()
+        self.assertNotIn(fs.session.session_key,
+                         base_api.BaseApi.session_registry)
+        self.assertIsNone(base_api.BaseApi.shared_session)
+
+    def test_concurrent_construction_logs_in_once_per_host(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            apis = list(pool.map(lambda i: self.connect(
+                SysInfo, self.stubs[i % 2]), range(16)))
+
+        self.assertEqual([stub.logins for stub in self.stubs], [1, 1])
+        self.assertEqual(len({id(api.session) for api in apis}), 2)
+
+    def test_registered_session_is_reused(self):
+        stub = self.stubs[0]
+        session = syn.Authentication('127.0.0.1', str(stub.port), 'admin', 'secret', dsm_version=6,
+                                     debug=False, timeout=5)
+        session.login()
+        session.get_api_list()
+        base_api.BaseApi.session_registry.register(session)
+
+        self.assertIs(self.connect(SysInfo, stub).session, session)
+        self.assertEqual(stub.logins, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
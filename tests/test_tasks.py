@@ -0,0 +1,166 @@
+from unittest import TestCase, mock
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from synology_api import base_api
+from synology_api.exceptions import FileStationError
+from synology_api.filestation import FileStation
+from synology_api.tasks import BackgroundTask, as_completed, async_as_completed
+from tests.dsm_stub import DsmStub
+
+
+class TestBackgroundTasks(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(
+            os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+        self.fs = FileStation('127.0.0.1', str(self.stub.port), 'admin', 'secret',
+                              dsm_version=6, debug=False, interactive_output=False)
+        # taskid -> statuses still to report, the last one is repeated
+        self.statuses = {}
+        self.stopped = []
+        self.started = 0
+
+        def start(params):
+            self.started += 1
+            return {'success': True, 'data': {'taskid': 'task%d' % self.started}}
+
+        def status(params):
+            taskid = params['taskid'].strip('"')
+            statuses = self.statuses[taskid]
+            return statuses.pop(0) if len(statuses) > 1 else statuses[0]
+
+        for api in ('SYNO.FileStation.CopyMove', 'SYNO.FileStation.DirSize'):
+            self.stub.route(api, 'start', start)
+            self.stub.route(api, 'status', status)
+            self.stub.route(api, 'stop', lambda params: self.stopped.append(
+                params['taskid']) or {'success': True})
+
+    def tearDown(self):
+        self.fs.logout()
+        self.stub.__exit__()
+        self.tmp.cleanup()
+        base_api.BaseApi.shared_session = None
+
+    def running(self, progress=None):
+        data = {'finished': False}
+        if progress is not None:
+            data['progress'] = progress
+        return {'success': True, 'data': data}
+
+    def test_wait(self):
+        task = self.fs.start_task('copy_move', ['/a', '/b'], '/dst')
+        self.assertEqual(task.taskid, 'task1')
+        self.assertEqual(
+            repr(task), '<BackgroundTask copy_move task1 running>')
+        self.statuses['task1'] = [self.running(0.5), self.running(0.9),
+                                  {'success': True, 'data': {'finished': True, 'progress': 1}}]
+        seen = []
+        data = task.wait(
+            progress_callback=lambda task: seen.append(task.progress))
+        self.assertEqual(data, {'finished': True, 'progress': 1})
+        self.assertEqual(seen, [0.5, 0.9, 1.0])
+        self.assertEqual(self.stub.count(
+            'SYNO.FileStation.CopyMove', 'status'), 3)
+        self.assertTrue(task.done)
+        # The last started task of a kind
+        self.assertEqual(self.fs.task('copy_move').taskid, 'task1')
+        self.assertRaises(ValueError, self.fs.task, 'delete')
+
+    def test_concurrent_starts(self):
+        lock = threading.Lock()
+        ids = {}
+
+        def start(params):
+            time.sleep(0.01)
+            with lock:
+                ids[params['path']] = taskid = 'id-' + params['path']
+            return {'success': True, 'data': {'taskid': taskid}}
+
+        self.stub.route('SYNO.FileStation.DirSize', 'start', start)
+        for interactive_output in (True, False):
+            self.fs.interactive_output = interactive_output
+            paths = ['/src%d-%s' % (i, interactive_output) for i in range(8)]
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                handles = list(
+                    pool.map(lambda path: self.fs.start_task('dir_size', path), paths))
+            self.assertEqual([task.taskid for task in handles],
+                             [ids[path] for path in paths])
+
+    def test_adaptive_interval(self):
+        task = BackgroundTask(self.fs, 'dir_size', 'task1', max_interval=2)
+        self.statuses['task1'] = [self.running()]
+        intervals = []
+        for _ in range(4):
+            task.poll()
+            intervals.append(task.interval)
+        self.assertEqual([round(i, 4)
+                         for i in intervals], [0.3, 0.45, 0.675, 1.0125])
+
+        # A task reporting its progress is checked halfway to its estimated end
+        task = BackgroundTask(self.fs, 'copy_move', 'task2', max_interval=60)
+        task.started -= 10
+        self.statuses['task2'] = [self.running(0.25)]
+        task.poll()
+        self.assertAlmostEqual(task.interval, 15, places=1)
+
+    def test_as_completed_batches_status_checks(self):
+        handles = [self.fs.start_task(
+            'copy_move', '/src%d' % i, '/dst') for i in range(3)]
+        handles.append(self.fs.start_task('dir_size', '/src'))
+        done = {'success': True, 'data': {'finished': True}}
+        self.statuses['task1'] = [self.running(), self.running(), done]
+        self.statuses['task2'] = [done]
+        self.statuses['task3'] = [
+            self.running(), {'success': False, 'error': {'code': 1000}}]
+        self.statuses['task4'] = [self.running(), done]
+
+        order = [task.taskid for task in as_completed(handles)]
+        self.assertEqual(order, ['task2', 'task3', 'task4', 'task1'])
+        # One compound request per round, a plain one for the last task
+        self.assertEqual(self.stub.count('SYNO.Entry.Request'), 2)
+        self.assertEqual(self.stub.count(
+            'SYNO.FileStation.CopyMove', 'status'), 6)
+        self.assertIsInstance(handles[2].error, FileStationError)
+        self.assertRaises(FileStationError, handles[2].wait)
+        self.assertEqual(
+            repr(handles[2]), '<BackgroundTask copy_move task3 failed>')
+
+    def test_timeout_and_stop(self):
+        task = self.fs.start_task('copy_move', '/src', '/dst')
+        self.statuses['task1'] = [self.running()]
+        self.assertRaises(TimeoutError, task.wait, timeout=0.3)
+        self.assertRaises(TimeoutError, list,
+                          as_completed([task], timeout=0.3))
+        task.stop()
+        self.assertEqual(self.stopped, ['"task1"'])
+
+    def test_async(self):
+        handles = [self.fs.start_task('dir_size', '/src%d' % i)
+                   for i in range(2)]
+        self.statuses['task1'] = [self.running(), {'success': True, 'data': {
+            'finished': True, 'total_size': 10}}]
+        self.statuses['task2'] = [
+            {'success': True, 'data': {'finished': True, 'total_size': 20}}]
+
+        async def follow():
+            return [(task.taskid, task.data['total_size']) async for task in async_as_completed(handles)]
+
+        self.assertEqual(asyncio.run(follow()), [('task2', 20), ('task1', 10)])
+
+        task = self.fs.start_task('dir_size', '/src')
+        self.statuses['task3'] = [
+            self.running(), {'success': True, 'data': {'finished': True}}]
+        self.assertEqual(asyncio.run(task.wait_async()), {'finished': True})
+
+
+if __name__ == '__main__':
+    unittest.main()
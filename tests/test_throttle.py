@@ -0,0 +1,98 @@
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import time
+import unittest
+from synology_api import auth as syn
+from synology_api.exceptions import CoreError
+from synology_api.retry import RetryPolicy
+from synology_api.throttle import Limit, Throttle
+from tests.dsm_stub import DsmStub
+
+HOST = 'http://nas:5000/webapi/'
+
+
+class TestThrottle(TestCase):
+
+    def test_rate_and_burst(self):
+        throttle = Throttle(rate=20, burst=5)
+        started = time.monotonic()
+        for _ in range(15):
+            with throttle.slot(HOST, 'SYNO.Core.System'):
+                pass
+        # 5 at once, then 10 at 20 per second
+        self.assertGreater(time.monotonic() - started, 0.45)
+
+    def test_family_limits(self):
+        throttle = Throttle(families={'SYNO.FileStation': Limit(rate=10, burst=1),
+                                      'SYNO.FileStation.Upload': Limit(max_in_flight=1)})
+        self.assertEqual(throttle.family(
+            'SYNO.FileStation.List'), 'SYNO.FileStation')
+        self.assertEqual(throttle.family(
+            'SYNO.FileStation.Upload'), 'SYNO.FileStation.Upload')
+        self.assertIsNone(throttle.family('SYNO.Core.System'))
+
+        started = time.monotonic()
+        for _ in range(10):
+            with throttle.slot(HOST, 'SYNO.Core.System'):
+                pass
+        self.assertLess(time.monotonic() - started, 0.1)
+        for _ in range(3):
+            with throttle.slot(HOST, 'SYNO.FileStation.List'):
+                pass
+        self.assertGreater(time.monotonic() - started, 0.15)
+
+    def test_busy_codes_slow_down(self):
+        throttle = Throttle(min_spacing=0.05, max_spacing=0.2)
+        throttle.report(HOST, 'SYNO.Core.System', 117)
+        self.assertEqual(throttle.spacing(HOST), 0.05)
+        for _ in range(5):
+            throttle.report(HOST, 'SYNO.Core.System', 109)
+        self.assertEqual(throttle.spacing(HOST), 0.2)
+        self.assertEqual(throttle.spacing('http://other:5000/webapi/'), 0)
+
+        started = time.monotonic()
+        for _ in range(3):
+            with throttle.slot(HOST, 'SYNO.Core.System'):
+                pass
+        self.assertGreater(time.monotonic() - started, 0.35)
+
+        while throttle.spacing(HOST):
+            throttle.report(HOST, 'SYNO.Core.System', 0)
+
+    def test_max_in_flight_in_transport(self):
+        state = {'in_flight': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def slow(params):
+            with lock:
+                state['in_flight'] += 1
+                state['max'] = max(state['max'], state['in_flight'])
+            time.sleep(0.05)
+            with lock:
+                state['in_flight'] -= 1
+            return {'success': True, 'data': {}}
+
+        with DsmStub() as stub, tempfile.TemporaryDirectory() as cache_dir:
+            stub.route('SYNO.Core.System', 'set', slow)
+            auth = syn.Authentication('127.0.0.1', str(stub.port), 'admin', 'secret', dsm_version=6, debug=False,
+                                      api_cache_dir=cache_dir, throttle=Throttle(
+                                          max_in_flight=2),
+                                      retry_policy=RetryPolicy(backoff_factor=0))
+            auth.login()
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(lambda _: auth.request_data('SYNO.Core.System', 'entry.cgi',
+                                                          {'version': 1, 'method': 'set'}), range(8)))
+            self.assertEqual(state['max'], 2)
+
+            stub.route('SYNO.Core.System', 'info', lambda params: {
+                       'success': False, 'error': {'code': 110}})
+            self.assertRaises(CoreError, auth.request_data, 'SYNO.Core.System', 'entry.cgi',
+                              {'version': 1, 'method': 'info'})
+            self.assertGreater(auth.throttle.spacing(auth.base_url), 0)
+            auth.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
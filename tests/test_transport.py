@@ -0,0 +1,441 @@
+from unittest import TestCase
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from synology_api import auth as syn
+from synology_api import json_backend
+from synology_api.api_cache import ApiInfoCache
+from synology_api.exceptions import CoreError, FileStationError, SynoConnectionError
+from synology_api.metrics import MetricsCollector
+from synology_api.response_cache import ResponseCache
+from synology_api.retry import RetryPolicy
+from synology_api.throttle import Throttle
+from tests.dsm_stub import API_LIST, DsmStub
+
+
+class TestTransport(TestCase):
+
+    def setUp(self):
+        self.stub = DsmStub().__enter__()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.auth = self.new_auth()
+
+    def tearDown(self):
+        self.auth.close()
+        self.stub.__exit__()
+        self.cache_dir.cleanup()
+
+    def new_auth(self, **kwargs):
+        return syn.Authentication('127.0.0.1', str(self.stub.port), 'admin', 'secret', dsm_version=6,
+                                  debug=False, api_cache_dir=self.cache_dir.name, **kwargs)
+
+    def test_login_and_api_list(self):
+        self.auth.login()
+        self.auth.get_api_list()
+        self.assertEqual(self.auth.sid, 'sid-1')
+        self.assertIn('SYNO.Core.System', self.auth.full_api_list)
+
+    def test_api_list_is_cached_on_disk(self):
+        self.auth.get_api_list()
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 1)
+
+        other = self.new_auth()
+        other.get_api_list('FileStation')
+        other.get_api_list()
+        other.close()
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 1)
+        self.assertEqual(other.full_api_list, self.auth.full_api_list)
+        self.assertIn('SYNO.FileStation.List', other.app_api_list)
+        self.assertNotIn('SYNO.Core.System', other.app_api_list)
+
+        self.auth.get_api_list(refresh=True)
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 2)
+
+    def test_api_list_stored_by_concurrent_threads(self):
+        cache = ApiInfoCache(self.cache_dir.name)
+        url = 'http://127.0.0.1:5000/webapi/'
+        api_lists = [{'SYNO.API.Info': {'path': 'query.cgi', 'maxVersion': i}, 'padding': 'x' * 100000}
+                     for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda api_list: cache.store(
+                url, 7, api_list), api_lists))
+
+        self.assertIn(cache.load(url, 7), api_lists)
+        self.assertEqual(os.listdir(self.cache_dir.name),
+                         [os.path.basename(cache.path(url, 7))])
+
+    def test_api_not_found_invalidates_cache(self):
+        self.auth.login()
+        self.auth.get_api_list()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {
+                        'success': False, 'error': {'code': 102}})
+        self.assertRaises(CoreError, self.auth.request_data,
+                          'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+
+        other = self.new_auth()
+        other.get_api_list()
+        other.close()
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 2)
+
+        # The catalog is reloaded once per API, not on every failing call
+        for _ in range(5):
+            self.assertRaises(CoreError, self.auth.request_data,
+                              'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 2)
+
+    def test_api_list_follows_the_nas(self):
+        self.auth.login()
+        self.auth.get_api_list('FileStation')
+        self.auth.get_api_list()
+        api_list = dict(API_LIST)
+        self.stub.route('SYNO.API.Info', 'query', lambda params: {
+                        'success': True, 'data': api_list})
+
+        # An API added since the catalog was loaded is looked up once
+        api_list['SYNO.FileStation.New'] = {
+            'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 2}
+        self.assertEqual(
+            self.auth.app_api_list['SYNO.FileStation.New']['maxVersion'], 2)
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 2)
+        self.assertRaises(KeyError, self.auth.full_api_list.__getitem__,
+                          'SYNO.FileStation.Missing')
+        self.assertRaises(KeyError, self.auth.full_api_list.__getitem__,
+                          'SYNO.FileStation.Missing')
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 3)
+
+        # Error 102 reloads the catalog in memory too
+        del api_list['SYNO.FileStation.List']
+        api_list['SYNO.Core.System'] = {
+            'path': 'entry.cgi', 'minVersion': 1, 'maxVersion': 3}
+        self.stub.route('SYNO.FileStation.List', 'list', lambda params: {
+                        'success': False, 'error': {'code': 102}})
+        self.assertRaises(FileStationError, self.auth.request_data,
+                          'SYNO.FileStation.List', 'entry.cgi', {'version': 1, 'method': 'list'})
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 4)
+        self.assertNotIn('SYNO.FileStation.List', self.auth.app_api_list)
+        self.assertIn('SYNO.FileStation.New', self.auth.app_api_list)
+        self.assertEqual(
+            self.auth.full_api_list['SYNO.Core.System']['maxVersion'], 3)
+
+    def test_api_cache_key_has_the_build(self):
+        self.auth.get_api_list()
+        other = self.new_auth(dsm_build='69057')
+        other.get_api_list()
+        other.close()
+        self.assertEqual(self.stub.count('SYNO.API.Info'), 2)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 2)
+
+    def test_response_is_decoded_once(self):
+        self.auth.login()
+        decoded = []
+
+        def loads(data):
+            decoded.append(data)
+            return json.loads(data)
+
+        json_backend.set_json_loads(loads)
+        self.addCleanup(json_backend.set_json_loads)
+        response = self.auth.request_data(
+            'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        self.assertTrue(response['success'])
+        self.assertEqual(len(decoded), 1)
+
+        self.stub.route('SYNO.FileStation.Download', 'download',
+                        lambda params: (200, {'Content-Type': 'application/octet-stream'}, b'raw'))
+        raw = self.auth.request_data('SYNO.FileStation.Download', 'entry.cgi',
+                                     {'version': 1, 'method': 'download'}, response_json=False)
+        self.assertEqual(raw.content, b'raw')
+
+    def test_streamed_response(self):
+        self.auth.login()
+        events = [{'id': i, 'path': '/volume1/%d.mp4' % i}
+                  for i in range(60000)]
+        body = json.dumps(
+            {'data': {'total': len(events), 'events': events}, 'success': True}).encode()
+        self.stub.route('SYNO.Core.System', 'info',
+                        lambda params: (200, {'Content-Type': 'application/json'}, body))
+
+        tracemalloc.start()
+        count = 0
+        for event in self.auth.request_data('SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'},
+                                            stream_items='events'):
+            count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertEqual(count, len(events))
+        self.assertLess(peak, len(body) / 4)
+
+        with self.auth.streaming('events'):
+            items = self.auth.request_data(
+                'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        self.assertEqual(next(iter(items)), events[0])
+
+    def test_streamed_error_is_raised_at_the_end(self):
+        self.auth.login()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {
+                        'success': False, 'error': {'code': 105}})
+        items = self.auth.request_data('SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'},
+                                       stream_items='events')
+        with self.assertRaises(CoreError):
+            list(items)
+
+    def test_streamed_request_holds_its_slot_and_is_reported(self):
+        throttle = Throttle(max_in_flight=1)
+        self.auth.throttle = throttle
+        metrics = self.auth.add_hook(MetricsCollector())
+        self.auth.login()
+        body = json.dumps(
+            {'data': {'events': list(range(3))}, 'success': True}).encode()
+        self.stub.route('SYNO.Core.System', 'info',
+                        lambda params: (200, {'Content-Type': 'application/json'}, body))
+
+        items = iter(self.auth.request_data('SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'},
+                                            stream_items='events'))
+        self.assertEqual(next(items), 0)
+        slot = threading.Thread(target=lambda: self.auth.request_data(
+            'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'}))
+        slot.start()
+        slot.join(0.3)
+        # The other request waits until the stream is read
+        self.assertTrue(slot.is_alive())
+        self.assertEqual(list(items), [1, 2])
+        slot.join(5)
+        self.assertFalse(slot.is_alive())
+
+        figures = metrics.as_dict()['SYNO.Core.System']['info']
+        self.assertEqual(figures['count'], 2)
+        self.assertEqual(figures['response_bytes'], 2 * len(body))
+
+    def test_requests_sent_while_reading_a_stream(self):
+        self.auth.throttle = Throttle(max_in_flight=1)
+        self.auth.login()
+        body = json.dumps(
+            {'data': {'events': list(range(3))}, 'success': True}).encode()
+        self.stub.route('SYNO.Core.System', 'info',
+                        lambda params: (200, {'Content-Type': 'application/json'}, body))
+        responses = []
+
+        def read():
+            for _ in self.auth.request_data('SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'},
+                                            stream_items='events'):
+                responses.append(self.auth.request_data('SYNO.Core.System', 'entry.cgi',
+                                                        {'version': 1, 'method': 'info'}))
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        reader.join(5)
+        # The reading thread reuses its own slot instead of waiting for it
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(len(responses), 3)
+
+    def test_streamed_request_replayed_after_session_expired(self):
+        self.auth.login()
+        body = json.dumps(
+            {'data': {'events': list(range(3))}, 'success': True}).encode()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {'success': False, 'error': {'code': 119}}
+                        if params['_sid'] == 'sid-1' else (200, {'Content-Type': 'application/json'}, body))
+
+        with self.auth.streaming('events'):
+            items = self.auth.request_data(
+                'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+            self.assertEqual(list(items), [0, 1, 2])
+        self.assertEqual(self.stub.logins, 2)
+
+    def test_connections_are_reused(self):
+        self.auth.login()
+        for _ in range(20):
+            response = self.auth.request_data('SYNO.Core.System', 'entry.cgi',
+                                              {'version': 1, 'method': 'info'})
+            self.assertTrue(response['success'])
+        self.assertEqual(len(self.stub.connections), 1)
+
+    def test_batch_sends_compound_requests(self):
+        self.auth.login()
+        self.auth.get_api_list()
+        self.stub.route('SYNO.Core.System', 'fail', lambda params: {
+                        'success': False, 'error': {'code': 105}})
+        with self.auth.batch(max_size=2) as batch:
+            futures = [self.auth.request_data('SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+                       for _ in range(4)]
+            failing = self.auth.request_data(
+                'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'fail'})
+            direct = self.auth.request_data(
+                'SYNO.API.Info', 'query.cgi', {'version': 1, 'method': 'query'})
+            self.assertTrue(direct['success'])
+            self.assertEqual(self.stub.count('SYNO.Entry.Request'), 0)
+
+        self.assertEqual(self.stub.count('SYNO.Entry.Request'), 3)
+        self.assertTrue(all(f.result()['success'] for f in futures))
+        self.assertRaises(CoreError, failing.result)
+
+    def test_batch_result_inside_block(self):
+        self.auth.login()
+        self.auth.get_api_list()
+        with self.auth.batch():
+            future = self.auth.request_data(
+                'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+            self.assertTrue(future.result()['success'])
+        self.assertEqual(self.stub.count('SYNO.Entry.Request'), 1)
+
+    def test_expired_session_logs_in_once_and_replays(self):
+        self.auth.login()
+        expired = {'sid-1'}
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {'success': False, 'error': {'code': 119}}
+                        if params['_sid'] in expired else {'success': True, 'data': {'sid': params['_sid']}})
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: self.auth.request_data(
+                'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'}), range(30)))
+
+        self.assertEqual(self.stub.logins, 2)
+        self.assertEqual(self.auth.sid, 'sid-2')
+        self.assertTrue(all(r['data']['sid'] == 'sid-2' for r in responses))
+
+    def test_relogin_can_be_disabled(self):
+        self.auth = self.new_auth(auto_relogin=False)
+        self.auth.login()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {
+                        'success': False, 'error': {'code': 106}})
+        self.assertRaises(CoreError, self.auth.request_data,
+                          'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        self.assertEqual(self.stub.logins, 1)
+
+    def test_busy_codes_are_retried(self):
+        self.auth = self.new_auth(retry_policy=RetryPolicy(backoff_factor=0))
+        self.auth.login()
+        replies = [{'success': False, 'error': {'code': 109}},
+                   {'success': False, 'error': {'code': 117}}]
+        self.stub.route('SYNO.Core.System', 'info', lambda params: replies.pop(0)
+                        if replies else {'success': True, 'data': {}})
+        response = self.auth.request_data(
+            'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        self.assertTrue(response['success'])
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 3)
+
+    def test_mutations_are_not_retried(self):
+        self.auth = self.new_auth(retry_policy=RetryPolicy(backoff_factor=0))
+        self.auth.login()
+        self.stub.route('SYNO.Core.System', 'set', lambda params: {
+                        'success': False, 'error': {'code': 109}})
+        self.assertRaises(CoreError, self.auth.request_data,
+                          'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'set'})
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'set'), 1)
+
+    def test_retry_budget_limits_retries(self):
+        policy = RetryPolicy(
+            backoff_factor=0, budget_ratio=0, budget_reserve=2)
+        self.auth = self.new_auth(retry_policy=policy)
+        self.auth.login()
+        self.stub.route('SYNO.Core.System', 'info', lambda params: {
+                        'success': False, 'error': {'code': 110}})
+        for _ in range(3):
+            self.assertRaises(CoreError, self.auth.request_data,
+                              'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        # 3 requests, 2 retries in the budget
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 5)
+
+    def test_timeout_per_call(self):
+        self.auth.login()
+
+        def slow(params):
+            time.sleep(1)
+            return {'success': True, 'data': {}}
+
+        self.stub.route('SYNO.Core.System', 'info', slow)
+        started = time.monotonic()
+        with self.auth.request_options(timeout=(1, 0.1), retry_policy=RetryPolicy(max_retries=0)):
+            self.assertRaises(SynoConnectionError, self.auth.request_data,
+                              'SYNO.Core.System', 'entry.cgi', {'version': 1, 'method': 'info'})
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(self.auth._current_timeout(), self.auth.timeout)
+
+    def test_response_cache(self):
+        self.auth = self.new_auth(response_cache=ResponseCache())
+        self.auth.login()
+        self.auth.get_api_list()
+        info = {'version': 1, 'method': 'info'}
+        for _ in range(3):
+            response = self.auth.request_data(
+                'SYNO.Core.System', 'entry.cgi', dict(info))
+            self.assertTrue(response['success'])
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 1)
+
+        # Only mutations of the same API invalidate
+        self.auth.request_data('SYNO.Core.Share', 'entry.cgi', {
+                               'version': 1, 'method': 'create'})
+        self.auth.request_data('SYNO.Core.System', 'entry.cgi', dict(info))
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 1)
+        self.auth.request_data('SYNO.Core.System', 'entry.cgi', {
+                               'version': 1, 'method': 'set'})
+        self.auth.request_data('SYNO.Core.System', 'entry.cgi', dict(info))
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 2)
+
+        self.auth.request_multi_datas(
+            [{'api': 'SYNO.Core.System', 'method': 'reboot', 'version': 1}])
+        self.auth.request_data('SYNO.Core.System', 'entry.cgi', dict(info))
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 3)
+
+    def test_response_cache_shared_by_two_nas(self):
+        cache = ResponseCache()
+        other = DsmStub().__enter__()
+        self.addCleanup(other.__exit__)
+        sessions = []
+        for i, stub in enumerate((self.stub, other)):
+            stub.route('SYNO.Core.System', 'info', lambda params, i=i: {
+                       'success': True, 'data': {'model': 'DS%d' % i}})
+            session = syn.Authentication('127.0.0.1', str(stub.port), 'admin', 'secret', dsm_version=6,
+                                         debug=False, api_cache_dir=self.cache_dir.name,
+                                         response_cache=cache)
+            self.addCleanup(session.close)
+            session.login()
+            sessions.append(session)
+
+        info = {'version': 1, 'method': 'info'}
+        models = [session.request_data('SYNO.Core.System', 'entry.cgi', dict(info))['data']['model']
+                  for session in sessions * 2]
+        self.assertEqual(models, ['DS0', 'DS1', 'DS0', 'DS1'])
+        self.assertEqual(self.stub.count('SYNO.Core.System', 'info'), 1)
+        self.assertEqual(other.count('SYNO.Core.System', 'info'), 1)
+
+    def test_identical_reads_in_flight_are_coalesced(self):
+        self.auth.coalesce_requests = True
+        self.auth.login()
+        self.auth.single_flight.reset_stats()
+        release = threading.Event()
+
+        def slow(params):
+            release.wait(5)
+            return {'success': True, 'data': {'cpu': 3}}
+
+        self.stub.route('SYNO.Core.System.Utilization', 'get', slow)
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            futures = [pool.submit(self.auth.request_data, 'SYNO.Core.System.Utilization', 'entry.cgi',
+                                   {'version': 1, 'method': 'get'}) for _ in range(10)]
+            deadline = time.monotonic() + 5
+            while self.auth.single_flight.coalesced < 9 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            responses = [future.result() for future in futures]
+
+        self.assertEqual(self.stub.count(
+            'SYNO.Core.System.Utilization', 'get'), 1)
+        # Every caller gets its own copy
+        self.assertTrue(all(response == responses[0]
+                        for response in responses))
+        self.assertEqual(len({id(response) for response in responses}), 10)
+        self.assertEqual(self.auth.single_flight.stats(), {
+                         'executed': 1, 'coalesced': 9, 'in_flight': 0})
+
+        # Mutations are never coalesced
+        self.auth.request_data('SYNO.Core.System.Utilization', 'entry.cgi', {
+                               'version': 1, 'method': 'set'})
+        self.assertEqual(self.auth.single_flight.stats()['executed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()